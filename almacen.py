@@ -0,0 +1,558 @@
+"""
+Artefacto binario preprocesado del CSV de productores.
+
+Interpretar el CSV y todos sus polígonos es lo más caro del arranque, así que el
+resultado se guarda junto al CSV en un directorio "<csv>.cache/" con un archivo
+.npy por arreglo: las columnas tipadas de la tabla (las de texto codificadas
+como diccionario), el buffer de coordenadas de los polígonos con sus
+desplazamientos, rectángulos envolventes, centroides y superficies, la
+grilla de búsqueda por radio y las huellas (hashes) de cada fila del CSV y de
+su polígono, con las que una recarga detecta qué parcelas cambiaron.
+Los arranques siguientes abren esos arreglos con memoria mapeada y sólo
+reconstruyen el STRtree a partir de los rectángulos.
+
+El artefacto se genera leyendo el CSV por bloques de filas acotados por un
+tope de memoria: cada bloque se valida, sus polígonos se interpretan y sus
+columnas se agregan a archivos binarios en disco, de modo que un registro más
+grande que la RAM disponible también se puede cargar. Sólo las categorías de
+las columnas de texto y las coordenadas de la grilla se mantienen completas en
+memoria.
+
+Cada versión del artefacto vive en un subdirectorio con el nombre del hash
+SHA-256 del CSV, por lo que un CSV modificado nunca se sirve con un artefacto
+viejo; el hash se recalcula sólo si cambia el tamaño o la fecha de modificación.
+
+Para generar el artefacto por adelantado:
+
+    python -m almacen datos_productores.csv --memoria-maxima 256
+"""
+import argparse
+import functools
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from metricas import medido
+from motor import (
+    TAMANO_CELDA_GRADOS, IndiceEspacial, IndiceGrilla, Poligonos, compactar_productores, leer_csv,
+    parsear_poligonos, validar_productores
+)
+
+# Se incrementa cuando cambia el contenido o el formato de los archivos guardados
+VERSION_FORMATO = 4
+
+# Tope de memoria por defecto para interpretar cada bloque del CSV, en MB
+MEMORIA_MAXIMA_MB = 256
+
+# Memoria que ocupa interpretar un bloque en relación con la de su DataFrame
+# (cadenas de los polígonos, texto unido, buffers de coordenadas)
+FACTOR_MEMORIA_BLOQUE = 4
+
+# Elementos por copia al pasar los archivos binarios a .npy
+ELEMENTOS_POR_COPIA = 1 << 22
+
+
+def huellas_filas(bloque):
+    """
+    Huellas (uint64) de cada fila de un bloque validado del CSV y del texto de su
+    polígono. Las columnas "Unnamed: ..." (el índice que pandas escribe al
+    guardar un CSV) no cuentan: numeran las filas y cambian con cualquier
+    inserción.
+
+    Cada columna se hashea con el tipo que le dio read_csv, sin pasarla a texto.
+    Si una columna cambia de tipo entre versiones (enteros que pasan a float
+    porque aparece un vacío) todas sus filas cuentan como modificadas: la
+    recarga hace más trabajo, pero el resultado es el mismo.
+    """
+    columnas = [c for c in bloque.columns if not str(c).startswith('Unnamed:')]
+    filas = pd.util.hash_pandas_object(bloque[columnas], index=False).to_numpy()
+    if 'poligono' in bloque.columns:
+        poligonos = pd.util.hash_pandas_object(bloque['poligono'], index=False).to_numpy()
+    else:
+        poligonos = np.zeros(len(bloque), dtype=np.uint64)
+    return filas, poligonos
+
+
+def directorio_cache(ruta_csv):
+    """Directorio donde se guardan las versiones del artefacto de un CSV"""
+    return os.path.abspath(ruta_csv) + '.cache'
+
+
+@functools.lru_cache(maxsize=8)
+def _hash_archivo(ruta_absoluta, tamano, mtime_ns):
+    """SHA-256 del archivo; el tamaño y la fecha sólo forman parte de la clave del caché"""
+    digest = hashlib.sha256()
+    with open(ruta_absoluta, 'rb') as archivo:
+        for bloque in iter(lambda: archivo.read(1 << 20), b''):
+            digest.update(bloque)
+    return digest.hexdigest()
+
+
+def huella_csv(ruta_csv):
+    """Devuelve (tamaño, mtime_ns, sha256) del CSV"""
+    ruta_absoluta = os.path.abspath(ruta_csv)
+    estado = os.stat(ruta_absoluta)
+    return estado.st_size, estado.st_mtime_ns, _hash_archivo(
+        ruta_absoluta, estado.st_size, estado.st_mtime_ns
+    )
+
+
+def _directorio_version(ruta_csv, sha256):
+    return os.path.join(directorio_cache(ruta_csv), f"v{VERSION_FORMATO}-{sha256}")
+
+
+def _guardar_tabla(directorio, datos):
+    """
+    Guarda cada columna como .npy: las fechas como enteros (ns desde 1970) y las
+    de texto como códigos + categorías
+    """
+    columnas = []
+    for nombre in datos.columns:
+        serie = datos[nombre]
+        archivo = f"columna_{len(columnas)}"
+
+        if serie.dtype.kind == 'M':
+            np.save(
+                os.path.join(directorio, f"{archivo}.npy"),
+                serie.to_numpy(dtype='datetime64[ns]').view(np.int64)
+            )
+            columnas.append({'nombre': nombre, 'archivo': archivo, 'tipo': 'fecha'})
+        elif serie.dtype.kind in 'biuf':
+            np.save(os.path.join(directorio, f"{archivo}.npy"), serie.to_numpy())
+            columnas.append({'nombre': nombre, 'archivo': archivo, 'tipo': 'numerico'})
+        else:
+            codigos, categorias = pd.factorize(serie)
+            np.save(os.path.join(directorio, f"{archivo}.npy"), codigos.astype(np.int32))
+            np.save(
+                os.path.join(directorio, f"{archivo}_categorias.npy"),
+                np.asarray(categorias.astype(str), dtype=str)
+            )
+            columnas.append({'nombre': nombre, 'archivo': archivo, 'tipo': 'texto'})
+
+    return columnas
+
+
+def _leer_tabla(directorio, columnas):
+    """
+    Reconstruye la tabla a partir de las columnas guardadas; las de texto quedan
+    como categorías sobre los mismos códigos, sin materializar los strings
+    """
+    datos = {}
+    for columna in columnas:
+        ruta = os.path.join(directorio, f"{columna['archivo']}.npy")
+        if columna['tipo'] == 'numerico':
+            datos[columna['nombre']] = np.load(ruta, mmap_mode='r')
+        elif columna['tipo'] == 'fecha':
+            datos[columna['nombre']] = np.load(ruta, mmap_mode='r').view('datetime64[ns]')
+        else:
+            codigos = np.load(ruta, mmap_mode='r')
+            categorias = np.load(os.path.join(directorio, f"{columna['archivo']}_categorias.npy"))
+            # El código -1 es el nulo también para pd.Categorical
+            datos[columna['nombre']] = pd.Categorical.from_codes(
+                codigos, categories=pd.Index(categorias.astype(object))
+            )
+
+    return pd.DataFrame(datos)
+
+
+def _escribir_manifiesto(directorio, huella, filas, columnas, grilla):
+    tamano, mtime_ns, sha256 = huella
+    manifiesto = {
+        'version': VERSION_FORMATO,
+        'csv': {'tamano': tamano, 'mtime_ns': mtime_ns, 'sha256': sha256},
+        'filas': filas,
+        'columnas': columnas,
+        'grilla': {
+            'tamano_celda': grilla.tamano_celda,
+            'lat_origen': grilla.lat_origen,
+            'lon_origen': grilla.lon_origen,
+            'filas': grilla.filas,
+            'columnas': grilla.columnas,
+        },
+    }
+    with open(os.path.join(directorio, 'manifiesto.json'), 'w', encoding='utf-8') as archivo:
+        json.dump(manifiesto, archivo, ensure_ascii=False, indent=2)
+
+
+def guardar_preprocesado(ruta_csv, datos, indice, huella=None, huellas=None):
+    """
+    Escribe el artefacto de la tabla (sin la columna de texto 'poligono'), del
+    índice y, si se pasan, de las huellas (filas, polígonos) del CSV. Se
+    escribe en un directorio temporal y se renombra al final, de modo que otro
+    proceso nunca lee un artefacto a medio escribir.
+    """
+    tamano, mtime_ns, sha256 = huella or huella_csv(ruta_csv)
+    destino = _directorio_version(ruta_csv, sha256)
+    if os.path.isdir(destino):
+        return destino
+
+    os.makedirs(directorio_cache(ruta_csv), exist_ok=True)
+    temporal = tempfile.mkdtemp(prefix='.tmp-', dir=directorio_cache(ruta_csv))
+    try:
+        columnas = _guardar_tabla(temporal, datos.drop(columns=['poligono'], errors='ignore'))
+
+        arreglos = {
+            'coordenadas': indice.poligonos.coordenadas,
+            'offsets': indice.poligonos.offsets,
+            'envolventes': indice.poligonos.envolventes,
+            'centroides': indice.poligonos.centroides,
+            'areas_ha': indice.poligonos.areas_ha,
+            'grilla_celdas': indice.grilla.celdas,
+            'grilla_posiciones': indice.grilla.posiciones,
+        }
+        if huellas is not None:
+            arreglos['huellas_fila'], arreglos['huellas_poligono'] = huellas
+        for nombre, arreglo in arreglos.items():
+            np.save(os.path.join(temporal, f"{nombre}.npy"), np.ascontiguousarray(arreglo))
+
+        _escribir_manifiesto(temporal, (tamano, mtime_ns, sha256), len(datos), columnas, indice.grilla)
+
+        _publicar(temporal, destino)
+    except BaseException:
+        shutil.rmtree(temporal, ignore_errors=True)
+        raise
+
+    _descartar_versiones_anteriores(ruta_csv, destino)
+    return destino
+
+
+def _descartar_versiones_anteriores(ruta_csv, destino):
+    for nombre in os.listdir(directorio_cache(ruta_csv)):
+        ruta = os.path.join(directorio_cache(ruta_csv), nombre)
+        if ruta != destino and not nombre.startswith('.tmp-'):
+            shutil.rmtree(ruta, ignore_errors=True)
+
+
+def _publicar(temporal, destino):
+    """Renombra el directorio temporal a su versión; si otro proceso ganó, lo descarta"""
+    try:
+        os.rename(temporal, destino)
+    except OSError:
+        shutil.rmtree(temporal, ignore_errors=True)
+
+
+def filas_por_bloque(ruta_csv, memoria_maxima_mb=MEMORIA_MAXIMA_MB, filas_muestra=1000):
+    """
+    Cantidad de filas por bloque para que interpretar un bloque del CSV no supere
+    memoria_maxima_mb, estimada a partir de la memoria de las primeras filas.
+    """
+    muestra = pd.read_csv(ruta_csv, nrows=filas_muestra)
+    if muestra.empty:
+        return filas_muestra
+    bytes_por_fila = muestra.memory_usage(deep=True).sum() / len(muestra) * FACTOR_MEMORIA_BLOQUE
+    return max(100, int(memoria_maxima_mb * 1024 * 1024 / bytes_por_fila))
+
+
+def _binario_a_npy(ruta_binario, ruta_npy, dtype, tipo_destino=None, ancho=None):
+    """Copia por partes un archivo binario crudo a un .npy y borra el binario"""
+    tipo_destino = tipo_destino or dtype
+    forma = (-1, ancho) if ancho else (-1,)
+    if os.path.getsize(ruta_binario) == 0:
+        np.save(ruta_npy, np.empty((0, ancho) if ancho else 0, dtype=tipo_destino))
+    else:
+        origen = np.memmap(ruta_binario, dtype=dtype, mode='r').reshape(forma)
+        destino = np.lib.format.open_memmap(ruta_npy, mode='w+', dtype=tipo_destino, shape=origen.shape)
+        paso = max(1, ELEMENTOS_POR_COPIA // (ancho or 1))
+        for inicio in range(0, len(origen), paso):
+            destino[inicio:inicio + paso] = origen[inicio:inicio + paso]
+        destino.flush()
+        del origen, destino
+    os.remove(ruta_binario)
+
+
+class _ColumnaEnDisco:
+    """
+    Columna de la tabla que se escribe bloque a bloque en un archivo binario.
+
+    El tipo lo define el primer bloque: las fechas se guardan como int64 (ns
+    desde 1970), las columnas numéricas como float64 (y se pasan a int64 al
+    cerrar si todos los bloques fueron enteros) y las demás, incluidas las que
+    llegan vacías en el primer bloque, como códigos int32 sobre un diccionario
+    de categorías común a todos los bloques.
+    """
+
+    def __init__(self, directorio, nombre, archivo, primer_bloque):
+        self.nombre = nombre
+        self.archivo = archivo
+        self.ruta = os.path.join(directorio, f"{archivo}.bin")
+        self.fecha = primer_bloque.dtype.kind == 'M'
+        self.numerica = primer_bloque.dtype.kind in 'biuf' and primer_bloque.notna().any()
+        self.enteros = True
+        self.perdidos = 0
+        self.categorias = {}
+        self.salida = open(self.ruta, 'wb')
+
+    def agregar(self, serie):
+        if self.fecha:
+            self.salida.write(serie.to_numpy(dtype='datetime64[ns]').view(np.int64).tobytes())
+            return
+
+        if self.numerica:
+            valores = pd.to_numeric(serie, errors='coerce')
+            self.perdidos += int((valores.isna() & serie.notna()).sum())
+            self.enteros &= serie.dtype.kind in 'iu'
+            self.salida.write(valores.to_numpy(dtype=np.float64).tobytes())
+            return
+
+        codigos, unicos = pd.factorize(serie)
+        globales = np.array(
+            [self.categorias.setdefault(str(valor), len(self.categorias)) for valor in unicos] + [-1],
+            dtype=np.int32
+        )
+        # El código local -1 (nulo) toma el último elemento, que es -1
+        self.salida.write(globales[codigos].tobytes())
+
+    def cerrar(self, directorio):
+        """Pasa la columna a .npy y devuelve su descripción para el manifiesto"""
+        self.salida.close()
+        ruta_npy = os.path.join(directorio, f"{self.archivo}.npy")
+        if self.fecha:
+            _binario_a_npy(self.ruta, ruta_npy, np.int64)
+            return {'nombre': self.nombre, 'archivo': self.archivo, 'tipo': 'fecha'}
+
+        if self.numerica:
+            _binario_a_npy(self.ruta, ruta_npy, np.float64, np.int64 if self.enteros else None)
+            return {'nombre': self.nombre, 'archivo': self.archivo, 'tipo': 'numerico'}
+
+        _binario_a_npy(self.ruta, ruta_npy, np.int32)
+        np.save(
+            os.path.join(directorio, f"{self.archivo}_categorias.npy"),
+            np.asarray(list(self.categorias), dtype=str)
+        )
+        return {'nombre': self.nombre, 'archivo': self.archivo, 'tipo': 'texto'}
+
+
+def _como_categoria(serie):
+    """Columna de un bloque como categorías de texto, como las guarda _ColumnaEnDisco"""
+    if isinstance(serie.dtype, pd.CategoricalDtype) and serie.cat.categories.dtype.kind in 'OU':
+        return serie
+    return serie.astype(object).map(str, na_action='ignore').astype('category')
+
+
+def concatenar_bloques(bloques):
+    """
+    Une bloques ya compactados del CSV en una sola tabla con los mismos tipos que
+    la tabla abierta del artefacto: el primer bloque define el tipo de cada
+    columna (ver _ColumnaEnDisco) y las categorías de texto se unen con
+    union_categoricals, sin pasar nunca la tabla completa a objetos Python.
+    """
+    columnas = {}
+    for nombre in bloques[0].columns:
+        series = [bloque[nombre] for bloque in bloques]
+        primera = series[0]
+        if primera.dtype.kind == 'M':
+            columnas[nombre] = pd.concat(series, ignore_index=True)
+        elif primera.dtype.kind in 'biuf' and primera.notna().any():
+            enteros = all(serie.dtype.kind in 'iu' for serie in series)
+            valores = pd.concat([pd.to_numeric(serie, errors='coerce') for serie in series], ignore_index=True)
+            columnas[nombre] = valores.astype(np.int64 if enteros else np.float64)
+        else:
+            columnas[nombre] = pd.Series(pd.api.types.union_categoricals(
+                [_como_categoria(serie) for serie in series], ignore_order=True
+            ))
+    return pd.DataFrame(columnas, columns=bloques[0].columns)
+
+
+@medido('ingerir_csv')
+def ingerir_csv(ruta_csv, memoria_maxima_mb=MEMORIA_MAXIMA_MB, tamano_celda_grados=TAMANO_CELDA_GRADOS,
+                huella=None, trabajadores=1):
+    """
+    Genera el artefacto leyendo el CSV por bloques, sin tenerlo nunca completo
+    en memoria. Cada bloque se valida, se interpretan sus polígonos y se agrega
+    a los archivos del artefacto; al final se arma la grilla a partir de las
+    coordenadas ya escritas. Devuelve el directorio de la versión.
+    """
+    tamano, mtime_ns, sha256 = huella or huella_csv(ruta_csv)
+    destino = _directorio_version(ruta_csv, sha256)
+    if os.path.isdir(destino):
+        return destino
+
+    os.makedirs(directorio_cache(ruta_csv), exist_ok=True)
+    temporal = tempfile.mkdtemp(prefix='.tmp-', dir=directorio_cache(ruta_csv))
+    columnas = None
+    archivos = {}
+    try:
+        for nombre in ('coordenadas', 'offsets', 'envolventes', 'centroides', 'areas_ha',
+                       'huellas_fila', 'huellas_poligono'):
+            archivos[nombre] = open(os.path.join(temporal, f"{nombre}.bin"), 'wb')
+        archivos['offsets'].write(np.zeros(1, dtype=np.int64).tobytes())
+
+        filas = coordenadas = 0
+        for bloque in pd.read_csv(ruta_csv, chunksize=filas_por_bloque(ruta_csv, memoria_maxima_mb)):
+            bloque = validar_productores(bloque, ruta_csv)
+            for nombre, huellas in zip(('huellas_fila', 'huellas_poligono'), huellas_filas(bloque)):
+                archivos[nombre].write(huellas.tobytes())
+            bloque = compactar_productores(bloque)
+
+            if 'poligono' in bloque.columns:
+                poligonos = parsear_poligonos(bloque['poligono'], trabajadores)
+                bloque = bloque.drop(columns=['poligono'])
+            else:
+                poligonos = Poligonos(np.empty((0, 2)), np.zeros(len(bloque) + 1, dtype=np.int64))
+
+            if columnas is None:
+                columnas = [
+                    _ColumnaEnDisco(temporal, nombre, f"columna_{i}", bloque[nombre])
+                    for i, nombre in enumerate(bloque.columns)
+                ]
+            for columna in columnas:
+                columna.agregar(bloque[columna.nombre])
+
+            archivos['coordenadas'].write(poligonos.coordenadas.tobytes())
+            archivos['offsets'].write((poligonos.offsets[1:] + coordenadas).tobytes())
+            archivos['envolventes'].write(poligonos.envolventes.tobytes())
+            archivos['centroides'].write(poligonos.centroides.tobytes())
+            archivos['areas_ha'].write(poligonos.areas_ha.tobytes())
+            filas += len(bloque)
+            coordenadas += len(poligonos.coordenadas)
+
+        if filas == 0:
+            # Según la versión de pandas, un CSV con sólo el encabezado produce un
+            # bloque vacío o ninguno; en los dos casos no hay registro que guardar
+            raise ValueError(f"El registro {ruta_csv} no tiene filas con coordenadas")
+
+        for archivo in archivos.values():
+            archivo.close()
+        descripciones = [columna.cerrar(temporal) for columna in columnas]
+        for columna in columnas:
+            if columna.perdidos:
+                warnings.warn(f"La columna '{columna.nombre}' tenía {columna.perdidos} valores "
+                              f"no numéricos que se guardaron como nulos")
+
+        tipos = {'offsets': np.int64, 'huellas_fila': np.uint64, 'huellas_poligono': np.uint64}
+        for nombre, ancho in (('coordenadas', 2), ('offsets', None), ('envolventes', 4),
+                              ('centroides', 2), ('areas_ha', None), ('huellas_fila', None),
+                              ('huellas_poligono', None)):
+            _binario_a_npy(
+                os.path.join(temporal, f"{nombre}.bin"), os.path.join(temporal, f"{nombre}.npy"),
+                tipos.get(nombre, np.float64), ancho=ancho
+            )
+
+        # La grilla necesita todas las coordenadas: dos float64 por parcela
+        tabla = _leer_tabla(temporal, [d for d in descripciones if d['nombre'] in ('latitud', 'longitud')])
+        grilla = IndiceGrilla(
+            tabla['latitud'].to_numpy(dtype=np.float64),
+            tabla['longitud'].to_numpy(dtype=np.float64),
+            tamano_celda_grados
+        )
+        np.save(os.path.join(temporal, 'grilla_celdas.npy'), grilla.celdas)
+        np.save(os.path.join(temporal, 'grilla_posiciones.npy'), grilla.posiciones)
+
+        _escribir_manifiesto(temporal, (tamano, mtime_ns, sha256), filas, descripciones, grilla)
+
+        _publicar(temporal, destino)
+    except BaseException:
+        for archivo in archivos.values():
+            archivo.close()
+        for columna in columnas or []:
+            columna.salida.close()
+        shutil.rmtree(temporal, ignore_errors=True)
+        raise
+
+    _descartar_versiones_anteriores(ruta_csv, destino)
+    return destino
+
+
+@medido('leer_preprocesado')
+def leer_preprocesado(ruta_csv, tamano_celda_grados=TAMANO_CELDA_GRADOS, huella=None):
+    """
+    Abre el artefacto vigente del CSV y devuelve (datos, indice), o None si no
+    existe un artefacto para el contenido actual del CSV.
+    """
+    tamano, mtime_ns, sha256 = huella or huella_csv(ruta_csv)
+    directorio = _directorio_version(ruta_csv, sha256)
+    ruta_manifiesto = os.path.join(directorio, 'manifiesto.json')
+    if not os.path.isfile(ruta_manifiesto):
+        return None
+
+    with open(ruta_manifiesto, encoding='utf-8') as archivo:
+        manifiesto = json.load(archivo)
+    if manifiesto.get('version') != VERSION_FORMATO or manifiesto['csv']['sha256'] != sha256:
+        return None
+
+    def cargar(nombre):
+        return np.load(os.path.join(directorio, f"{nombre}.npy"), mmap_mode='r')
+
+    datos = _leer_tabla(directorio, manifiesto['columnas'])
+    poligonos = Poligonos(
+        cargar('coordenadas'), cargar('offsets'), cargar('envolventes'), cargar('centroides'),
+        cargar('areas_ha')
+    )
+    grilla = IndiceGrilla.desde_arreglos(
+        celdas=cargar('grilla_celdas'),
+        posiciones=cargar('grilla_posiciones'),
+        **manifiesto['grilla']
+    )
+
+    return datos, IndiceEspacial(datos, tamano_celda_grados, poligonos=poligonos, grilla=grilla)
+
+
+def leer_huellas(ruta_csv, huella=None):
+    """
+    Huellas (filas, polígonos) del artefacto vigente del CSV, alineadas con sus
+    filas, o None si no hay artefacto o no las tiene
+    """
+    directorio = _directorio_version(ruta_csv, (huella or huella_csv(ruta_csv))[2])
+    rutas = [os.path.join(directorio, f"{nombre}.npy") for nombre in ('huellas_fila', 'huellas_poligono')]
+    if not all(os.path.isfile(ruta) for ruta in rutas):
+        return None
+    return tuple(np.load(ruta, mmap_mode='r') for ruta in rutas)
+
+
+@medido('cargar_o_preprocesar')
+def cargar_o_preprocesar(ruta_csv, tamano_celda_grados=TAMANO_CELDA_GRADOS, trabajadores=1,
+                         memoria_maxima_mb=MEMORIA_MAXIMA_MB):
+    """
+    Devuelve (datos, indice) desde el artefacto vigente; si no lo hay, lo genera
+    leyendo el CSV por bloques (con memoria_maxima_mb por bloque y los polígonos
+    repartidos entre trabajadores procesos) y lo abre.
+    """
+    huella = huella_csv(ruta_csv)
+
+    preprocesado = leer_preprocesado(ruta_csv, tamano_celda_grados, huella)
+    if preprocesado is not None:
+        return preprocesado
+
+    try:
+        ingerir_csv(ruta_csv, memoria_maxima_mb, tamano_celda_grados, huella, trabajadores)
+    except OSError as e:
+        # Sin permisos de escritura se sigue funcionando, sólo que sin artefacto
+        # y con el CSV completo en memoria
+        warnings.warn(f"No se pudo guardar el artefacto preprocesado: {e}")
+        datos = leer_csv(ruta_csv)
+        indice = IndiceEspacial(datos, tamano_celda_grados, trabajadores=trabajadores)
+        return datos.drop(columns=['poligono'], errors='ignore'), indice
+
+    return leer_preprocesado(ruta_csv, tamano_celda_grados, huella)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera el artefacto preprocesado del CSV de productores")
+    parser.add_argument('ruta_csv', nargs='?', default='datos_productores.csv')
+    parser.add_argument('--celda', type=float, default=TAMANO_CELDA_GRADOS,
+                        help="tamaño de celda de la grilla, en grados")
+    parser.add_argument('--trabajadores', type=int, default=1,
+                        help="procesos para interpretar los polígonos (0 = todos los núcleos)")
+    parser.add_argument('--memoria-maxima', type=float, default=MEMORIA_MAXIMA_MB,
+                        help="memoria máxima para interpretar cada bloque del CSV, en MB")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    destino = ingerir_csv(
+        args.ruta_csv, args.memoria_maxima, args.celda, trabajadores=args.trabajadores
+    )
+    with open(os.path.join(destino, 'manifiesto.json'), encoding='utf-8') as archivo:
+        filas = json.load(archivo)['filas']
+    print(f"Artefacto escrito en {destino} ({filas} parcelas, "
+          f"{time.perf_counter() - inicio:.1f} s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,31 @@
 import streamlit as st
 import pandas as pd
-import math
 import os
 import json
+import pickle
+import time
+import datetime
 import folium
-from folium.plugins import Draw, Geocoder
 from streamlit_folium import st_folium
-import re
-from shapely.geometry import Point, Polygon
-import branca.colormap as cm
+
+from buscador import IndiceTexto
+from lote import TAMANO_BLOQUE, geolocalizar_lote
+from mapa import (
+    UMBRAL_RESULTADOS_SIMPLIFICADO, agregar_area, agregar_vista_general, crear_capa_resultados,
+    crear_mapa_base, leyenda_distancias_html, visualizar_resultados,
+    visualizar_resultados_simplificados
+)
+from motor import (
+    TAMANO_CELDA_GRADOS, IndiceEspacial, armar_resultados, calcular_distancias_km,
+    compactar_productores, encontrar_parcelas_en_area, reporte_memoria, resultados_de_busqueda,
+    superficie_por_productor
+)
+from metricas import REGISTRO, medir
+from recarga import RegistroVivo
+from vista_general import VistaGeneral, limites_de_folium
+
+# Inicio del rerun, para medir su duración total
+inicio_rerun = time.perf_counter()
 
 # Configuración de la página
 st.set_page_config(
@@ -39,6 +56,27 @@ Seleccione un punto en el mapa o ingrese coordenadas para encontrar parcelas cer
 # Ruta al archivo CSV
 RUTA_CSV = "datos_productores.csv"
 
+# Cantidad máxima de búsquedas (punto, radio) guardadas en el caché compartido
+MAX_BUSQUEDAS_EN_CACHE = 256
+
+# Máximo del radio de búsqueda
+RADIO_MAXIMO_KM = 500.0
+
+# El ranking de cada punto se calcula hasta este múltiplo del radio pedido: los
+# cambios de radio dentro de él sólo lo recortan y los que lo superan calculan
+# un ranking nuevo
+FACTOR_RADIO_RANKING = 4
+
+# Máximo de productores en la búsqueda de los más cercanos
+MAX_PRODUCTORES_CERCANOS = 200
+
+# Vista con la que se arma el mapa base; después la vista se mueve con center/zoom de st_folium
+CENTRO_MAPA_INICIAL = (-36.0, -62.0)  # Centro aproximado de la región
+ZOOM_INICIAL = 10
+
+# Datos del mapa que provocan un rerun: mover el mapa sin cambiar el zoom no recalcula nada
+OBJETOS_DEVUELTOS_MAPA = ['zoom', 'last_clicked', 'last_active_drawing']
+
 # Inicializar variables de estado
 if 'punto_seleccionado' not in st.session_state:
     st.session_state.punto_seleccionado = None
@@ -47,105 +85,21 @@ if 'radio_busqueda' not in st.session_state:
 if 'mostrar_resultado' not in st.session_state:
     st.session_state.mostrar_resultado = False
 if 'lat' not in st.session_state:
-    st.session_state.lat = -36.0  # Centro aproximado de la región
-if 'lon' not in st.session_state:
-    st.session_state.lon = -62.0
+    st.session_state.lat, st.session_state.lon = CENTRO_MAPA_INICIAL
 if 'search_results' not in st.session_state:
-    st.session_state.search_results = []
+    st.session_state.search_results = pd.DataFrame()
+if 'area_dibujada' not in st.session_state:
+    st.session_state.area_dibujada = None  # Polígono o rectángulo dibujado (GeoJSON)
+    st.session_state.ultimo_dibujo = None
+    st.session_state.consulta_area = None  # (clave, resultados) de la última consulta del área
+if 'productor_buscado' not in st.session_state:
+    st.session_state.productor_buscado = None  # CUIT elegido en la búsqueda por texto
+if 'zoom' not in st.session_state:
+    st.session_state.zoom = ZOOM_INICIAL
+if 'ultimo_clic' not in st.session_state:
+    st.session_state.ultimo_clic = None  # El mapa conserva su último clic entre reruns
 
 # Funciones básicas
-def calcular_distancia_km(lat1, lon1, lat2, lon2):
-    """Calcula la distancia en kilómetros entre dos puntos usando la fórmula de Haversine"""
-    # Radio de la Tierra en km
-    R = 6371.0
-    
-    # Convertir coordenadas a radianes
-    lat1_rad = math.radians(lat1)
-    lon1_rad = math.radians(lon1)
-    lat2_rad = math.radians(lat2)
-    lon2_rad = math.radians(lon2)
-    
-    # Diferencias de latitud y longitud
-    dlon = lon2_rad - lon1_rad
-    dlat = lat2_rad - lat1_rad
-    
-    # Fórmula de Haversine
-    a = math.sin(dlat / 2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    distancia = R * c
-    
-    return distancia
-
-def formato_a_poligono(poligono_str):
-    """
-    Convertir el formato actual de polígonos (ya sea WKT o formato personalizado) 
-    a un formato que pueda usar Folium
-    """
-    if not poligono_str or not isinstance(poligono_str, str):
-        return None
-    
-    try:
-        # Primero verificar si es formato WKT
-        if poligono_str.strip().upper().startswith('POLYGON'):
-            # Extraer las coordenadas del polígono WKT
-            coords_str = poligono_str.replace('POLYGON', '').replace('((', '').replace('))', '').strip()
-            
-            # Separar las coordenadas por coma
-            coords_pares = coords_str.split(',')
-            
-            # Convertir a pares de [lat, lon] para Folium
-            coords = []
-            for par in coords_pares:
-                valores = par.strip().split()
-                if len(valores) >= 2:
-                    # En WKT es lon lat, pero en Folium necesitamos lat lon
-                    lon, lat = float(valores[0]), float(valores[1])
-                    coords.append([lat, lon])
-        else:
-            # Intentar formato alternativo como "(lat,lon), (lat,lon)..."
-            coords_pattern = r'\(([^)]+)\)'
-            coords_matches = re.findall(coords_pattern, poligono_str)
-            
-            if not coords_matches:
-                return None
-            
-            coords = []
-            for coord_pair in coords_matches:
-                try:
-                    lat, lon = map(float, coord_pair.split(','))
-                    coords.append([lat, lon])  # Folium usa [lat, lon]
-                except:
-                    continue
-        
-        return coords if coords else None
-    except Exception as e:
-        st.error(f"Error al procesar polígono: {str(e)}")
-        return None
-
-def punto_en_poligono(point, polygon):
-    """
-    Verifica si un punto está dentro de un polígono usando Shapely.
-    Point es una tupla (lon, lat) y polygon es una lista de coordenadas [[lat, lon], ...]
-    """
-    if polygon is None or not polygon:
-        return False
-    
-    try:
-        # Crear objeto Point de Shapely (x=lon, y=lat)
-        point_obj = Point(point)
-        
-        # Convertir Folium polygon [lat, lon] a formato Shapely [lon, lat]
-        shapely_coords = [(coord[1], coord[0]) for coord in polygon]
-        
-        # Crear objeto Polygon de Shapely
-        polygon_obj = Polygon(shapely_coords)
-        
-        # Verificar si el punto está dentro del polígono
-        return polygon_obj.contains(point_obj)
-    except Exception as e:
-        st.error(f"Error al verificar punto en polígono: {str(e)}")
-        return False
-
 def crear_datos_ejemplo():
     """Crea datos de ejemplo cuando no se puede cargar el CSV"""
     st.info("Usando datos de ejemplo para demostración")
@@ -165,266 +119,246 @@ def crear_datos_ejemplo():
         ]
     })
 
-@st.cache_data
-def cargar_datos(ruta_archivo=RUTA_CSV):
-    """Carga los datos de productores desde un archivo CSV"""
+def _datos_ejemplo_indexados(tamano_celda_grados):
+    datos = compactar_productores(crear_datos_ejemplo())
+    return datos, IndiceEspacial(datos, tamano_celda_grados)
+
+def _abrir_registro(ruta_archivo, tamano_celda_grados):
     try:
         # Verificar si el archivo existe
         if not os.path.exists(ruta_archivo):
-            return crear_datos_ejemplo()
-        
-        # Cargar el CSV
-        df = pd.read_csv(ruta_archivo)
-        
-        # Verificar las columnas necesarias
-        columnas_requeridas = ['cuit', 'titular', 'latitud', 'longitud']
-        columnas_faltantes = [col for col in columnas_requeridas if col not in df.columns]
-        
-        if columnas_faltantes:
-            return crear_datos_ejemplo()
-
-        # Asegurarse de que las coordenadas sean numéricas
-        df['latitud'] = pd.to_numeric(df['latitud'], errors='coerce')
-        df['longitud'] = pd.to_numeric(df['longitud'], errors='coerce')
-        
-        # Formatear los polígonos
-        if 'poligono' in df.columns:
-            df['poligono_formatted'] = df['poligono'].apply(formato_a_poligono)
-        
-        # Eliminar filas con coordenadas nulas
-        df = df.dropna(subset=['latitud', 'longitud'])
+            return RegistroVivo(ruta_archivo, *_datos_ejemplo_indexados(tamano_celda_grados))
         
-        return df
+        return RegistroVivo.abrir(ruta_archivo, tamano_celda_grados, MAX_BUSQUEDAS_EN_CACHE)
+    except ValueError:
+        # Faltan columnas necesarias en el CSV
+        return RegistroVivo(ruta_archivo, *_datos_ejemplo_indexados(tamano_celda_grados))
     except Exception as e:
         st.error(f"Error al cargar los datos: {str(e)}")
-        return crear_datos_ejemplo()
+        return RegistroVivo(ruta_archivo, *_datos_ejemplo_indexados(tamano_celda_grados))
 
-def encontrar_productor_contenedor(lat, lon, datos):
-    """Encuentra el productor cuyo polígono contiene el punto dado"""
-    productor_contenedor = None
-    
-    if 'poligono_formatted' in datos.columns:
-        for idx, fila in datos.iterrows():
-            if pd.notna(fila['poligono_formatted']):
-                if punto_en_poligono((lon, lat), fila['poligono_formatted']):
-                    productor_contenedor = {
-                        'cuit': fila['cuit'],
-                        'titular': fila['titular'] if 'titular' in fila else 'No disponible',
-                        'renspa': fila['renspa'] if 'renspa' in fila else 'No disponible',
-                        'localidad': fila['localidad'] if 'localidad' in fila else 'No disponible',
-                        'superficie': fila['superficie'] if 'superficie' in fila else 'No disponible',
-                        'distancia': 0,  # Distancia 0 porque está dentro del polígono
-                        'latitud': fila['latitud'],
-                        'longitud': fila['longitud'],
-                        'poligono_formatted': fila['poligono_formatted'],
-                        'dentro_poligono': True
-                    }
-                    break
-    
-    return productor_contenedor
+@st.cache_resource
+def obtener_registro(ruta_archivo=RUTA_CSV, tamano_celda_grados=TAMANO_CELDA_GRADOS):
+    """
+    Carga la tabla de productores y sus índices espaciales (STRtree de polígonos y
+    grilla de la búsqueda por radio), desde el artefacto binario preprocesado si
+    está vigente o interpretando el CSV en bloque, y vigila el CSV para recargarlo
+    cuando cambia.
 
-def encontrar_productores_cercanos(lat, lon, datos, radio_km=10):
-    """Encuentra productores cercanos a un punto dado dentro de un radio específico."""
-    cercanos = []
-    # Para agrupar por CUIT
-    cuits_encontrados = set()
-    
-    # Primero verificar si está dentro de algún polígono
-    productor_contenedor = encontrar_productor_contenedor(lat, lon, datos)
-    if productor_contenedor:
-        cercanos.append(productor_contenedor)
-        cuits_encontrados.add(productor_contenedor['cuit'])
-    
-    # Buscar otros productores cercanos por distancia
-    for idx, fila in datos.iterrows():
-        if pd.notna(fila['latitud']) and pd.notna(fila['longitud']):
-            # Si ya encontramos este CUIT, saltarlo
-            if fila['cuit'] in cuits_encontrados:
-                continue
-                
-            # Calcular distancia
-            distancia = calcular_distancia_km(
-                lat, lon, 
-                fila['latitud'], fila['longitud']
-            )
-            
-            if distancia <= radio_km:
-                # Agregar a resultado y marcar como encontrado
-                cercanos.append({
-                    'cuit': fila['cuit'],
-                    'titular': fila['titular'] if 'titular' in fila else 'No disponible',
-                    'renspa': fila['renspa'] if 'renspa' in fila else 'No disponible',
-                    'localidad': fila['localidad'] if 'localidad' in fila else 'No disponible',
-                    'superficie': fila['superficie'] if 'superficie' in fila else 'No disponible',
-                    'distancia': round(distancia, 2),
-                    'latitud': fila['latitud'],
-                    'longitud': fila['longitud'],
-                    'poligono_formatted': fila.get('poligono_formatted', None),
-                    'dentro_poligono': False
-                })
-                cuits_encontrados.add(fila['cuit'])
-    
-    # Ordenar por distancia
-    cercanos = sorted(cercanos, key=lambda x: x['distancia'])
-    
-    return cercanos
+    Es un recurso único por proceso: todas las sesiones y reruns comparten el mismo
+    objeto, sin copiarlo ni volver a calcular su hash. Cada versión del registro es
+    de solo lectura; los arreglos del índice quedan marcados como no modificables.
+    Si el CSV no existe o no es válido se usan los datos de ejemplo hasta que
+    aparezca un CSV válido.
+    """
+    with medir('cargar_datos'):
+        registro = _abrir_registro(ruta_archivo, tamano_celda_grados)
+    return registro.vigilar()
 
-# Función para crear mapa base
-def crear_mapa_base(lat, lon, zoom=10):
-    m = folium.Map(location=[lat, lon], zoom_start=zoom, tiles='CartoDB positron')
-    
-    # Añadir control de dibujo
-    draw = Draw(
-        draw_options={
-            'polyline': False,
-            'rectangle': False,
-            'polygon': False,
-            'circle': False,
-            'circlemarker': False,
-            'marker': True
-        },
-        edit_options={'edit': False}
-    )
-    draw.add_to(m)
-    
-    # Añadir buscador geocoder
-    Geocoder().add_to(m)
-    
-    # Añadir capas base adicionales
-    folium.TileLayer('CartoDB dark_matter', name='Dark Mode').add_to(m)
-    folium.TileLayer('https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}',
-                   name='Satellite', attr='Esri').add_to(m)
-    folium.TileLayer('https://mt1.google.com/vt/lyrs=m&x={x}&y={y}&z={z}',
-                   name='Google Map', attr='Google').add_to(m)
-    
-    # Añadir control de capas
-    folium.LayerControl().add_to(m)
-    
-    # Añadir escala
-    folium.plugins.MeasureControl(position='bottomleft').add_to(m)
-    
-    return m
-
-# Función para visualizar resultados en el mapa
-def visualizar_resultados(m, point, resultados, radio_km):
-    # Añadir marcador para el punto seleccionado
-    folium.Marker(
-        location=point,
-        popup="Punto seleccionado",
-        icon=folium.Icon(color="red", icon="crosshairs", prefix="fa")
-    ).add_to(m)
-    
-    # Añadir círculo para el radio de búsqueda
-    folium.Circle(
-        location=point,
-        radius=radio_km * 1000,  # Convertir a metros
-        color="#2c6e49",
-        fill=True,
-        fill_opacity=0.1
-    ).add_to(m)
-    
-    # Crear mapa de colores para los polígonos según la distancia
-    colormap = cm.LinearColormap(
-        colors=['green', 'yellow', 'orange', 'red'],
-        index=[0, radio_km/3, 2*radio_km/3, radio_km],
-        vmin=0,
-        vmax=radio_km
-    )
-    
-    # Añadir marcadores y polígonos para los productores cercanos
-    for productor in resultados:
-        # Definir icono según si el punto está dentro del polígono
-        icon_color = "green" if productor.get('dentro_poligono', False) else "blue"
-        icon_symbol = "check" if productor.get('dentro_poligono', False) else "info"
-        
-        # Añadir marcador
-        folium.Marker(
-            location=[productor['latitud'], productor['longitud']],
-            popup=folium.Popup(
-                f"""
-                <b>{productor['titular']}</b><br>
-                CUIT: {productor['cuit']}<br>
-                RENSPA: {productor.get('renspa', 'No disponible')}<br>
-                Localidad: {productor.get('localidad', 'No disponible')}<br>
-                Superficie: {productor.get('superficie', 'No disponible')} ha<br>
-                Distancia: {productor['distancia']} km
-                """,
-                max_width=300
-            ),
-            icon=folium.Icon(color=icon_color, icon=icon_symbol, prefix="fa"),
-            tooltip=f"{productor['titular']} - {productor['distancia']} km"
-        ).add_to(m)
-        
-        # Añadir polígono si está disponible
-        if productor.get('poligono_formatted') and len(productor['poligono_formatted']) > 2:
-            folium.Polygon(
-                locations=productor['poligono_formatted'],
-                popup=productor['titular'],
-                color=colormap(productor['distancia']),
-                fill=True,
-                fill_opacity=0.4,
-                weight=2
-            ).add_to(m)
-    
-    # Añadir leyenda de colores
-    colormap.caption = 'Distancia (km)'
-    colormap.add_to(m)
-    
-    return m
+def cargar_datos(ruta_archivo=RUTA_CSV):
+    """
+    Versión vigente del registro. Se toma una vez por rerun: aunque durante el
+    rerun se publique otra, todo el rerun usa la misma tabla, índice y caché.
+    """
+    return obtener_registro(ruta_archivo).actual()
+
+def obtener_indice_texto(version):
+    """Índice de búsqueda por texto de los productores, compartido por todas las sesiones"""
+    return version.derivado('indice_texto', lambda v: IndiceTexto(v.datos))
+
+def obtener_vista_general(version):
+    """Teselas agregadas del registro completo para el mapa general, compartidas por todas las sesiones"""
+    return version.derivado('vista_general', lambda v: VistaGeneral(v.datos, v.indice))
+
+def _copia_cache_data(datos):
+    """
+    Bytes y segundos de la copia que st.cache_data haría en cada rerun: guarda
+    el valor serializado con pickle y lo deserializa cada vez que se lee
+    """
+    serializada = pickle.dumps(datos)
+    inicio = time.perf_counter()
+    pickle.loads(serializada)
+    return len(serializada), time.perf_counter() - inicio
+
+def _resumen(version):
+    datos, indice = version.datos, version.indice
+    memoria_tabla = int(datos.memory_usage(deep=True).sum())
+    copia_bytes, copia_s = _copia_cache_data(datos)
+    return {
+        'parcelas': len(datos),
+        'productores': int(datos['cuit'].nunique()),
+        'poligonos': len(indice),
+        'memoria_tabla': memoria_tabla,
+        'memoria_indice': int(indice.memoria_bytes()),
+        'copia_cache_data_bytes': copia_bytes,
+        'copia_cache_data_s': copia_s,
+        'memoria_columnas': reporte_memoria(datos.drop(columns=['poligono'], errors='ignore')),
+    }
+
+def resumen_datos(version):
+    """Conteos y uso de memoria de los datos compartidos (se calculan una sola vez por versión)"""
+    return version.derivado('resumen', _resumen)
+
+def texto_superficie_poligono(productor):
+    """Línea de la superficie calculada del polígono, con aviso si no coincide con la declarada"""
+    if pd.isna(productor['superficie_poligono']):
+        return ""
+    aviso = " ⚠️ no coincide con la declarada" if productor['superficie_discrepante'] else ""
+    return f"**Superficie del polígono:** {productor['superficie_poligono']} ha{aviso}  "
+
+def memoria_proceso_bytes():
+    """Memoria residente (RSS) del proceso, o None si no se puede leer"""
+    try:
+        with open('/proc/self/statm') as archivo:
+            return int(archivo.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
 
 # Cargar datos
-datos_productores = cargar_datos()
+version_registro = cargar_datos()
+datos_productores, indice_espacial = version_registro.datos, version_registro.indice
+cache_busquedas = version_registro.cache
+indice_texto = obtener_indice_texto(version_registro)
+resumen = resumen_datos(version_registro)
 
 # Si hay datos, mostrar información básica
 if not datos_productores.empty:
-    # Contar CUITs únicos
-    cuits_unicos = datos_productores['cuit'].nunique()
-    st.success(f"Datos cargados correctamente: {len(datos_productores)} parcelas de {cuits_unicos} productores")
+    st.success(f"Datos cargados correctamente: {resumen['parcelas']} parcelas de {resumen['productores']} productores")
 
 # Panel lateral
 with st.sidebar:
     st.header("Configuración")
     
+    # Búsqueda dentro de un radio o de los k productores más cercanos, sin radio
+    modo_busqueda = st.radio("Buscar:", ["Dentro de un radio", "Los más cercanos"], horizontal=True)
+    cantidad_cercanos = None
+    if modo_busqueda == "Los más cercanos":
+        cantidad_cercanos = int(st.number_input(
+            "Cantidad de productores:", min_value=1, max_value=MAX_PRODUCTORES_CERCANOS, value=20, step=5
+        ))
+    
     # Radio de búsqueda
     radio_busqueda = st.slider(
         "Radio de búsqueda (km):",
         min_value=1.0,
-        max_value=500.0,
+        max_value=RADIO_MAXIMO_KM,
         value=st.session_state.radio_busqueda,
-        step=1.0
+        step=1.0,
+        disabled=cantidad_cercanos is not None
     )
     st.session_state.radio_busqueda = radio_busqueda
     
+    # Distancia hasta el borde de cada parcela o hasta su punto registrado
+    hasta_borde = st.checkbox(
+        "Medir hasta el borde de las parcelas", value=True,
+        help="Si no, la distancia se mide hasta la coordenada registrada de cada parcela"
+    )
+    
+    # Vigencia: las parcelas dadas de baja se descartan antes de buscar
+    vigencia = st.radio(
+        "Parcelas:",
+        ["Vigentes a una fecha", "Todas (histórico)"],
+        help="Una parcela está vigente desde su inscripción hasta su baja"
+    )
+    if vigencia == "Vigentes a una fecha":
+        fecha_vigencia = st.date_input("Vigentes al:", value=datetime.date.today())
+        st.caption(f"{indice_espacial.cantidad_vigentes(fecha_vigencia)} parcelas vigentes a esa fecha")
+    else:
+        fecha_vigencia = None
+    
     # Control para mostrar/ocultar polígonos
     mostrar_poligonos = st.checkbox("Mostrar polígonos", value=True)
     
+    # Modo de renderizado: el simplificado envía los polígonos en una sola capa GeoJSON
+    modo_renderizado = st.radio(
+        "Renderizado del mapa:",
+        ["Automático", "Detallado", "Simplificado"],
+        help=f"En modo automático se usa el simplificado con más de {UMBRAL_RESULTADOS_SIMPLIFICADO} resultados"
+    )
+    
     # Información del dataset
     st.header("Información del Dataset")
     if not datos_productores.empty:
-        st.write(f"Total de parcelas: {len(datos_productores)}")
-        st.write(f"Total de productores: {datos_productores['cuit'].nunique()}")
+        st.write(f"Total de parcelas: {resumen['parcelas']}")
+        st.write(f"Total de productores: {resumen['productores']}")
         
-        if 'poligono_formatted' in datos_productores.columns:
-            poligonos_validos = datos_productores['poligono_formatted'].notna().sum()
-            st.write(f"Parcelas con polígonos: {poligonos_validos}")
+        st.write(f"Parcelas con polígonos: {resumen['poligonos']}")
         
-        # Mostrar un mapa con todos los puntos
-        if st.checkbox("Ver mapa general"):
-            overview_map = folium.Map(location=[-36.0, -62.0], zoom_start=7, tiles='CartoDB positron')
+        # Versión del registro: se recarga sola cuando cambia el CSV
+        cargada = datetime.datetime.fromtimestamp(version_registro.cargada).strftime('%d/%m/%Y %H:%M:%S')
+        st.caption(f"Versión {version_registro.numero} del registro, cargada el {cargada}")
+        diferencia = version_registro.diferencia
+        if diferencia is not None:
+            st.caption(
+                f"Cambios respecto de la versión anterior: {diferencia.agregadas} agregadas, "
+                f"{diferencia.modificadas} modificadas, {diferencia.eliminadas} eliminadas"
+            )
+        if obtener_registro().ultimo_error:
+            st.warning(f"No se pudo recargar el CSV: {obtener_registro().ultimo_error}")
+        
+        # Uso de memoria de los datos compartidos
+        with st.expander("Uso de memoria"):
+            mb = 1024 * 1024
+            st.write(f"Tabla compartida: {resumen['memoria_tabla'] / mb:.1f} MB")
+            st.write(f"Índices espaciales: {resumen['memoria_indice'] / mb:.1f} MB")
+            memoria_proceso = memoria_proceso_bytes()
+            if memoria_proceso is not None:
+                st.write(f"Memoria del proceso: {memoria_proceso / mb:.1f} MB")
+            # Medido sobre esta tabla: lo que st.cache_data deserializaría en cada rerun
+            st.write(
+                f"Copia por rerun con st.cache_data: {resumen['copia_cache_data_bytes'] / mb:.1f} MB "
+                f"({resumen['copia_cache_data_s'] * 1000:.0f} ms); compartida: 0 MB"
+            )
             
-            # Crear cluster de marcadores para mejorar rendimiento
-            marker_cluster = folium.plugins.MarkerCluster().add_to(overview_map)
+            # Ahorro de la representación compacta (categorías y fechas) por columna
+            columnas = resumen['memoria_columnas']
+            objetos, compacta = columnas['objetos_bytes'].sum(), columnas['compacta_bytes'].sum()
+            st.write(
+                f"Tabla compacta: {compacta / mb:.1f} MB frente a {objetos / mb:.1f} MB "
+                f"con el texto como objetos ({objetos / max(compacta, 1):.1f}x menos)"
+            )
+            st.dataframe(
+                columnas.assign(
+                    objetos_kb=columnas['objetos_bytes'] // 1024,
+                    compacta_kb=columnas['compacta_bytes'] // 1024
+                )[['columna', 'tipo', 'objetos_kb', 'compacta_kb']].rename(columns={
+                    'columna': "Columna",
+                    'tipo': "Tipo",
+                    'objetos_kb': "Como objetos (KB)",
+                    'compacta_kb': "Compacta (KB)",
+                }),
+                hide_index=True
+            )
+        
+        # Mapa con todas las parcelas, agregadas en teselas precalculadas por nivel de zoom
+        if st.checkbox("Ver mapa general"):
+            vista_general = obtener_vista_general(version_registro)
+            centro, zoom = vista_general.vista_inicial()
+            # Última vista del mapa general (zoom y límites) para pedir sólo sus teselas
+            ultima_vista = st.session_state.get('mapa_general') or {}
+            limites = limites_de_folium(ultima_vista.get('bounds'))
+            zoom_vista = ultima_vista.get('zoom') or zoom
             
-            # Añadir marcadores para cada productor
-            for _, row in datos_productores.sample(min(500, len(datos_productores))).iterrows():  # Limitar a 500 para rendimiento
-                folium.Marker(
-                    location=[row['latitud'], row['longitud']],
-                    popup=row['titular'],
-                    icon=folium.Icon(color="blue", icon="info", prefix="fa")
-                ).add_to(marker_cluster)
+            coleccion, teselas = vista_general.geojson(zoom_vista, limites)
+            nivel = vista_general.nivel(zoom_vista)
+            capa_teselas = agregar_vista_general(
+                folium.FeatureGroup(name="Vista general"), coleccion, nivel.maximo_parcelas()
+            )
             
-            st.write("Vista general (muestra de 500 productores):")
-            st_folium(overview_map, width="100%", height=300)
+            st.write(
+                f"Vista general: {vista_general.parcelas} parcelas agregadas en {len(nivel)} "
+                f"celdas (zoom {nivel.zoom}); {teselas} teselas visibles, "
+                f"{len(coleccion) / 1024:.0f} KB de GeoJSON"
+            )
+            # El mapa base no cambia entre reruns: al moverlo sólo se reemplaza la capa de teselas
+            overview_map = folium.Map(
+                location=centro, zoom_start=zoom, tiles='CartoDB positron',
+                min_zoom=vista_general.zoom_minimo
+            )
+            st_folium(
+                overview_map, width="100%", height=300, key='mapa_general',
+                feature_group_to_add=capa_teselas, returned_objects=['zoom', 'bounds']
+            )
     
     # Instrucciones
     with st.expander("Instrucciones de uso"):
@@ -432,7 +366,9 @@ with st.sidebar:
         ### Cómo usar esta aplicación:
         
         1. **Seleccionar un punto**: Haga clic en el mapa o ingrese coordenadas manualmente.
-        2. **Ajustar radio**: Use el control deslizante para cambiar el radio de búsqueda.
+           También puede dibujar un polígono o rectángulo para ver todas las parcelas del área.
+        2. **Ajustar radio**: Use el control deslizante para cambiar el radio de búsqueda, o
+           elija "Los más cercanos" para ver una cantidad fija de productores sin elegir radio.
         3. **Ver resultados**: Los productores cercanos se muestran en el panel derecho.
         4. **Visualización**: Los productores cuyas parcelas contienen el punto seleccionado se destacan en verde.
         
@@ -449,43 +385,174 @@ col1, col2 = st.columns([3, 1])
 with col1:
     st.subheader("Mapa Interactivo")
     
-    # Crear mapa base
-    m = crear_mapa_base(st.session_state.lat, st.session_state.lon)
+    # Búsqueda de productores por texto: elegir uno lleva el mapa a sus parcelas
+    consulta = st.text_input(
+        "Buscar productor:", placeholder="Razón social, CUIT, RENSPA o localidad"
+    )
+    if consulta.strip():
+        encontrados = indice_texto.productores(
+            indice_espacial.vigentes(indice_texto.buscar(consulta), fecha_vigencia)
+        )
+        if encontrados.empty:
+            st.caption("No hay productores que coincidan con la búsqueda")
+        else:
+            col_productor, col_ver = st.columns([4, 1])
+            with col_productor:
+                elegido = st.selectbox(
+                    "Productores encontrados:",
+                    range(len(encontrados)),
+                    format_func=lambda i: (
+                        f"{encontrados['titular'][i]} ({encontrados['cuit'][i]}) - "
+                        f"{encontrados['parcelas'][i]} parcelas"
+                    ),
+                    label_visibility="collapsed"
+                )
+            with col_ver:
+                if st.button("Ver en el mapa"):
+                    productor = encontrados.iloc[elegido]
+                    st.session_state.productor_buscado = productor['cuit']
+                    st.session_state.area_dibujada = None
+                    st.session_state.lat = productor['latitud']
+                    st.session_state.lon = productor['longitud']
+                    st.session_state.punto_seleccionado = [productor['latitud'], productor['longitud']]
+                    st.session_state.mostrar_resultado = True
+                    st.rerun()
+    
+    # Mapa base siempre igual (el navegador lo conserva) y los resultados en una capa aparte
+    m = crear_mapa_base(*CENTRO_MAPA_INICIAL, zoom=ZOOM_INICIAL)
+    capa = crear_capa_resultados()
+    estadisticas_mapa = None
+    leyenda = None
     
     # Si hay un punto seleccionado y resultados, mostrar visualización
     if st.session_state.punto_seleccionado and st.session_state.mostrar_resultado:
-        # Obtener resultados actualizados con el radio actual
         lat, lon = st.session_state.punto_seleccionado
-        st.session_state.search_results = encontrar_productores_cercanos(
-            lat, lon, datos_productores, radio_km=radio_busqueda
-        )
+        radio_mapa = radio_busqueda
+        punto_mapa = st.session_state.punto_seleccionado
+        if st.session_state.area_dibujada is not None:
+            # Todas las parcelas que tocan el área dibujada, por distancia a su centro. La
+            # consulta se hace una vez por área, fecha y versión del registro; los demás
+            # reruns (radio, zoom, otros controles) reutilizan el resultado
+            clave_area = (
+                json.dumps(st.session_state.area_dibujada, sort_keys=True), fecha_vigencia,
+                version_registro.numero
+            )
+            if st.session_state.consulta_area is None or st.session_state.consulta_area[0] != clave_area:
+                st.session_state.consulta_area = (clave_area, encontrar_parcelas_en_area(
+                    st.session_state.area_dibujada, datos_productores, indice_espacial, fecha_vigencia
+                ))
+            st.session_state.search_results = st.session_state.consulta_area[1]
+            radio_mapa = max(1.0, st.session_state.search_results['distancia'].to_numpy().max(initial=0.0))
+            punto_mapa = None
+            agregar_area(capa, st.session_state.area_dibujada)
+        elif st.session_state.productor_buscado is not None:
+            # Parcelas del productor elegido, con el círculo que las abarca desde su centro
+            posiciones = indice_espacial.vigentes(
+                indice_espacial.parcelas_de_cuit(st.session_state.productor_buscado), fecha_vigencia
+            )
+            distancias = calcular_distancias_km(
+                lat, lon, indice_espacial.latitudes[posiciones], indice_espacial.longitudes[posiciones]
+            )
+            orden = distancias.argsort(kind='stable')
+            st.session_state.search_results = armar_resultados(
+                datos_productores, indice_espacial, posiciones[orden], distancias[orden], False
+            )
+            radio_mapa = max(1.0, float(distancias.max(initial=0.0)))
+        elif cantidad_cercanos is not None:
+            # Radios crecientes hasta alcanzar la cantidad pedida de productores
+            busqueda = cache_busquedas.buscar_k(
+                lat, lon, indice_espacial, cantidad_cercanos, fecha=fecha_vigencia, hasta_borde=hasta_borde
+            )
+            st.session_state.search_results = resultados_de_busqueda(
+                datos_productores, indice_espacial, busqueda
+            )
+            radio_mapa = max(1.0, busqueda.radio_km)
+        else:
+            # Mover el control deslizante dentro del ranking ya calculado del punto sólo lo recorta
+            busqueda = cache_busquedas.buscar(
+                lat, lon, indice_espacial, radio_km=radio_busqueda,
+                radio_ranking=min(RADIO_MAXIMO_KM, FACTOR_RADIO_RANKING * radio_busqueda),
+                fecha=fecha_vigencia, hasta_borde=hasta_borde
+            )
+            st.session_state.search_results = resultados_de_busqueda(
+                datos_productores, indice_espacial, busqueda
+            )
         
         # Visualizar resultados en el mapa
-        if mostrar_poligonos:
-            m = visualizar_resultados(m, st.session_state.punto_seleccionado, 
-                                     st.session_state.search_results, radio_busqueda)
+        simplificar = modo_renderizado == "Simplificado" or (
+            modo_renderizado == "Automático"
+            and len(st.session_state.search_results) > UMBRAL_RESULTADOS_SIMPLIFICADO
+        )
+        if simplificar:
+            _, estadisticas_mapa = visualizar_resultados_simplificados(
+                capa, punto_mapa, st.session_state.search_results,
+                radio_mapa, zoom=st.session_state.zoom
+            )
+        elif mostrar_poligonos:
+            visualizar_resultados(capa, punto_mapa, 
+                                  st.session_state.search_results, radio_mapa)
         else:
             # Si no mostramos polígonos, usamos el mismo mapa pero sin añadir polígonos
-            m = visualizar_resultados(m, st.session_state.punto_seleccionado, 
-                                     [p for p in st.session_state.search_results if True], 
-                                     radio_busqueda)
+            visualizar_resultados(capa, punto_mapa, 
+                                  st.session_state.search_results, 
+                                  radio_mapa)
+        leyenda = leyenda_distancias_html(radio_mapa)
+    
+    # Mostrar el mapa y capturar interacciones: sólo la capa de resultados y la vista
+    # (center/zoom) cambian entre reruns, el mapa base no se vuelve a crear en el navegador
+    with medir('st_folium'):
+        map_data = st_folium(
+            m, width="100%", height=500, key='mapa_principal',
+            feature_group_to_add=capa,
+            center=(st.session_state.lat, st.session_state.lon), zoom=st.session_state.zoom,
+            returned_objects=OBJETOS_DEVUELTOS_MAPA
+        )
+    if leyenda:
+        st.markdown(leyenda, unsafe_allow_html=True)
+    
+    # Reducción del tamaño enviado al navegador en el modo simplificado
+    if estadisticas_mapa and estadisticas_mapa['poligonos']:
+        kb = 1024
+        reduccion = 1 - estadisticas_mapa['bytes_simplificados'] / estadisticas_mapa['bytes_originales']
+        st.caption(
+            f"Renderizado simplificado: {estadisticas_mapa['poligonos']} polígonos, "
+            f"{estadisticas_mapa['vertices_originales']} → {estadisticas_mapa['vertices_simplificados']} vértices, "
+            f"{estadisticas_mapa['bytes_originales'] / kb:.0f} KB → {estadisticas_mapa['bytes_simplificados'] / kb:.0f} KB "
+            f"de GeoJSON ({reduccion:.0%} menos); marcadores: {estadisticas_mapa['marcadores']} "
+            f"de {estadisticas_mapa['resultados']}"
+        )
     
-    # Mostrar el mapa y capturar interacciones
-    map_data = st_folium(m, width="100%", height=500)
+    # Conservar el zoom del usuario (también define la tolerancia de simplificación)
+    if map_data and map_data.get('zoom'):
+        st.session_state.zoom = map_data['zoom']
+    
+    # Un polígono o rectángulo recién dibujado es una consulta por área
+    dibujo = ((map_data or {}).get('last_active_drawing') or {}).get('geometry') or {}
+    if dibujo.get('type') == 'Polygon' and dibujo != st.session_state.ultimo_dibujo:
+        st.session_state.ultimo_dibujo = dibujo
+        st.session_state.area_dibujada = dibujo
+        st.session_state.productor_buscado = None
+        anillo = dibujo['coordinates'][0]
+        st.session_state.lat = sum(c[1] for c in anillo) / len(anillo)
+        st.session_state.lon = sum(c[0] for c in anillo) / len(anillo)
+        st.session_state.punto_seleccionado = [st.session_state.lat, st.session_state.lon]
+        st.session_state.mostrar_resultado = True
+        st.rerun()
     
     # Procesar datos del mapa
-    if map_data and 'last_clicked' in map_data and map_data['last_clicked']:
+    clic = (map_data or {}).get('last_clicked')
+    if clic and clic != st.session_state.ultimo_clic:
+        st.session_state.ultimo_clic = clic
         # Obtener coordenadas del punto seleccionado
-        lat, lon = map_data['last_clicked']['lat'], map_data['last_clicked']['lng']
+        lat, lon = clic['lat'], clic['lng']
         st.session_state.lat = lat
         st.session_state.lon = lon
         st.session_state.punto_seleccionado = [lat, lon]
+        st.session_state.productor_buscado = None
+        st.session_state.area_dibujada = None
         
-        # Buscar productores cercanos
+        # La búsqueda se hace en el rerun, al construir el mapa
         if not datos_productores.empty:
-            st.session_state.search_results = encontrar_productores_cercanos(
-                lat, lon, datos_productores, radio_km=radio_busqueda
-            )
             st.session_state.mostrar_resultado = True
             
             # Recargar la página para mostrar los resultados
@@ -525,12 +592,11 @@ with col1:
                 st.session_state.lat = input_lat
                 st.session_state.lon = input_lon
                 st.session_state.punto_seleccionado = [input_lat, input_lon]
+                st.session_state.productor_buscado = None
+                st.session_state.area_dibujada = None
                 
-                # Buscar productores cercanos
+                # La búsqueda se hace en el rerun, al construir el mapa
                 if not datos_productores.empty:
-                    st.session_state.search_results = encontrar_productores_cercanos(
-                        input_lat, input_lon, datos_productores, radio_km=radio_busqueda
-                    )
                     st.session_state.mostrar_resultado = True
                 
                 # Recargar la página
@@ -543,18 +609,44 @@ with col2:
     if st.session_state.mostrar_resultado and st.session_state.punto_seleccionado:
         lat, lon = st.session_state.punto_seleccionado
         
-        if st.session_state.search_results:
+        resultados = st.session_state.search_results
+        
+        if not resultados.empty:
             # Contar razones sociales únicas
-            cuits_unicos = len(set(productor['cuit'] for productor in st.session_state.search_results))
-            st.success(f"Se encontraron {cuits_unicos} productores en un radio de {radio_busqueda} km")
+            cuits_unicos = resultados['cuit'].nunique()
+            if st.session_state.area_dibujada is not None:
+                st.success(
+                    f"{len(resultados)} parcelas de {cuits_unicos} productores en el área dibujada "
+                    f"({int(resultados['en_area'].sum())} enteras dentro)"
+                )
+                st.subheader("Superficie por productor:")
+                st.dataframe(
+                    superficie_por_productor(resultados).rename(columns={
+                        'cuit': "CUIT",
+                        'titular': "Razón Social",
+                        'parcelas': "Parcelas",
+                        'superficie': "Superficie (ha)",
+                    }),
+                    hide_index=True,
+                    use_container_width=True
+                )
+            elif st.session_state.productor_buscado is not None:
+                st.success(f"{len(resultados)} parcelas de {resultados['titular'].iloc[0]}")
+            elif cantidad_cercanos is not None:
+                st.success(
+                    f"Los {cuits_unicos} productores más cercanos, hasta "
+                    f"{resultados['distancia'].max():.2f} km"
+                )
+            else:
+                st.success(f"Se encontraron {cuits_unicos} productores en un radio de {radio_busqueda} km")
             
             # Verificar si hay productores cuyo polígono contiene el punto
-            productores_contenedores = [p for p in st.session_state.search_results if p.get('dentro_poligono', False)]
+            productores_contenedores = resultados[resultados['dentro_poligono']]
             
-            if productores_contenedores:
+            if not productores_contenedores.empty:
                 st.subheader("Parcela que contiene este punto:")
                 
-                for productor in productores_contenedores:
+                for productor in productores_contenedores.to_dict('records'):
                     with st.expander(f"🌱 {productor['titular']}", expanded=True):
                         st.markdown(f"""
                         **CUIT:** {productor['cuit']}  
@@ -562,31 +654,35 @@ with col2:
                         **RENSPA:** {productor.get('renspa', 'No disponible')}  
                         **Localidad:** {productor.get('localidad', 'No disponible')}  
                         **Superficie:** {productor.get('superficie', 'No disponible')} ha  
+                        {texto_superficie_poligono(productor)}
                         **Distancia:** {productor['distancia']} km  
                         **Coordenadas:** Lat {productor['latitud']:.6f}, Lng {productor['longitud']:.6f}
                         """)
             
             # Mostrar otros productores cercanos
-            other_productores = [p for p in st.session_state.search_results if not p.get('dentro_poligono', False)]
+            other_productores = resultados[~resultados['dentro_poligono']]
             
-            if other_productores:
-                st.subheader("Otros productores cercanos:")
+            if not other_productores.empty:
+                if st.session_state.area_dibujada is not None:
+                    st.subheader("Parcelas en el área:")
+                elif st.session_state.productor_buscado is not None:
+                    st.subheader("Parcelas del productor:")
+                else:
+                    st.subheader("Otros productores cercanos:")
                 
                 # Crear un DataFrame para la tabla
-                tabla_data = []
-                for productor in other_productores:
-                    tabla_data.append({
-                        "CUIT": productor['cuit'],
-                        "Razón Social": productor['titular'],
-                        "Distancia (km)": productor['distancia'],
-                        "Localidad": productor.get('localidad', ''),
-                    })
+                tabla_data = other_productores[['cuit', 'titular', 'distancia', 'localidad']].rename(columns={
+                    'cuit': "CUIT",
+                    'titular': "Razón Social",
+                    'distancia': "Distancia (km)",
+                    'localidad': "Localidad",
+                })
                 
                 # Mostrar tabla
-                st.dataframe(pd.DataFrame(tabla_data), use_container_width=True)
+                st.dataframe(tabla_data.reset_index(drop=True), use_container_width=True)
                 
                 # Mostrar detalles expandibles para los más cercanos
-                for i, productor in enumerate(other_productores[:10]):  # Limitar a los 10 más cercanos
+                for i, productor in enumerate(other_productores.head(10).to_dict('records')):  # Limitar a los 10 más cercanos
                     with st.expander(f"📍 {productor['titular']} - {productor['distancia']} km"):
                         st.markdown(f"""
                         **CUIT:** {productor['cuit']}  
@@ -594,14 +690,105 @@ with col2:
                         **RENSPA:** {productor.get('renspa', 'No disponible')}  
                         **Localidad:** {productor.get('localidad', 'No disponible')}  
                         **Superficie:** {productor.get('superficie', 'No disponible')} ha  
+                        {texto_superficie_poligono(productor)}
                         **Distancia:** {productor['distancia']} km  
                         **Coordenadas:** Lat {productor['latitud']:.6f}, Lng {productor['longitud']:.6f}
                         """)
+        elif st.session_state.area_dibujada is not None:
+            st.warning("No hay parcelas en el área dibujada")
         else:
             st.warning(f"No se encontraron productores en un radio de {radio_busqueda} km")
     else:
         st.info("Haz clic en el mapa para seleccionar un punto y buscar productores cercanos")
 
+# Geolocalización en lote de un CSV de puntos GPS
+st.markdown("---")
+with st.expander("Geolocalización en lote"):
+    st.write(
+        "Suba un CSV con columnas de latitud y longitud (y opcionalmente 'id') para obtener "
+        "el titular de la parcela que contiene cada punto y los productores más cercanos."
+    )
+    archivo_puntos = st.file_uploader("CSV de puntos:", type=['csv'])
+    col_radio_lote, col_cercanos_lote = st.columns(2)
+    with col_radio_lote:
+        radio_lote = st.number_input(
+            "Radio para cercanos (km, 0 = sólo contenedores):",
+            min_value=0.0, max_value=RADIO_MAXIMO_KM, value=0.0, step=1.0
+        )
+    with col_cercanos_lote:
+        max_cercanos_lote = st.number_input(
+            "Máximo de cercanos por punto:", min_value=1, max_value=50, value=5
+        )
+
+    if archivo_puntos is not None and st.button("Procesar puntos"):
+        progreso = st.progress(0.0)
+        partes = []
+        total = 0
+        inicio = time.perf_counter()
+        try:
+            bloques = pd.read_csv(archivo_puntos, chunksize=TAMANO_BLOQUE)
+            for resultado, cantidad in geolocalizar_lote(
+                bloques, datos_productores, indice_espacial, radio_lote, int(max_cercanos_lote),
+                fecha=fecha_vigencia
+            ):
+                partes.append(resultado)
+                total += cantidad
+                # El total de puntos no se conoce hasta terminar; se avanza por bytes leídos
+                progreso.progress(min(archivo_puntos.tell() / max(archivo_puntos.size, 1), 1.0))
+        except ValueError as e:
+            st.error(f"No se pudo procesar el CSV de puntos: {e}")
+        else:
+            segundos = time.perf_counter() - inicio
+            progreso.progress(1.0)
+            resultados_lote = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+            st.success(
+                f"{total} puntos procesados en {segundos:.2f} s "
+                f"({total / max(segundos, 1e-9):,.0f} puntos/s)"
+            )
+            st.dataframe(resultados_lote.head(1000), use_container_width=True)
+            st.download_button(
+                "Descargar resultados (CSV)",
+                resultados_lote.to_csv(index=False).encode('utf-8'),
+                file_name="geolocalizacion_lote.csv",
+                mime="text/csv"
+            )
+
 # Pie de página
 st.markdown("---")
 st.markdown("Desarrollado con ❤️ para productores agrícolas")
+
+# Panel de diagnóstico al final del script, para incluir las etapas de este rerun
+with st.sidebar:
+    if st.checkbox("Panel de diagnóstico"):
+        st.caption(
+            "Tiempos por etapa de este proceso (todas las sesiones); p50/p95 sobre las "
+            "últimas ejecuciones de cada etapa. 'rerun' llega hasta el rerun anterior."
+        )
+        st.dataframe(
+            REGISTRO.resumen().rename(columns={
+                'etapa': "Etapa",
+                'llamadas': "Llamadas",
+                'total_s': "Total (s)",
+                'p50_ms': "p50 (ms)",
+                'p95_ms': "p95 (ms)",
+                'max_ms': "Máx (ms)",
+            }),
+            hide_index=True
+        )
+        contadores = REGISTRO.contadores()
+        if contadores:
+            st.write(", ".join(f"{nombre}: {valor}" for nombre, valor in sorted(contadores.items())))
+        col_prometheus, col_json = st.columns(2)
+        with col_prometheus:
+            st.download_button(
+                "Prometheus", REGISTRO.prometheus(), file_name="metricas.prom", mime="text/plain"
+            )
+        with col_json:
+            st.download_button(
+                "JSON", REGISTRO.json_lineas(), file_name="metricas.jsonl", mime="application/json"
+            )
+        if st.button("Reiniciar métricas"):
+            REGISTRO.reiniciar()
+            st.rerun()
+
+REGISTRO.registrar('rerun', time.perf_counter() - inicio_rerun)
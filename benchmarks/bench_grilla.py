@@ -0,0 +1,105 @@
+"""
+Compara la búsqueda por radio con grilla contra el recorrido completo.
+
+Genera coordenadas sintéticas de parcelas (agrupadas como en la región
+pampeana), construye la grilla con varios tamaños de celda y mide, para radios
+de 1, 10, 100 y 500 km, el tiempo de obtener las parcelas dentro del radio:
+
+- recorrido completo: Haversine vectorizado sobre todas las parcelas
+- grilla: Haversine sólo sobre los candidatos de las celdas del rectángulo
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.bench_grilla --parcelas 500000 --celdas 0.05 0.1 0.5
+"""
+import argparse
+import time
+
+import numpy as np
+
+from motor import IndiceGrilla, calcular_distancias_km
+
+RADIOS_KM = [1, 10, 100, 500]
+
+
+def generar_coordenadas(cantidad, semilla=0):
+    """Genera latitudes/longitudes agrupadas alrededor de localidades ficticias"""
+    rng = np.random.default_rng(semilla)
+    centros_lat = rng.uniform(-39.0, -27.0, size=400)
+    centros_lon = rng.uniform(-66.0, -57.0, size=400)
+    centro = rng.integers(0, len(centros_lat), size=cantidad)
+    latitudes = centros_lat[centro] + rng.normal(0.0, 0.3, size=cantidad)
+    longitudes = centros_lon[centro] + rng.normal(0.0, 0.3, size=cantidad)
+    return latitudes, longitudes
+
+
+def medir(funcion, repeticiones):
+    """Devuelve el tiempo mínimo en milisegundos y el último resultado"""
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor * 1000, resultado
+
+
+def recorrido_completo(latitudes, longitudes, lat, lon, radio_km):
+    distancias = calcular_distancias_km(lat, lon, latitudes, longitudes)
+    return np.flatnonzero(distancias <= radio_km)
+
+
+def busqueda_grilla(grilla, latitudes, longitudes, lat, lon, radio_km):
+    candidatos = grilla.candidatos(lat, lon, radio_km)
+    distancias = calcular_distancias_km(lat, lon, latitudes[candidatos], longitudes[candidatos])
+    return np.sort(candidatos[distancias <= radio_km])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--parcelas', type=int, default=500_000)
+    parser.add_argument('--celdas', type=float, nargs='+', default=[0.05, 0.1, 0.5])
+    parser.add_argument('--consultas', type=int, default=20)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    latitudes, longitudes = generar_coordenadas(args.parcelas)
+    rng = np.random.default_rng(1)
+    consultas = rng.integers(0, args.parcelas, size=args.consultas)
+
+    print(f"Parcelas: {args.parcelas:,}  consultas por radio: {args.consultas}")
+    print(f"{'celda':>7} {'radio km':>9} {'candidatos':>11} {'completo ms':>12} {'grilla ms':>10} {'mejora':>7}")
+
+    for tamano_celda in args.celdas:
+        inicio = time.perf_counter()
+        grilla = IndiceGrilla(latitudes, longitudes, tamano_celda)
+        construccion = (time.perf_counter() - inicio) * 1000
+        print(f"-- celda {tamano_celda} grados: {grilla.filas}x{grilla.columnas} celdas, "
+              f"construida en {construccion:.0f} ms")
+
+        for radio_km in RADIOS_KM:
+            total_completo = total_grilla = total_candidatos = 0.0
+            for posicion in consultas:
+                lat, lon = latitudes[posicion], longitudes[posicion]
+                ms_completo, esperado = medir(
+                    lambda: recorrido_completo(latitudes, longitudes, lat, lon, radio_km),
+                    args.repeticiones
+                )
+                ms_grilla, obtenido = medir(
+                    lambda: busqueda_grilla(grilla, latitudes, longitudes, lat, lon, radio_km),
+                    args.repeticiones
+                )
+                if not np.array_equal(esperado, obtenido):
+                    raise AssertionError(f"La grilla no coincide con el recorrido completo ({radio_km} km)")
+
+                total_completo += ms_completo
+                total_grilla += ms_grilla
+                total_candidatos += len(grilla.candidatos(lat, lon, radio_km))
+
+            n = len(consultas)
+            print(f"{tamano_celda:>7} {radio_km:>9} {total_candidatos / n:>11.0f} "
+                  f"{total_completo / n:>12.2f} {total_grilla / n:>10.2f} "
+                  f"{total_completo / total_grilla:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
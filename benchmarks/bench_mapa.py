@@ -0,0 +1,126 @@
+"""
+Costo por interacción del mapa principal: mapa completo frente a mapa base
+estable con capa de resultados.
+
+Simula una secuencia de clics sobre parcelas al azar y, para cada clic, arma lo
+mismo que st_folium envía al navegador:
+
+- completo: un folium.Map nuevo centrado en el punto, con los resultados
+  dibujados en el mapa (el camino anterior). Cada clic cambia el código del
+  mapa, así que el componente se vuelve a montar: Leaflet, controles y teselas
+  del mapa base se recrean en el navegador.
+- incremental: el mapa base de siempre más una FeatureGroup con los
+  resultados (feature_group_to_add). El código del mapa base no cambia, el
+  componente no se vuelve a montar y el navegador sólo reemplaza la capa.
+
+Informa el tiempo de armado y serialización en el servidor, los bytes
+enviados, los bytes que el navegador tiene que volver a ejecutar (todo el mapa
+si se remonta, sólo la capa si no) y la cantidad de montajes del componente.
+
+Todo se mide con la API pública de folium (get_root().render()), no con las
+funciones internas de streamlit_folium: los bytes son los del HTML que folium
+genera y el componente se considera remontado cuando cambia el HTML del mapa
+base, con los identificadores aleatorios de folium normalizados. Los valores
+absolutos difieren un poco de lo que envía streamlit_folium, pero la
+comparación entre los dos caminos es la misma.
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.bench_mapa --registro datos_productores.csv --clics 50
+"""
+import argparse
+import hashlib
+import re
+import time
+import warnings
+
+import numpy as np
+
+from almacen import cargar_o_preprocesar
+from mapa import crear_capa_resultados, crear_mapa_base, visualizar_resultados
+from motor import encontrar_productores_cercanos
+
+CENTRO_INICIAL = (-36.0, -62.0)
+ZOOM = 10
+
+
+# Sufijo aleatorio (uuid4) de los nombres de los elementos de folium
+IDENTIFICADOR_FOLIUM = re.compile(r'_[0-9a-f]{32}(?![0-9a-f])')
+
+
+def html_mapa(m):
+    """HTML completo del mapa con los identificadores de folium numerados en orden"""
+    numeros = {}
+    return IDENTIFICADOR_FOLIUM.sub(
+        lambda c: f"_{numeros.setdefault(c.group(), len(numeros))}", m.get_root().render()
+    )
+
+
+def serializar_completo(lat, lon, resultados, radio_km):
+    """Código del mapa y bytes enviados con los resultados dibujados en el mapa"""
+    m = crear_mapa_base(lat, lon, zoom=ZOOM)
+    visualizar_resultados(m, [lat, lon], resultados, radio_km)
+    codigo = html_mapa(m)
+    return codigo, len(codigo), len(codigo)
+
+
+def serializar_incremental(lat, lon, resultados, radio_km):
+    """Código del mapa base, bytes enviados y bytes de la capa de resultados"""
+    m = crear_mapa_base(*CENTRO_INICIAL, zoom=ZOOM)
+    codigo = html_mapa(m)
+    capa = crear_capa_resultados()
+    visualizar_resultados(capa, [lat, lon], resultados, radio_km)
+    # La capa es lo que agrega al HTML del mapa base
+    bytes_capa = len(html_mapa(capa.add_to(m))) - len(codigo)
+    return codigo, len(codigo) + bytes_capa, bytes_capa
+
+
+def medir(serializar, puntos, resultados, radio_km):
+    """Tiempos (s), bytes enviados, bytes reejecutados y montajes del componente"""
+    tiempos, enviados, reejecutados = [], [], []
+    montajes, clave_anterior = 0, None
+    for (lat, lon), tabla in zip(puntos, resultados):
+        inicio = time.perf_counter()
+        codigo, bytes_enviados, bytes_capa = serializar(lat, lon, tabla, radio_km)
+        tiempos.append(time.perf_counter() - inicio)
+        clave = hashlib.sha256(codigo.encode()).hexdigest()
+        if clave != clave_anterior:
+            montajes += 1
+            reejecutados.append(bytes_enviados)
+        else:
+            reejecutados.append(bytes_capa)
+        clave_anterior = clave
+        enviados.append(bytes_enviados)
+    return np.array(tiempos), np.array(enviados), np.array(reejecutados), montajes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--registro', default='datos_productores.csv')
+    parser.add_argument('--clics', type=int, default=50)
+    parser.add_argument('--radio', type=float, default=30.0)
+    args = parser.parse_args()
+    # Avisos de los proveedores de teselas en cada mapa creado
+    warnings.simplefilter('ignore')
+
+    datos, indice = cargar_o_preprocesar(args.registro)
+    rng = np.random.default_rng(0)
+    elegidas = rng.integers(0, len(datos), args.clics)
+    puntos = list(zip(datos['latitud'].to_numpy()[elegidas], datos['longitud'].to_numpy()[elegidas]))
+    resultados = [
+        encontrar_productores_cercanos(lat, lon, datos, indice, args.radio) for lat, lon in puntos
+    ]
+
+    print(f"Clics: {args.clics}  radio: {args.radio} km  "
+          f"resultados por clic: {np.mean([len(r) for r in resultados]):.1f}")
+    print(f"{'camino':>12} {'ms/clic':>8} {'p95 ms':>7} {'KB enviados':>12} "
+          f"{'KB reejecutados':>16} {'montajes':>9}")
+    for nombre, serializar in [('completo', serializar_completo), ('incremental', serializar_incremental)]:
+        serializar(*puntos[0], resultados[0], args.radio)
+        tiempos, enviados, reejecutados, montajes = medir(serializar, puntos, resultados, args.radio)
+        print(f"{nombre:>12} {tiempos.mean() * 1000:>8.1f} {np.percentile(tiempos, 95) * 1000:>7.1f} "
+              f"{enviados.mean() / 1024:>12.1f} {reejecutados.mean() / 1024:>16.1f} {montajes:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Escalado de la interpretación de polígonos y de la contención en bloque según
+la cantidad de trabajadores.
+
+Genera un registro sintético de parcelas cuadrangulares (con los textos de
+polígono en el formato "(lat,lon), ..." del CSV) y mide, para 1, 2, 4 y 8
+trabajadores:
+
+- interpretación: parsear_poligonos repartido en un pool de procesos
+- contención: parcelas_que_contienen_lote repartido en un pool de hilos
+
+Los resultados de cada cantidad de trabajadores se comparan con los de un solo
+trabajador. La mejora está acotada por los núcleos disponibles.
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.bench_paralelo --parcelas 2000000 --puntos 1000000
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_grilla import generar_coordenadas
+from motor import IndiceEspacial, parsear_poligonos
+
+TRABAJADORES = [1, 2, 4, 8]
+
+
+def generar_poligonos(latitudes, longitudes, semilla=0):
+    """Textos de polígonos cuadrangulares de 0.5 a 3 km de lado alrededor de cada punto"""
+    rng = np.random.default_rng(semilla)
+    medio_lado = rng.uniform(0.0025, 0.015, size=len(latitudes))
+    esquinas = np.column_stack([
+        latitudes - medio_lado, longitudes - medio_lado,
+        latitudes - medio_lado, longitudes + medio_lado,
+        latitudes + medio_lado, longitudes + medio_lado,
+        latitudes + medio_lado, longitudes - medio_lado,
+    ]).round(6).tolist()
+    formato = '(%s,%s), (%s,%s), (%s,%s), (%s,%s)'
+    return [formato % tuple(fila) for fila in esquinas]
+
+
+def medir(funcion):
+    """Devuelve el tiempo en segundos y el resultado"""
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return time.perf_counter() - inicio, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--parcelas', type=int, default=2_000_000)
+    parser.add_argument('--puntos', type=int, default=1_000_000)
+    parser.add_argument('--trabajadores', type=int, nargs='+', default=TRABAJADORES)
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    latitudes, longitudes = generar_coordenadas(args.parcelas)
+    textos = generar_poligonos(latitudes, longitudes)
+    datos = pd.DataFrame({
+        'cuit': np.arange(args.parcelas) // 3,
+        'latitud': latitudes,
+        'longitud': longitudes,
+    })
+    lats_puntos, lons_puntos = generar_coordenadas(args.puntos, semilla=2)
+    print(f"Parcelas: {args.parcelas:,}  puntos: {args.puntos:,}  núcleos: {os.cpu_count()}  "
+          f"(datos generados en {time.perf_counter() - inicio:.1f} s)")
+
+    print(f"{'trabajadores':>12} {'interpretación s':>17} {'mejora':>7} "
+          f"{'contención s':>13} {'puntos/s':>11} {'mejora':>7}")
+
+    base_poligonos = base_contencion = None
+    for trabajadores in args.trabajadores:
+        segundos_parseo, poligonos = medir(lambda: parsear_poligonos(textos, trabajadores))
+        if base_poligonos is None:
+            base_poligonos = (segundos_parseo, poligonos)
+            indice = IndiceEspacial(datos, poligonos=poligonos)
+        elif not (np.array_equal(poligonos.offsets, base_poligonos[1].offsets)
+                  and np.array_equal(poligonos.coordenadas, base_poligonos[1].coordenadas)):
+            raise AssertionError(f"La interpretación con {trabajadores} trabajadores no coincide")
+
+        segundos_contencion, contenidos = medir(
+            lambda: indice.parcelas_que_contienen_lote(lats_puntos, lons_puntos, trabajadores)
+        )
+        if base_contencion is None:
+            base_contencion = (segundos_contencion, contenidos)
+        elif not all(np.array_equal(a, b) for a, b in zip(contenidos, base_contencion[1])):
+            raise AssertionError(f"La contención con {trabajadores} trabajadores no coincide")
+
+        print(f"{trabajadores:>12} {segundos_parseo:>17.2f} "
+              f"{base_poligonos[0] / segundos_parseo:>6.1f}x "
+              f"{segundos_contencion:>13.2f} {args.puntos / segundos_contencion:>11,.0f} "
+              f"{base_contencion[0] / segundos_contencion:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
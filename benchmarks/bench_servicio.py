@@ -0,0 +1,97 @@
+"""
+Rendimiento del servicio HTTP de consultas bajo carga concurrente.
+
+Levanta el servicio (uvicorn, en un hilo) sobre el registro indicado y lanza
+consultas /cercanos a puntos de parcelas al azar desde clientes con conexión
+persistente (keep-alive). Para cada nivel de concurrencia informa consultas
+por segundo y la latencia p50/p95/p99.
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.bench_servicio --registro datos_productores.csv --consultas 2000
+"""
+import argparse
+import asyncio
+import threading
+import time
+
+import numpy as np
+import uvicorn
+
+from recarga import RegistroVivo
+from servicio import MAX_BUSQUEDAS_EN_CACHE, crear_app
+
+CONCURRENCIAS = [1, 8, 32, 128]
+
+
+async def _cliente(host, puerto, rutas, latencias):
+    """Envía las rutas por una sola conexión keep-alive y registra cada latencia"""
+    lector, escritor = await asyncio.open_connection(host, puerto)
+    try:
+        for ruta in rutas:
+            inicio = time.perf_counter()
+            escritor.write(f"GET {ruta} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+            await escritor.drain()
+            estado = await lector.readline()
+            largo = 0
+            while (linea := await lector.readline()) not in (b'\r\n', b''):
+                if linea.lower().startswith(b'content-length:'):
+                    largo = int(linea.split(b':')[1])
+            await lector.readexactly(largo)
+            latencias.append(time.perf_counter() - inicio)
+            if b' 200 ' not in estado:
+                raise RuntimeError(f"{ruta}: {estado.decode().strip()}")
+    finally:
+        escritor.close()
+
+
+async def medir(host, puerto, rutas, concurrencia):
+    """Segundos totales y latencias de repartir las rutas entre concurrencia clientes"""
+    latencias = []
+    inicio = time.perf_counter()
+    await asyncio.gather(*(
+        _cliente(host, puerto, rutas[k::concurrencia], latencias) for k in range(concurrencia)
+    ))
+    return time.perf_counter() - inicio, np.array(latencias)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--registro', default='datos_productores.csv')
+    parser.add_argument('--consultas', type=int, default=2000)
+    parser.add_argument('--radio', type=float, default=10.0)
+    parser.add_argument('--concurrencias', type=int, nargs='+', default=CONCURRENCIAS)
+    parser.add_argument('--puerto', type=int, default=8765)
+    args = parser.parse_args()
+
+    registro = RegistroVivo.abrir(args.registro, max_busquedas=MAX_BUSQUEDAS_EN_CACHE)
+    datos = registro.actual().datos
+    host = '127.0.0.1'
+    servidor = uvicorn.Server(uvicorn.Config(
+        crear_app(registro), host=host, port=args.puerto, log_level='warning'
+    ))
+    threading.Thread(target=servidor.run, daemon=True).start()
+    while not servidor.started:
+        time.sleep(0.05)
+
+    # Puntos desplazados hasta ~1 km de parcelas al azar; se redondean para que
+    # haya repeticiones (como en el uso real) y la caché de búsquedas intervenga
+    rng = np.random.default_rng(0)
+    elegidas = rng.integers(0, len(datos), args.consultas)
+    lats = (datos['latitud'].to_numpy()[elegidas] + rng.normal(0, 0.01, args.consultas)).round(3)
+    lons = (datos['longitud'].to_numpy()[elegidas] + rng.normal(0, 0.01, args.consultas)).round(3)
+    rutas = [f"/cercanos?lat={lat}&lon={lon}&radio_km={args.radio}" for lat, lon in zip(lats, lons)]
+
+    print(f"Parcelas: {len(datos):,}  consultas: {args.consultas:,}  radio: {args.radio} km")
+    print(f"{'concurrencia':>12} {'consultas/s':>12} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for concurrencia in args.concurrencias:
+        segundos, latencias = asyncio.run(medir(host, args.puerto, rutas, concurrencia))
+        p50, p95, p99 = np.percentile(latencias, [50, 95, 99]) * 1000
+        print(f"{concurrencia:>12} {args.consultas / segundos:>12,.0f} "
+              f"{p50:>8.1f} {p95:>8.1f} {p99:>8.1f}")
+
+    servidor.should_exit = True
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""
+Generador de registros sintéticos de parcelas con el esquema del CSV real.
+
+Las parcelas se agrupan alrededor de localidades ficticias (con la misma
+distribución que bench_grilla) y tienen:
+
+- polígonos irregulares cerrados, con una cantidad de vértices variada (la
+  mayoría entre 4 y 15, algunos de cientos) y un tamaño acorde a la superficie
+- superposición: una fracción de las parcelas se ubica sobre otra
+- multiplicidad de CUIT: pocos productores con muchas parcelas y muchos con
+  pocas (distribución de Zipf)
+- fechas de inscripción, reinscripción y baja en el formato del CSV, y una
+  fracción de parcelas sin polígono
+
+El archivo se escribe por bloques, así que el tamaño está limitado sólo por el
+disco, y la misma semilla genera siempre el mismo archivo.
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.generador --parcelas 1000000 -o /tmp/registro_1M.csv
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+LOCALIDADES = 400
+
+# Parcelas promedio por productor
+PARCELAS_POR_PRODUCTOR = 20
+
+# Exponente de la distribución de parcelas por productor
+EXPONENTE_ZIPF = 1.1
+
+# Fracción de parcelas ubicadas sobre otra parcela
+FRACCION_SUPERPUESTAS = 0.1
+
+# Fracción de parcelas sin polígono
+FRACCION_SIN_POLIGONO = 0.13
+
+MAX_VERTICES = 500
+
+TAMANO_BLOQUE = 200_000
+
+DIRECCIONES = ['RUTA PROVINCIAL', 'CAMINO VECINAL', 'PARAJE', 'CUARTEL', 'SECCION CHACRAS', 'S/D']
+
+COLUMNAS = [
+    'renspa', 'titular', 'cuit', 'fecha_inscripcion', 'fecha_reinscripcion', 'fecha_baja',
+    'latitud', 'longitud', 'localidad', 'direccion', 'superficie', 'poligono'
+]
+
+
+def _cuit(numeros):
+    """CUIT con formato XX-XXXXXXXX-X a partir de números de productor"""
+    numeros = np.asarray(numeros, dtype=np.int64)
+    cuerpo = 10_000_000 + numeros * 7919 % 89_999_999
+    prefijo = np.where(numeros % 3 == 0, 20, 30)
+    return [f'{p}-{c:08d}-{c % 10}' for p, c in zip(prefijo, cuerpo)]
+
+
+def _fechas(ns):
+    """Fechas en ns (int64, el mínimo es NaT) como texto ISO con Z; NaT queda vacío"""
+    fechas = pd.DatetimeIndex(np.asarray(ns, dtype=np.int64).view('datetime64[ns]'))
+    return np.where(fechas.isna(), None, fechas.strftime('%Y-%m-%dT%H:%M:%SZ'))
+
+
+def _poligonos(rng, latitudes, longitudes, superficies):
+    """Textos "(lat,lon), ..." de polígonos estrellados cerrados alrededor de cada punto"""
+    cantidad = len(latitudes)
+    vertices = np.minimum(3 + rng.geometric(1 / 6, size=cantidad), MAX_VERTICES)
+    # Algunos polígonos muy detallados, como los relevados con GPS
+    detallados = rng.random(cantidad) < 0.01
+    vertices[detallados] = rng.integers(100, MAX_VERTICES, size=detallados.sum())
+
+    # Radio en grados de un círculo con la superficie (ha) de la parcela
+    radios = np.sqrt(superficies * 10_000 / np.pi) / 111_000
+    textos = np.empty(cantidad, dtype=object)
+    for k in np.unique(vertices):
+        filas = np.flatnonzero(vertices == k)
+        angulos = np.sort(rng.uniform(0, 2 * np.pi, size=(len(filas), k)), axis=1)
+        escala = radios[filas, None] * rng.uniform(0.6, 1.0, size=(len(filas), k))
+        lats = latitudes[filas, None] + escala * np.sin(angulos)
+        lons = longitudes[filas, None] + escala * np.cos(angulos) / np.cos(np.radians(latitudes[filas, None]))
+        # Anillo cerrado: el primer vértice se repite al final, como en el CSV
+        coordenadas = np.stack([lats, lons], axis=2)
+        coordenadas = np.concatenate([coordenadas, coordenadas[:, :1]], axis=1).round(5)
+        formato = ', '.join(['(%.5f,%.5f)'] * (k + 1))
+        textos[filas] = [formato % tuple(fila) for fila in coordenadas.reshape(len(filas), -1).tolist()]
+    return textos
+
+
+def generar_registro(cantidad, semilla=0, total=None, primera_fila=0):
+    """
+    DataFrame de cantidad parcelas con las columnas del CSV. total es el tamaño
+    del registro completo (para repartir los productores) cuando se genera un
+    bloque a partir de primera_fila.
+    """
+    total = total or cantidad
+    # Las localidades dependen sólo de la semilla: son las mismas en todos los bloques
+    centros = np.random.default_rng(semilla)
+    centros_lat = centros.uniform(-39.0, -27.0, size=LOCALIDADES)
+    centros_lon = centros.uniform(-66.0, -57.0, size=LOCALIDADES)
+
+    rng = np.random.default_rng([semilla, primera_fila])
+    localidades = rng.integers(0, LOCALIDADES, size=cantidad)
+    latitudes = centros_lat[localidades] + rng.normal(0.0, 0.3, size=cantidad)
+    longitudes = centros_lon[localidades] + rng.normal(0.0, 0.3, size=cantidad)
+
+    # Superposición: algunas parcelas se mueven cerca del centro de otra del bloque
+    superpuestas = np.flatnonzero(rng.random(cantidad) < FRACCION_SUPERPUESTAS)
+    otras = rng.integers(0, cantidad, size=len(superpuestas))
+    latitudes[superpuestas] = latitudes[otras] + rng.normal(0, 0.003, len(superpuestas))
+    longitudes[superpuestas] = longitudes[otras] + rng.normal(0, 0.003, len(superpuestas))
+
+    superficies = np.clip(rng.lognormal(np.log(300), 1.2, size=cantidad), 1, 90_000).round()
+
+    productores = max(1, total // PARCELAS_POR_PRODUCTOR)
+    pesos = 1.0 / np.arange(1, productores + 1) ** EXPONENTE_ZIPF
+    productor = rng.choice(productores, size=cantidad, p=pesos / pesos.sum())
+
+    inicio = pd.Timestamp('2000-01-01').value
+    fin = pd.Timestamp('2025-01-01').value
+    dia = 86_400 * 10 ** 9
+    inscripcion = rng.integers(inicio, fin, size=cantidad) // dia * dia
+    reinscripcion = np.where(
+        rng.random(cantidad) < 0.6,
+        np.minimum(inscripcion + rng.integers(0, 3650, size=cantidad) * dia, fin),
+        inscripcion
+    )
+    baja = np.where(
+        rng.random(cantidad) < 0.3,
+        inscripcion + rng.integers(30, 5000, size=cantidad) * dia,
+        np.iinfo(np.int64).min  # NaT: parcela sin baja
+    )
+
+    poligonos = _poligonos(rng, latitudes, longitudes, superficies)
+    poligonos[rng.random(cantidad) < FRACCION_SIN_POLIGONO] = None
+
+    filas = np.arange(primera_fila, primera_fila + cantidad)
+    return pd.DataFrame({
+        'renspa': [f'{f % 100:02d}.{f // 100 % 1000:03d}.0.{f // 100_000:05d}/{f % 7:02d}' for f in filas],
+        'titular': [f'PRODUCTOR SINTETICO {p} S.A.' for p in productor],
+        'cuit': _cuit(productor),
+        'fecha_inscripcion': _fechas(inscripcion),
+        'fecha_reinscripcion': _fechas(reinscripcion),
+        'fecha_baja': _fechas(baja),
+        'latitud': latitudes.round(5),
+        'longitud': longitudes.round(5),
+        'localidad': [f'LOCALIDAD {c}' for c in localidades],
+        'direccion': np.array(DIRECCIONES, dtype=object)[rng.integers(0, len(DIRECCIONES), size=cantidad)],
+        'superficie': superficies,
+        'poligono': poligonos,
+    }, index=filas, columns=COLUMNAS)
+
+
+def escribir_csv(ruta, cantidad, semilla=0, tamano_bloque=TAMANO_BLOQUE):
+    """Escribe un registro sintético de cantidad parcelas en ruta, por bloques"""
+    for primera_fila in range(0, cantidad, tamano_bloque):
+        bloque = generar_registro(
+            min(tamano_bloque, cantidad - primera_fila), semilla, cantidad, primera_fila
+        )
+        bloque.to_csv(ruta, mode='w' if primera_fila == 0 else 'a', header=primera_fila == 0)
+    return ruta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--parcelas', type=int, default=100_000)
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('-o', '--salida', required=True, help="CSV a escribir")
+    args = parser.parse_args()
+    escribir_csv(args.salida, args.parcelas, args.semilla)
+    print(f"{args.parcelas:,} parcelas escritas en {args.salida}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Motor de línea base para la suite de rendimiento: la carga y las búsquedas
+fila por fila de la primera versión de la aplicación, sin índices.
+
+Reproduce la versión original (pd.read_csv completo, polígonos interpretados
+con una expresión regular por fila, contención con un Polygon de Shapely por
+parcela y distancias con Haversine en Python dentro de iterrows) sin Streamlit,
+para que la suite pueda medir cuánto mejora o empeora el motor actual respecto
+del punto de partida.
+"""
+import math
+import re
+
+import pandas as pd
+from shapely.geometry import Point, Polygon
+
+
+def calcular_distancia_km(lat1, lon1, lat2, lon2):
+    """Distancia en kilómetros entre dos puntos con la fórmula de Haversine"""
+    R = 6371.0
+    lat1_rad, lon1_rad = math.radians(lat1), math.radians(lon1)
+    lat2_rad, lon2_rad = math.radians(lat2), math.radians(lon2)
+    dlon = lon2_rad - lon1_rad
+    dlat = lat2_rad - lat1_rad
+    a = math.sin(dlat / 2) ** 2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2) ** 2
+    return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def formato_a_poligono(poligono_str):
+    """Polígono WKT o "(lat,lon), (lat,lon)..." como lista [[lat, lon], ...], o None"""
+    if not poligono_str or not isinstance(poligono_str, str):
+        return None
+
+    try:
+        if poligono_str.strip().upper().startswith('POLYGON'):
+            coords_str = poligono_str.replace('POLYGON', '').replace('((', '').replace('))', '').strip()
+            coords = []
+            for par in coords_str.split(','):
+                valores = par.strip().split()
+                if len(valores) >= 2:
+                    lon, lat = float(valores[0]), float(valores[1])
+                    coords.append([lat, lon])
+        else:
+            coords_matches = re.findall(r'\(([^)]+)\)', poligono_str)
+            if not coords_matches:
+                return None
+            coords = []
+            for coord_pair in coords_matches:
+                try:
+                    lat, lon = map(float, coord_pair.split(','))
+                    coords.append([lat, lon])
+                except ValueError:
+                    continue
+        return coords if coords else None
+    except Exception:
+        return None
+
+
+def punto_en_poligono(point, polygon):
+    """Si el punto (lon, lat) está dentro del polígono [[lat, lon], ...]"""
+    if polygon is None or not polygon:
+        return False
+    try:
+        return Polygon([(coord[1], coord[0]) for coord in polygon]).contains(Point(point))
+    except Exception:
+        return False
+
+
+def cargar_datos(ruta_archivo):
+    """Lee el CSV completo e interpreta los polígonos fila por fila"""
+    df = pd.read_csv(ruta_archivo)
+    df['latitud'] = pd.to_numeric(df['latitud'], errors='coerce')
+    df['longitud'] = pd.to_numeric(df['longitud'], errors='coerce')
+    if 'poligono' in df.columns:
+        df['poligono_formatted'] = df['poligono'].apply(formato_a_poligono)
+    return df.dropna(subset=['latitud', 'longitud'])
+
+
+def _fila_resultado(fila, distancia, dentro):
+    return {
+        'cuit': fila['cuit'],
+        'titular': fila['titular'] if 'titular' in fila else 'No disponible',
+        'renspa': fila['renspa'] if 'renspa' in fila else 'No disponible',
+        'localidad': fila['localidad'] if 'localidad' in fila else 'No disponible',
+        'superficie': fila['superficie'] if 'superficie' in fila else 'No disponible',
+        'distancia': distancia,
+        'latitud': fila['latitud'],
+        'longitud': fila['longitud'],
+        'poligono_formatted': fila.get('poligono_formatted', None),
+        'dentro_poligono': dentro,
+    }
+
+
+def encontrar_productor_contenedor(lat, lon, datos):
+    """Primera parcela cuyo polígono contiene el punto, o None"""
+    if 'poligono_formatted' in datos.columns:
+        for _, fila in datos.iterrows():
+            if fila['poligono_formatted'] is not None and punto_en_poligono((lon, lat), fila['poligono_formatted']):
+                return _fila_resultado(fila, 0, True)
+    return None
+
+
+def encontrar_productores_cercanos(lat, lon, datos, radio_km=10):
+    """Contenedor y primer parcela de cada CUIT dentro de radio_km, por distancia"""
+    cercanos = []
+    cuits_encontrados = set()
+
+    productor_contenedor = encontrar_productor_contenedor(lat, lon, datos)
+    if productor_contenedor:
+        cercanos.append(productor_contenedor)
+        cuits_encontrados.add(productor_contenedor['cuit'])
+
+    for _, fila in datos.iterrows():
+        if fila['cuit'] in cuits_encontrados:
+            continue
+        distancia = calcular_distancia_km(lat, lon, fila['latitud'], fila['longitud'])
+        if distancia <= radio_km:
+            cercanos.append(_fila_resultado(fila, round(distancia, 2), False))
+            cuits_encontrados.add(fila['cuit'])
+
+    return sorted(cercanos, key=lambda x: x['distancia'])
@@ -0,0 +1,337 @@
+"""
+Suite de rendimiento sobre registros sintéticos de distintos tamaños.
+
+Para cada tamaño genera (o reutiliza) un registro con benchmarks.generador y,
+en un proceso nuevo para que la memoria de cada tamaño no se mezcle, mide con
+cada motor de MOTORES, el actual (indice_espacial) y la línea base fila por
+fila de la primera versión (linea_base, benchmarks.linea_base):
+
+- carga: ingesta del CSV al artefacto, apertura del artefacto, pico de memoria
+  del proceso y memoria de la tabla y del índice
+- punto: parcelas que contienen un punto (la mitad de los puntos sobre parcelas)
+- cercanos: búsqueda por radio para cada radio pedido, sin caché
+- render: bytes del mapa detallado y del GeoJSON simplificado de una búsqueda,
+  y de la vista general del registro completo (sólo el motor actual)
+
+Cada medición es un registro JSON (una línea) con el tamaño, el motor, la
+medición y sus valores, más los datos del entorno (commit, versiones, núcleos),
+para comparar corridas. Con --comparar se cotejan los tiempos y tamaños con una
+corrida anterior y se termina con código 1 si alguno empeoró más que --umbral.
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.suite --tamanos 10000 100000 1000000 --salida resultados.jsonl
+    python -m benchmarks.suite --tamanos 10000 100000 --comparar resultados.jsonl
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from benchmarks.generador import escribir_csv
+
+TAMANOS = [10_000, 100_000]
+
+RADIOS_KM = [1, 10, 50, 100]
+
+# Radio de la búsqueda cuyos resultados se dibujan en la medición de render
+RADIO_RENDER_KM = 10
+
+# La línea base recorre todo el registro en cada consulta: pocas consultas y
+# registros no mucho más grandes que el real
+CONSULTAS_LINEA_BASE = 10
+MAX_PARCELAS_LINEA_BASE = 100_000
+
+# Sufijos de los valores que se comparan entre corridas (más es peor)
+SUFIJOS_COMPARABLES = ('_ms', '_s', '_mb', '_bytes')
+
+
+def _percentiles(segundos):
+    p50, p95 = np.percentile(segundos, [50, 95]) * 1000
+    return {'p50_ms': round(p50, 3), 'p95_ms': round(p95, 3), 'media_ms': round(np.mean(segundos) * 1000, 3)}
+
+
+def _tiempos(funcion, argumentos):
+    """Duración de cada llamada y sus resultados"""
+    segundos, resultados = [], []
+    for args in argumentos:
+        inicio = time.perf_counter()
+        resultados.append(funcion(*args))
+        segundos.append(time.perf_counter() - inicio)
+    return np.array(segundos), resultados
+
+
+def medir_motor_indice(ruta_csv, radios_km, consultas, semilla):
+    """Mediciones del motor actual: IndiceEspacial sobre el artefacto preprocesado"""
+    from almacen import cargar_o_preprocesar, directorio_cache
+    from mapa import (
+        _crear_colormap, crear_mapa_base, poligonos_a_geojson, tolerancia_para_zoom,
+        visualizar_resultados
+    )
+    from motor import encontrar_productor_contenedor, encontrar_productores_cercanos
+    from vista_general import VistaGeneral
+
+    warnings.simplefilter('ignore')
+    registros = []
+
+    # Carga en frío (sin artefacto) y apertura del artefacto
+    shutil.rmtree(directorio_cache(ruta_csv), ignore_errors=True)
+    inicio = time.perf_counter()
+    cargar_o_preprocesar(ruta_csv)
+    ingesta = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    datos, indice = cargar_o_preprocesar(ruta_csv)
+    apertura = time.perf_counter() - inicio
+    registros.append({
+        'medicion': 'carga',
+        'ingesta_s': round(ingesta, 3),
+        'apertura_s': round(apertura, 3),
+        # ru_maxrss está en KB en Linux
+        'rss_pico_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'tabla_mb': round(datos.memory_usage(deep=True).sum() / 2 ** 20, 1),
+        'indice_mb': round(indice.memoria_bytes() / 2 ** 20, 1),
+        'parcelas_con_poligono': len(indice),
+    })
+
+    # Puntos de consulta: la mitad en el centro de parcelas al azar, el resto en la región
+    rng = np.random.default_rng(semilla)
+    elegidas = rng.integers(0, len(datos), consultas // 2)
+    lats = np.concatenate([indice.latitudes[elegidas], rng.uniform(-39, -27, consultas - len(elegidas))])
+    lons = np.concatenate([indice.longitudes[elegidas], rng.uniform(-66, -57, consultas - len(elegidas))])
+    puntos = list(zip(lats, lons))
+
+    segundos, resultados = _tiempos(
+        lambda lat, lon: encontrar_productor_contenedor(lat, lon, datos, indice), puntos
+    )
+    registros.append({
+        'medicion': 'punto', **_percentiles(segundos),
+        'resultados_media': round(float(np.mean([len(r) for r in resultados])), 2),
+    })
+
+    for radio_km in radios_km:
+        segundos, resultados = _tiempos(
+            lambda lat, lon: encontrar_productores_cercanos(lat, lon, datos, indice, radio_km), puntos
+        )
+        registros.append({
+            'medicion': 'cercanos', 'radio_km': float(radio_km), **_percentiles(segundos),
+            'resultados_media': round(float(np.mean([len(r) for r in resultados])), 2),
+        })
+
+    # Render de la búsqueda sobre las parcelas elegidas (los primeros puntos)
+    detallado, simplificado = [], []
+    for lat, lon in puntos[:min(10, len(elegidas))]:
+        resultados = encontrar_productores_cercanos(lat, lon, datos, indice, RADIO_RENDER_KM)
+        m = crear_mapa_base(lat, lon)
+        visualizar_resultados(m, [lat, lon], resultados, RADIO_RENDER_KM)
+        detallado.append(len(m.get_root().render()))
+        _, estadisticas = poligonos_a_geojson(
+            resultados, _crear_colormap(RADIO_RENDER_KM), tolerancia_para_zoom(10)
+        )
+        simplificado.append(estadisticas['bytes_simplificados'])
+    inicio = time.perf_counter()
+    vista = VistaGeneral(datos, indice)
+    _, zoom = vista.vista_inicial()
+    coleccion, _ = vista.geojson(zoom)
+    registros.append({
+        'medicion': 'render', 'radio_km': float(RADIO_RENDER_KM),
+        'mapa_detallado_bytes': int(np.median(detallado)),
+        'geojson_simplificado_bytes': int(np.median(simplificado)),
+        'vista_general_bytes': len(coleccion),
+        'vista_general_s': round(time.perf_counter() - inicio, 3),
+    })
+    return registros
+
+
+def medir_motor_linea_base(ruta_csv, radios_km, consultas, semilla):
+    """
+    Mediciones de la línea base: carga y búsquedas fila por fila de la primera
+    versión (benchmarks.linea_base). Cada consulta recorre todo el registro, así
+    que se hacen a lo sumo CONSULTAS_LINEA_BASE y sólo hasta
+    MAX_PARCELAS_LINEA_BASE parcelas.
+    """
+    from benchmarks.linea_base import (
+        cargar_datos, encontrar_productor_contenedor, encontrar_productores_cercanos
+    )
+
+    warnings.simplefilter('ignore')
+    inicio = time.perf_counter()
+    datos = cargar_datos(ruta_csv)
+    registros = [{
+        'medicion': 'carga',
+        'ingesta_s': round(time.perf_counter() - inicio, 3),
+        'rss_pico_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'tabla_mb': round(datos.memory_usage(deep=True).sum() / 2 ** 20, 1),
+    }]
+
+    # Los mismos tipos de puntos que medir_motor_indice: la mitad sobre parcelas
+    consultas = min(consultas, CONSULTAS_LINEA_BASE)
+    rng = np.random.default_rng(semilla)
+    elegidas = rng.integers(0, len(datos), consultas // 2)
+    lats = np.concatenate([datos['latitud'].to_numpy()[elegidas], rng.uniform(-39, -27, consultas - len(elegidas))])
+    lons = np.concatenate([datos['longitud'].to_numpy()[elegidas], rng.uniform(-66, -57, consultas - len(elegidas))])
+    puntos = list(zip(lats, lons))
+
+    segundos, resultados = _tiempos(lambda lat, lon: encontrar_productor_contenedor(lat, lon, datos), puntos)
+    registros.append({
+        'medicion': 'punto', **_percentiles(segundos),
+        'resultados_media': round(float(np.mean([r is not None for r in resultados])), 2),
+    })
+    for radio_km in radios_km:
+        segundos, resultados = _tiempos(
+            lambda lat, lon: encontrar_productores_cercanos(lat, lon, datos, radio_km), puntos
+        )
+        registros.append({
+            'medicion': 'cercanos', 'radio_km': float(radio_km), **_percentiles(segundos),
+            'resultados_media': round(float(np.mean([len(r) for r in resultados])), 2),
+        })
+    return registros
+
+
+# Motores a medir: nombre -> función (ruta_csv, radios_km, consultas, semilla) -> registros
+MOTORES = {
+    'indice_espacial': medir_motor_indice,
+    'linea_base': medir_motor_linea_base,
+}
+
+# Parcelas máximas para las que se mide cada motor (los que no figuran, sin límite)
+MAX_PARCELAS_MOTOR = {
+    'linea_base': MAX_PARCELAS_LINEA_BASE,
+}
+
+
+def entorno():
+    """Datos de la corrida para interpretar y comparar resultados"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'fecha': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'shapely': shapely.__version__,
+        'nucleos': os.cpu_count(),
+    }
+
+
+def clave(registro):
+    """Identifica la misma medición en corridas distintas"""
+    return (registro['parcelas'], registro['motor'], registro['medicion'], registro.get('radio_km'))
+
+
+def comparar(registros, anteriores, umbral):
+    """Valores que empeoraron más que umbral (fracción) respecto de la corrida anterior"""
+    base = {clave(r): r for r in anteriores}
+    empeorados = []
+    for registro in registros:
+        previo = base.get(clave(registro))
+        if previo is None:
+            continue
+        for campo, valor in registro.items():
+            if not campo.endswith(SUFIJOS_COMPARABLES) or not previo.get(campo):
+                continue
+            cociente = valor / previo[campo]
+            if cociente > 1 + umbral:
+                empeorados.append((clave(registro), campo, previo[campo], valor, cociente))
+    return empeorados
+
+
+def aceleraciones(registros, base='linea_base'):
+    """
+    Cociente entre el p50 de la línea base y el de cada otro motor, para las
+    mediciones de la misma corrida que tienen los dos
+    """
+    p50_base = {
+        (r['parcelas'], r['medicion'], r.get('radio_km')): r['p50_ms']
+        for r in registros if r['motor'] == base and 'p50_ms' in r
+    }
+    return [
+        (r['parcelas'], r['motor'], r['medicion'], r.get('radio_km'),
+         p50_base[(r['parcelas'], r['medicion'], r.get('radio_km'))] / r['p50_ms'])
+        for r in registros
+        if r['motor'] != base and r.get('p50_ms') and (r['parcelas'], r['medicion'], r.get('radio_km')) in p50_base
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tamanos', type=int, nargs='+', default=TAMANOS)
+    parser.add_argument('--radios', type=float, nargs='+', default=RADIOS_KM)
+    parser.add_argument('--consultas', type=int, default=200)
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--motores', nargs='+', default=list(MOTORES), choices=list(MOTORES))
+    parser.add_argument('--datos', default=os.path.join(tempfile.gettempdir(), 'visor_benchmarks'),
+                        help="Directorio de los registros sintéticos generados")
+    parser.add_argument('--salida', help="Archivo JSON lines al que se agregan los resultados")
+    parser.add_argument('--comparar', help="Resultados JSON lines de una corrida anterior")
+    parser.add_argument('--umbral', type=float, default=0.2,
+                        help="Empeoramiento relativo tolerado al comparar (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    os.makedirs(args.datos, exist_ok=True)
+    datos_entorno = entorno()
+    registros = []
+    for parcelas in args.tamanos:
+        ruta = os.path.join(args.datos, f'registro_{parcelas}_{args.semilla}.csv')
+        if not os.path.exists(ruta):
+            inicio = time.perf_counter()
+            escribir_csv(ruta + '.tmp', parcelas, args.semilla)
+            os.replace(ruta + '.tmp', ruta)
+            print(f"Generado {ruta} en {time.perf_counter() - inicio:.1f} s", file=sys.stderr)
+
+        for motor in args.motores:
+            if parcelas > MAX_PARCELAS_MOTOR.get(motor, parcelas):
+                print(f"{parcelas:>10,} {motor:>16} omitido (más de {MAX_PARCELAS_MOTOR[motor]:,} parcelas)")
+                continue
+            # Un proceso nuevo por medición: el pico de memoria es sólo el de este tamaño
+            with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as pool:
+                medidos = pool.submit(
+                    MOTORES[motor], ruta, args.radios, args.consultas, args.semilla
+                ).result()
+            for registro in medidos:
+                registros.append({'parcelas': parcelas, 'motor': motor, **registro, **datos_entorno})
+                valores = {k: v for k, v in registro.items() if k != 'medicion'}
+                print(f"{parcelas:>10,} {motor:>16} {registro['medicion']:>9} {json.dumps(valores)}")
+
+    for parcelas, motor, medicion, radio, cociente in aceleraciones(registros):
+        radio = f" radio {radio} km" if radio is not None else ""
+        print(f"{parcelas:>10,} {motor} {medicion}{radio}: {cociente:,.1f}x más rápido que la línea base")
+
+    if args.salida:
+        with open(args.salida, 'a') as archivo:
+            archivo.writelines(json.dumps(r) + '\n' for r in registros)
+
+    if args.comparar:
+        with open(args.comparar) as archivo:
+            anteriores = [json.loads(linea) for linea in archivo if linea.strip()]
+        # Se compara con la última corrida de cada medición
+        empeorados = comparar(registros, anteriores, args.umbral)
+        for (parcelas, motor, medicion, radio), campo, antes, ahora, cociente in empeorados:
+            radio = f" radio {radio} km" if radio is not None else ""
+            print(f"EMPEORÓ {parcelas:,} {motor} {medicion}{radio} {campo}: "
+                  f"{antes} -> {ahora} ({cociente:.2f}x)")
+        if empeorados:
+            sys.exit(1)
+        print(f"Sin empeoramientos mayores al {args.umbral:.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+Búsqueda de productores por texto: razón social, CUIT, RENSPA o localidad.
+
+El índice invertido se arma sobre los valores distintos de cada columna (las
+categorías de la tabla compacta), no sobre las filas: cada valor se normaliza
+(minúsculas y sin acentos), se divide en términos y cada término apunta a la
+categoría de la que salió. Los términos se guardan en un arreglo ordenado, así
+que un prefijo se resuelve con dos búsquedas binarias; las categorías
+encontradas se expanden a filas con un índice categoría -> filas.
+
+Los CUIT y RENSPA también se indexan como una sola cadena de dígitos, y en el
+caso del CUIT con todos sus sufijos, para encontrarlos escribiendo sólo una
+parte del número, con o sin guiones.
+"""
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+COLUMNAS_TEXTO = ['titular', 'cuit', 'renspa', 'localidad']
+
+# Columnas de identificadores: además de sus términos se indexan sus dígitos juntos
+COLUMNAS_IDENTIFICADOR = ['cuit', 'renspa']
+
+# Columnas cuyos dígitos se indexan con todos sus sufijos (búsqueda por cualquier parte)
+COLUMNAS_SUFIJOS = ['cuit']
+
+# Largo mínimo de los sufijos indexados
+LARGO_MINIMO_SUFIJO = 3
+
+# Mayor que cualquier carácter de un término: termino + FIN_PREFIJO acota los términos con ese prefijo
+FIN_PREFIJO = b'\xff'
+
+
+def normalizar(texto):
+    """Minúsculas y sin acentos ni diacríticos ("Peñaflor" -> "penaflor")"""
+    descompuesto = unicodedata.normalize('NFKD', str(texto))
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c)).lower()
+
+
+def tokenizar(texto):
+    """Términos alfanuméricos de un texto ya normalizado"""
+    return re.findall(r'[0-9a-z]+', texto)
+
+
+def _expandir(orden, inicios, codigos):
+    """Filas de varias categorías de un índice categoría -> filas, concatenadas"""
+    desde = inicios[codigos]
+    cantidades = inicios[codigos + 1] - desde
+    desplazamiento = np.repeat(desde - np.cumsum(cantidades) + cantidades, cantidades)
+    return orden[desplazamiento + np.arange(cantidades.sum())]
+
+
+class IndiceTexto:
+    """
+    Índice invertido de prefijos sobre las columnas de texto de la tabla de
+    productores. Las posiciones devueltas son posiciones de fila (iloc).
+
+    Los términos (sólo [0-9a-z] tras normalizar) se guardan como bytes,
+    distintos y ordenados; los pares (columna, categoría) de cada término están
+    en terminos_columnas/terminos_categorias a partir de inicios_termino.
+    """
+
+    def __init__(self, datos, columnas=COLUMNAS_TEXTO):
+        self.columnas = [c for c in columnas if c in datos.columns]
+        self.cantidad_filas = len(datos)
+
+        terminos, columnas_termino, categorias_termino = [], [], []
+        # Códigos de categoría de cada fila, por columna
+        self.codigos = []
+        for numero, columna in enumerate(self.columnas):
+            categorias = pd.Categorical(datos[columna])
+            for codigo, valor in enumerate(categorias.categories):
+                normal = normalizar(valor)
+                propios = set(tokenizar(normal))
+                if columna in COLUMNAS_IDENTIFICADOR:
+                    digitos = re.sub(r'\D', '', normal)
+                    if columna in COLUMNAS_SUFIJOS:
+                        propios.update(
+                            digitos[k:] for k in range(len(digitos) - LARGO_MINIMO_SUFIJO + 1)
+                        )
+                    if digitos:
+                        propios.add(digitos)
+                terminos.extend(propios)
+                columnas_termino.extend([numero] * len(propios))
+                categorias_termino.extend([codigo] * len(propios))
+            self.codigos.append((np.asarray(categorias.codes), len(categorias.categories)))
+
+        terminos = np.asarray(terminos, dtype=bytes)
+        orden = np.argsort(terminos, kind='stable')
+        self.terminos, primeros = np.unique(terminos[orden], return_index=True)
+        self.inicios_termino = np.append(primeros, len(terminos))
+        self.columnas_termino = np.asarray(columnas_termino, dtype=np.int8)[orden]
+        self.categorias_termino = np.asarray(categorias_termino, dtype=np.int64)[orden]
+
+        cuits = pd.Categorical(datos['cuit'])
+        self.cuits = cuits.categories
+        self.codigos_cuit = np.asarray(cuits.codes, dtype=np.int64)
+        self.titulares = datos['titular'] if 'titular' in datos.columns else None
+        self.latitudes = datos['latitud'].to_numpy(dtype=np.float64)
+        self.longitudes = datos['longitud'].to_numpy(dtype=np.float64)
+
+    def __len__(self):
+        return len(self.terminos)
+
+    def memoria_bytes(self):
+        """Bytes ocupados por los arreglos del índice de términos"""
+        return (self.terminos.nbytes + self.inicios_termino.nbytes
+                + self.columnas_termino.nbytes + self.categorias_termino.nbytes)
+
+    def _filas_de_termino(self, termino):
+        """Máscara de las filas con algún término que empiece con termino"""
+        prefijo = termino.encode('ascii')
+        desde = np.searchsorted(self.terminos, prefijo, side='left')
+        hasta = np.searchsorted(self.terminos, prefijo + FIN_PREFIJO, side='left')
+        columnas = self.columnas_termino[self.inicios_termino[desde]:self.inicios_termino[hasta]]
+        categorias = self.categorias_termino[self.inicios_termino[desde]:self.inicios_termino[hasta]]
+
+        mascara = np.zeros(self.cantidad_filas, dtype=bool)
+        for numero in np.unique(columnas):
+            codigos, cantidad = self.codigos[numero]
+            # Una posición más para el código -1 (nulo), que nunca coincide
+            marcadas = np.zeros(cantidad + 1, dtype=bool)
+            marcadas[categorias[columnas == numero]] = True
+            mascara |= marcadas[codigos]
+        return mascara
+
+    def buscar(self, consulta):
+        """
+        Posiciones (ordenadas) de las parcelas en las que cada término de la
+        consulta es prefijo de algún término de sus columnas de texto
+        """
+        terminos = tokenizar(normalizar(consulta))
+        if not terminos:
+            return np.empty(0, dtype=np.int64)
+
+        mascara = self._filas_de_termino(terminos[0])
+        for termino in terminos[1:]:
+            mascara &= self._filas_de_termino(termino)
+        return np.flatnonzero(mascara)
+
+    def productores(self, posiciones, limite=20):
+        """
+        Agrupa las parcelas encontradas por CUIT y devuelve los primeros
+        productores por razón social, con su cantidad de parcelas y el centro de
+        ellas
+        """
+        posiciones = np.asarray(posiciones, dtype=np.int64)
+        codigos = self.codigos_cuit[posiciones]
+        posiciones, codigos = posiciones[codigos >= 0], codigos[codigos >= 0]
+
+        # Conteos y sumas por código de CUIT, sin ordenar las parcelas
+        total = len(self.cuits)
+        cantidades = np.bincount(codigos, minlength=total)
+        unicos = np.flatnonzero(cantidades)
+        cantidades = cantidades[unicos]
+        latitudes = np.bincount(codigos, self.latitudes[posiciones], total)[unicos] / cantidades
+        longitudes = np.bincount(codigos, self.longitudes[posiciones], total)[unicos] / cantidades
+        # Primera parcela de cada CUIT: en la asignación gana la última escritura
+        primeras = np.empty(total, dtype=np.int64)
+        primeras[codigos[::-1]] = posiciones[::-1]
+        primeras = primeras[unicos]
+
+        # Se ordena por el texto de la razón social, no por el código: las categorías
+        # de una tabla abierta del artefacto están en orden de aparición
+        if self.titulares is not None:
+            titulares = pd.Categorical(self.titulares.iloc[primeras])
+            orden = np.argsort(np.asarray(titulares.categories, dtype=str), kind='stable')
+            rangos = np.empty(len(orden), dtype=np.int64)
+            rangos[orden] = np.arange(len(orden))
+            # Los productores sin razón social van al final
+            claves = np.where(titulares.codes >= 0, rangos[titulares.codes], len(rangos))
+            elegidos = np.argsort(claves, kind='stable')[:limite]
+            titulares = np.asarray(titulares[elegidos], dtype=object)
+        else:
+            elegidos = np.arange(min(limite, len(unicos)))
+            titulares = None
+
+        return pd.DataFrame({
+            'cuit': np.asarray(self.cuits[unicos[elegidos]], dtype=object),
+            'titular': titulares,
+            'parcelas': cantidades[elegidos],
+            'latitud': latitudes[elegidos],
+            'longitud': longitudes[elegidos],
+        })
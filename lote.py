@@ -0,0 +1,196 @@
+"""
+Geolocalización en lote de puntos GPS (camiones, silobolsas, inspecciones).
+
+Para cada punto de un CSV obtiene las parcelas que lo contienen (titular) y,
+opcionalmente, los productores más cercanos dentro de un radio. La contención
+se resuelve en bloque con una sola consulta al STRtree por bloque de puntos, y
+los resultados se escriben a medida que se procesa cada bloque, así que el
+archivo de entrada puede ser arbitrariamente grande.
+
+El CSV de entrada necesita columnas de latitud y longitud ("latitud"/"lat" y
+"longitud"/"lon"/"lng"); si tiene una columna "id" se copia a la salida.
+
+Uso:
+
+    python -m lote puntos.csv -o resultados.csv --radio 5 --max-cercanos 5
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from almacen import cargar_o_preprocesar
+from metricas import medido
+from motor import buscar_cercanos
+
+# Puntos leídos y procesados por bloque
+TAMANO_BLOQUE = 10_000
+
+COLUMNAS_SALIDA = [
+    'id', 'latitud_punto', 'longitud_punto', 'tipo', 'cuit', 'titular',
+    'renspa', 'localidad', 'distancia_km'
+]
+
+NOMBRES_LATITUD = ['latitud', 'lat']
+NOMBRES_LONGITUD = ['longitud', 'lon', 'lng']
+
+
+def columnas_coordenadas(columnas):
+    """Devuelve los nombres de las columnas de latitud y longitud del CSV de puntos"""
+    minusculas = {str(c).strip().lower(): c for c in columnas}
+    col_lat = next((minusculas[n] for n in NOMBRES_LATITUD if n in minusculas), None)
+    col_lon = next((minusculas[n] for n in NOMBRES_LONGITUD if n in minusculas), None)
+    if col_lat is None or col_lon is None:
+        raise ValueError("El CSV de puntos debe tener columnas de latitud y longitud "
+                         f"({'/'.join(NOMBRES_LATITUD)} y {'/'.join(NOMBRES_LONGITUD)})")
+    return col_lat, col_lon
+
+
+@medido('geolocalizar_bloque')
+def geolocalizar_bloque(puntos, datos, indice, radio_km=0, max_cercanos=5, primer_id=0,
+                        trabajadores=1, fecha=None):
+    """
+    Geolocaliza un bloque de puntos y devuelve un DataFrame con una fila por
+    coincidencia: tipo 'contenedor' para las parcelas que contienen el punto y
+    'cercano' para los productores más cercanos (hasta max_cercanos dentro de
+    radio_km). Los puntos sin coincidencias o con coordenadas inválidas también
+    tienen su fila, para que la salida cubra toda la entrada. La contención se
+    reparte entre trabajadores hilos. Con fecha sólo se consideran las parcelas
+    vigentes a esa fecha.
+    """
+    col_lat, col_lon = columnas_coordenadas(puntos.columns)
+    lats = pd.to_numeric(puntos[col_lat], errors='coerce').to_numpy(dtype=np.float64)
+    lons = pd.to_numeric(puntos[col_lon], errors='coerce').to_numpy(dtype=np.float64)
+    if 'id' in puntos.columns:
+        ids = puntos['id'].to_numpy()
+    else:
+        ids = np.arange(primer_id, primer_id + len(puntos))
+
+    validos = np.flatnonzero(
+        np.isfinite(lats) & np.isfinite(lons) & (np.abs(lats) <= 90) & (np.abs(lons) <= 180)
+    )
+
+    # Contención de todos los puntos válidos en una sola consulta
+    puntos_dentro, contenedores = indice.parcelas_que_contienen_lote(
+        lats[validos], lons[validos], trabajadores, fecha=fecha
+    )
+    puntos_dentro = validos[puntos_dentro]
+
+    indices_punto = [puntos_dentro]
+    posiciones = [contenedores]
+    distancias = [np.zeros(len(contenedores))]
+    tipos = [np.full(len(contenedores), 'contenedor', dtype=object)]
+
+    # Productores cercanos de cada punto, reutilizando los contenedores ya calculados
+    if radio_km > 0 and max_cercanos > 0:
+        limites = np.searchsorted(puntos_dentro, validos, side='left')
+        limites_fin = np.searchsorted(puntos_dentro, validos, side='right')
+        for punto, inicio, fin in zip(validos, limites, limites_fin):
+            busqueda = buscar_cercanos(
+                lats[punto], lons[punto], indice, radio_km, contenedores=contenedores[inicio:fin],
+                fecha=fecha
+            )
+            cantidad = min(max_cercanos, len(busqueda.posiciones))
+            indices_punto.append(np.full(cantidad, punto, dtype=np.int64))
+            posiciones.append(busqueda.posiciones[:cantidad])
+            distancias.append(busqueda.distancias[:cantidad])
+            tipos.append(np.full(cantidad, 'cercano', dtype=object))
+
+    indices_punto = np.concatenate(indices_punto)
+    posiciones = np.concatenate(posiciones)
+    filas = datos.iloc[posiciones]
+
+    coincidencias = pd.DataFrame({
+        'punto': indices_punto,
+        'tipo': np.concatenate(tipos),
+        'cuit': filas['cuit'].to_numpy(),
+        'titular': filas['titular'].to_numpy(),
+        'renspa': filas['renspa'].to_numpy() if 'renspa' in filas.columns else None,
+        'localidad': filas['localidad'].to_numpy() if 'localidad' in filas.columns else None,
+        'distancia_km': np.round(np.concatenate(distancias), 3),
+    })
+
+    # Una fila para cada punto sin coincidencias
+    sin_coincidencias = np.setdiff1d(np.arange(len(puntos)), indices_punto)
+    invalidos = np.ones(len(puntos), dtype=bool)
+    invalidos[validos] = False
+    faltantes = pd.DataFrame({
+        'punto': sin_coincidencias,
+        'tipo': np.where(invalidos[sin_coincidencias], 'coordenadas_invalidas', 'sin_resultados'),
+    })
+
+    partes = [p for p in (coincidencias, faltantes) if not p.empty]
+    if not partes:
+        return pd.DataFrame(columns=COLUMNAS_SALIDA)
+    # Si ningún punto tiene coincidencias las columnas de las parcelas quedan vacías
+    salida = pd.concat(partes, ignore_index=True).reindex(columns=coincidencias.columns)
+    # Contenedores primero y luego cercanos por distancia, punto por punto
+    salida['orden_tipo'] = (salida['tipo'] != 'contenedor').astype(int)
+    salida = salida.sort_values(['punto', 'orden_tipo', 'distancia_km'], kind='stable')
+
+    salida['id'] = ids[salida['punto'].to_numpy()]
+    salida['latitud_punto'] = lats[salida['punto'].to_numpy()]
+    salida['longitud_punto'] = lons[salida['punto'].to_numpy()]
+    return salida[COLUMNAS_SALIDA].reset_index(drop=True)
+
+
+def geolocalizar_lote(bloques, datos, indice, radio_km=0, max_cercanos=5, trabajadores=1,
+                      fecha=None):
+    """
+    Procesa un iterable de bloques de puntos (DataFrames, por ejemplo el de
+    pd.read_csv con chunksize) y va devolviendo (resultado, puntos procesados).
+    """
+    procesados = 0
+    for bloque in bloques:
+        resultado = geolocalizar_bloque(
+            bloque, datos, indice, radio_km, max_cercanos, primer_id=procesados,
+            trabajadores=trabajadores, fecha=fecha
+        )
+        procesados += len(bloque)
+        yield resultado, len(bloque)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Geolocaliza en lote un CSV de puntos GPS")
+    parser.add_argument('puntos', help="CSV con columnas de latitud y longitud")
+    parser.add_argument('-o', '--salida', default='-', help="CSV de salida ('-' para la salida estándar)")
+    parser.add_argument('--registro', default='datos_productores.csv', help="CSV de productores")
+    parser.add_argument('--radio', type=float, default=0.0,
+                        help="radio en km para los productores cercanos (0 = sólo contenedores)")
+    parser.add_argument('--max-cercanos', type=int, default=5)
+    parser.add_argument('--bloque', type=int, default=TAMANO_BLOQUE, help="puntos por bloque")
+    parser.add_argument('--trabajadores', type=int, default=1,
+                        help="hilos para la contención y procesos para interpretar el registro "
+                             "(0 = todos los núcleos)")
+    parser.add_argument('--fecha', default=None,
+                        help="sólo parcelas vigentes a esta fecha (AAAA-MM-DD); por defecto todas")
+    args = parser.parse_args()
+
+    datos, indice = cargar_o_preprocesar(args.registro, trabajadores=args.trabajadores)
+
+    salida = sys.stdout if args.salida == '-' else open(args.salida, 'w', newline='', encoding='utf-8')
+    try:
+        inicio = time.perf_counter()
+        total = 0
+        bloques = pd.read_csv(args.puntos, chunksize=args.bloque)
+        for numero, (resultado, cantidad) in enumerate(
+            geolocalizar_lote(
+                bloques, datos, indice, args.radio, args.max_cercanos, args.trabajadores,
+                args.fecha
+            )
+        ):
+            resultado.to_csv(salida, header=numero == 0, index=False)
+            total += cantidad
+        segundos = time.perf_counter() - inicio
+    finally:
+        if salida is not sys.stdout:
+            salida.close()
+
+    print(f"{total} puntos en {segundos:.2f} s ({total / max(segundos, 1e-9):,.0f} puntos/s)",
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
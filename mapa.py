@@ -0,0 +1,312 @@
+"""
+Construcción de los mapas Folium de la aplicación.
+
+Además del renderizado detallado (un folium.Polygon y un marcador con popup por
+resultado), ofrece un renderizado simplificado para búsquedas con muchos
+resultados: los polígonos se simplifican (Douglas-Peucker) con una tolerancia
+de aproximadamente un píxel para el zoom del mapa y se envían todos juntos como
+una única capa GeoJSON, y los marcadores se limitan a los más cercanos dentro de
+un MarkerCluster.
+
+Los resultados se dibujan sobre una capa (FeatureGroup) aparte del mapa base:
+st_folium identifica el mapa por su código sin los identificadores aleatorios,
+así que mientras el mapa base se arme igual el navegador lo conserva (con su
+vista, teselas y dibujos) y sólo reemplaza la capa de resultados.
+"""
+import json
+
+import branca.colormap as cm
+import folium
+import numpy as np
+import shapely
+from folium.plugins import Draw, Geocoder, MarkerCluster
+
+from metricas import medido
+
+# Cantidad máxima de marcadores en el renderizado simplificado
+MAX_MARCADORES = 200
+
+# A partir de esta cantidad de resultados el modo automático usa el renderizado simplificado
+UMBRAL_RESULTADOS_SIMPLIFICADO = 100
+
+# Decimales de las coordenadas enviadas al navegador (1e-5 grados ~ 1 m)
+DECIMALES_COORDENADAS = 5
+
+# Colores de la escala de distancias (de cerca a lejos)
+COLORES_DISTANCIA = ['green', 'yellow', 'orange', 'red']
+
+
+# Función para crear mapa base
+@medido('crear_mapa_base')
+def crear_mapa_base(lat, lon, zoom=10):
+    m = folium.Map(location=[lat, lon], zoom_start=zoom, tiles='CartoDB positron')
+    
+    # Añadir control de dibujo: polígonos y rectángulos son consultas por área
+    draw = Draw(
+        draw_options={
+            'polyline': False,
+            'rectangle': True,
+            'polygon': True,
+            'circle': False,
+            'circlemarker': False,
+            'marker': True
+        },
+        edit_options={'edit': False}
+    )
+    draw.add_to(m)
+    
+    # Añadir buscador geocoder
+    Geocoder().add_to(m)
+    
+    # Añadir capas base adicionales
+    folium.TileLayer('CartoDB dark_matter', name='Dark Mode').add_to(m)
+    folium.TileLayer('https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}',
+                   name='Satellite', attr='Esri').add_to(m)
+    folium.TileLayer('https://mt1.google.com/vt/lyrs=m&x={x}&y={y}&z={z}',
+                   name='Google Map', attr='Google').add_to(m)
+    
+    # Añadir control de capas
+    folium.LayerControl().add_to(m)
+    
+    # Añadir escala
+    folium.plugins.MeasureControl(position='bottomleft').add_to(m)
+    
+    return m
+
+def agregar_area(m, area):
+    """Dibuja el área de una consulta (geometría GeoJSON en lon/lat) sin relleno"""
+    folium.GeoJson(
+        {'type': 'Feature', 'geometry': area, 'properties': {}},
+        name="Área de búsqueda",
+        style_function=lambda _: {'color': '#2c6e49', 'weight': 3, 'fill': False, 'dashArray': '6 4'}
+    ).add_to(m)
+    return m
+
+def agregar_vista_general(m, coleccion, maximo_parcelas):
+    """
+    Agrega las celdas agregadas de la vista general (FeatureCollection de
+    vista_general.VistaGeneral) coloreadas por cantidad de parcelas, en escala
+    logarítmica hasta maximo_parcelas
+    """
+    escala = np.log10(max(maximo_parcelas, 10))
+    colormap = cm.LinearColormap(
+        colors=['#d8f3dc', '#74c69d', '#2c6e49', '#081c15'], vmin=0, vmax=escala
+    )
+    folium.GeoJson(
+        coleccion,
+        name="Parcelas (vista general)",
+        style_function=lambda feature: {
+            'color': colormap(min(np.log10(feature['properties']['parcelas']), escala)),
+            'fillOpacity': 0.6,
+            'weight': 1,
+        },
+        tooltip=folium.GeoJsonTooltip(
+            fields=['parcelas', 'superficie'], aliases=['Parcelas', 'Superficie (ha)']
+        ),
+    ).add_to(m)
+    return m
+
+def crear_capa_resultados():
+    """Capa de resultados que se envía sobre el mapa base sin reconstruirlo"""
+    return folium.FeatureGroup(name="Resultados")
+
+def leyenda_distancias_html(radio_km):
+    """Leyenda de la escala de distancias como HTML liviano, para mostrar fuera del mapa"""
+    return (
+        '<div style="font-size:0.8rem">Distancia (km)'
+        f'<div style="height:10px;background:linear-gradient(to right,{",".join(COLORES_DISTANCIA)})"></div>'
+        f'<div style="display:flex;justify-content:space-between"><span>0</span>'
+        f'<span>{radio_km / 2:g}</span><span>{radio_km:g}</span></div></div>'
+    )
+
+def _agregar_leyenda(m, colormap):
+    # La leyenda de branca es un control del mapa: en una capa de resultados va fuera del mapa
+    if isinstance(m, folium.Map):
+        colormap.caption = 'Distancia (km)'
+        colormap.add_to(m)
+
+def tolerancia_para_zoom(zoom):
+    """Tamaño de un píxel de las teselas (256 px) en grados para el nivel de zoom"""
+    return 360.0 / (256 * 2 ** zoom)
+
+def _crear_colormap(radio_km):
+    return cm.LinearColormap(
+        colors=COLORES_DISTANCIA,
+        index=[0, radio_km/3, 2*radio_km/3, radio_km],
+        vmin=0,
+        vmax=radio_km
+    )
+
+def _agregar_punto_y_radio(m, point, radio_km):
+    # En las consultas por área no hay punto ni radio
+    if point is None:
+        return
+    
+    # Añadir marcador para el punto seleccionado
+    folium.Marker(
+        location=point,
+        popup="Punto seleccionado",
+        icon=folium.Icon(color="red", icon="crosshairs", prefix="fa")
+    ).add_to(m)
+    
+    # Añadir círculo para el radio de búsqueda
+    folium.Circle(
+        location=point,
+        radius=radio_km * 1000,  # Convertir a metros
+        color="#2c6e49",
+        fill=True,
+        fill_opacity=0.1
+    ).add_to(m)
+
+def _crear_marcador(productor):
+    # Definir icono según si el punto está dentro del polígono
+    icon_color = "green" if productor.get('dentro_poligono', False) else "blue"
+    icon_symbol = "check" if productor.get('dentro_poligono', False) else "info"
+    
+    return folium.Marker(
+        location=[productor['latitud'], productor['longitud']],
+        popup=folium.Popup(
+            f"""
+            <b>{productor['titular']}</b><br>
+            CUIT: {productor['cuit']}<br>
+            RENSPA: {productor.get('renspa', 'No disponible')}<br>
+            Localidad: {productor.get('localidad', 'No disponible')}<br>
+            Superficie: {productor.get('superficie', 'No disponible')} ha<br>
+            Distancia: {productor['distancia']} km
+            """,
+            max_width=300
+        ),
+        icon=folium.Icon(color=icon_color, icon=icon_symbol, prefix="fa"),
+        tooltip=f"{productor['titular']} - {productor['distancia']} km"
+    )
+
+# Función para visualizar resultados en el mapa
+@medido('visualizar_resultados')
+def visualizar_resultados(m, point, resultados, radio_km):
+    _agregar_punto_y_radio(m, point, radio_km)
+    
+    # Crear mapa de colores para los polígonos según la distancia
+    colormap = _crear_colormap(radio_km)
+    
+    # Añadir marcadores y polígonos para los productores cercanos
+    for productor in resultados.to_dict('records'):
+        # Añadir marcador
+        _crear_marcador(productor).add_to(m)
+        
+        # Añadir polígono si está disponible
+        if productor.get('poligono_formatted') and len(productor['poligono_formatted']) > 2:
+            folium.Polygon(
+                locations=productor['poligono_formatted'],
+                popup=productor['titular'],
+                color=colormap(productor['distancia']),
+                fill=True,
+                fill_opacity=0.4,
+                weight=2
+            ).add_to(m)
+    
+    # Añadir leyenda de colores
+    _agregar_leyenda(m, colormap)
+    
+    return m
+
+def poligonos_a_geojson(resultados, colormap, tolerancia):
+    """
+    Arma una FeatureCollection con los polígonos de los resultados simplificados con
+    la tolerancia dada (en grados). Devuelve la colección y estadísticas de tamaño
+    comparadas con los polígonos a resolución completa.
+    """
+    con_poligono = [
+        (productor, poligono) for productor, poligono in
+        zip(resultados.to_dict('records'), resultados['poligono_formatted'])
+        if poligono and len(poligono) > 2
+    ]
+    estadisticas = {
+        'poligonos': len(con_poligono),
+        'vertices_originales': 0,
+        'vertices_simplificados': 0,
+        'bytes_originales': 0,
+        'bytes_simplificados': 0,
+    }
+    if not con_poligono:
+        return {'type': 'FeatureCollection', 'features': []}, estadisticas
+
+    # Geometrías Shapely (x=lon, y=lat) de todos los polígonos, simplificadas en bloque
+    geometrias = np.array(
+        [shapely.polygons(np.asarray(poligono)[:, ::-1]) for _, poligono in con_poligono],
+        dtype=object
+    )
+    simplificadas = shapely.simplify(geometrias, tolerancia, preserve_topology=True)
+    simplificadas = shapely.transform(
+        simplificadas, lambda coordenadas: np.round(coordenadas, DECIMALES_COORDENADAS)
+    )
+
+    estadisticas['vertices_originales'] = int(shapely.get_num_coordinates(geometrias).sum())
+    estadisticas['vertices_simplificados'] = int(shapely.get_num_coordinates(simplificadas).sum())
+
+    features = []
+    features_originales = []
+    for (productor, poligono), geometria in zip(con_poligono, simplificadas):
+        propiedades = {
+            'titular': str(productor['titular']),
+            'cuit': str(productor['cuit']),
+            'distancia': float(productor['distancia']),
+            'color': colormap(productor['distancia']),
+        }
+        features.append({
+            'type': 'Feature',
+            'geometry': json.loads(shapely.to_geojson(geometria)),
+            'properties': propiedades,
+        })
+        features_originales.append({
+            'type': 'Feature',
+            'geometry': {'type': 'Polygon', 'coordinates': [[[lon, lat] for lat, lon in poligono]]},
+            'properties': propiedades,
+        })
+
+    coleccion = {'type': 'FeatureCollection', 'features': features}
+    estadisticas['bytes_simplificados'] = len(json.dumps(coleccion))
+    estadisticas['bytes_originales'] = len(json.dumps(
+        {'type': 'FeatureCollection', 'features': features_originales}
+    ))
+    return coleccion, estadisticas
+
+@medido('visualizar_resultados_simplificados')
+def visualizar_resultados_simplificados(m, point, resultados, radio_km, zoom=10, max_marcadores=MAX_MARCADORES):
+    """
+    Variante liviana de visualizar_resultados para muchos resultados: todos los
+    polígonos van simplificados en una sola capa GeoJSON y sólo se agregan
+    marcadores (agrupados) para los max_marcadores resultados más cercanos.
+    Devuelve el mapa y las estadísticas de tamaño de los polígonos.
+    """
+    _agregar_punto_y_radio(m, point, radio_km)
+    
+    colormap = _crear_colormap(radio_km)
+    
+    # Todos los polígonos en una única capa GeoJSON
+    coleccion, estadisticas = poligonos_a_geojson(resultados, colormap, tolerancia_para_zoom(zoom))
+    if coleccion['features']:
+        folium.GeoJson(
+            coleccion,
+            name="Parcelas",
+            style_function=lambda feature: {
+                'color': feature['properties']['color'],
+                'fillOpacity': 0.4,
+                'weight': 2,
+            },
+            tooltip=folium.GeoJsonTooltip(
+                fields=['titular', 'cuit', 'distancia'],
+                aliases=['Razón Social', 'CUIT', 'Distancia (km)']
+            ),
+        ).add_to(m)
+    
+    # Marcadores sólo para los más cercanos (los resultados vienen ordenados por distancia)
+    cluster = MarkerCluster().add_to(m)
+    for productor in resultados.head(max_marcadores).to_dict('records'):
+        _crear_marcador(productor).add_to(cluster)
+    estadisticas['marcadores'] = min(len(resultados), max_marcadores)
+    estadisticas['resultados'] = len(resultados)
+    
+    # Añadir leyenda de colores
+    _agregar_leyenda(m, colormap)
+    
+    return m, estadisticas
@@ -0,0 +1,153 @@
+"""
+Instrumentación de las etapas críticas: tiempos y contadores.
+
+Las etapas se miden con el decorador medido o el context manager medir y se
+acumulan en un registro por proceso (REGISTRO), compartido por todas las
+sesiones de la aplicación y las peticiones del servicio. Cada etapa guarda la
+cantidad de llamadas, el tiempo total y las últimas MUESTRAS_POR_ETAPA
+duraciones, de las que salen los percentiles p50/p95.
+
+El registro se exporta como tabla (panel de diagnóstico), como texto de
+Prometheus (métricas summary con cuantiles) o como líneas JSON. Además, con el
+logger "visor.metricas" en nivel DEBUG cada medición se registra como una
+línea JSON.
+"""
+import functools
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# Duraciones recientes por etapa sobre las que se calculan los percentiles
+MUESTRAS_POR_ETAPA = 1024
+
+PREFIJO_PROMETHEUS = 'visor'
+
+logger = logging.getLogger('visor.metricas')
+
+
+class RegistroMetricas:
+    """Tiempos por etapa (llamadas, total y muestras recientes) y contadores"""
+
+    def __init__(self, muestras_por_etapa=MUESTRAS_POR_ETAPA):
+        self.muestras_por_etapa = muestras_por_etapa
+        self._candado = threading.Lock()
+        self._muestras = {}
+        self._llamadas = {}
+        self._totales = {}
+        self._contadores = {}
+
+    def registrar(self, etapa, segundos):
+        """Agrega la duración de una ejecución de la etapa"""
+        with self._candado:
+            if etapa not in self._muestras:
+                self._muestras[etapa] = deque(maxlen=self.muestras_por_etapa)
+                self._llamadas[etapa] = 0
+                self._totales[etapa] = 0.0
+            self._muestras[etapa].append(segundos)
+            self._llamadas[etapa] += 1
+            self._totales[etapa] += segundos
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(json.dumps({'etapa': etapa, 'segundos': round(segundos, 6), 'ts': time.time()}))
+
+    def contar(self, contador, cantidad=1):
+        """Suma cantidad al contador"""
+        with self._candado:
+            self._contadores[contador] = self._contadores.get(contador, 0) + cantidad
+
+    @contextmanager
+    def medir(self, etapa):
+        """Mide la duración del bloque como una ejecución de la etapa"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(etapa, time.perf_counter() - inicio)
+
+    def medido(self, etapa):
+        """Decorador que mide cada llamada a la función como una ejecución de la etapa"""
+        def decorador(funcion):
+            @functools.wraps(funcion)
+            def envoltura(*args, **kwargs):
+                inicio = time.perf_counter()
+                try:
+                    return funcion(*args, **kwargs)
+                finally:
+                    self.registrar(etapa, time.perf_counter() - inicio)
+            return envoltura
+        return decorador
+
+    def _copia(self):
+        with self._candado:
+            return (
+                {etapa: np.array(muestras) for etapa, muestras in self._muestras.items()},
+                dict(self._llamadas), dict(self._totales), dict(self._contadores)
+            )
+
+    def resumen(self):
+        """DataFrame con una fila por etapa: llamadas, total y p50/p95/máximo recientes en ms"""
+        muestras, llamadas, totales, _ = self._copia()
+        filas = []
+        for etapa in sorted(muestras):
+            p50, p95 = np.percentile(muestras[etapa], [50, 95]) * 1000
+            filas.append({
+                'etapa': etapa,
+                'llamadas': llamadas[etapa],
+                'total_s': round(totales[etapa], 3),
+                'p50_ms': round(p50, 2),
+                'p95_ms': round(p95, 2),
+                'max_ms': round(muestras[etapa].max() * 1000, 2),
+            })
+        return pd.DataFrame(filas, columns=['etapa', 'llamadas', 'total_s', 'p50_ms', 'p95_ms', 'max_ms'])
+
+    def contadores(self):
+        """Copia de los contadores"""
+        return self._copia()[3]
+
+    def prometheus(self):
+        """Texto en el formato de exposición de Prometheus"""
+        muestras, llamadas, totales, contadores = self._copia()
+        nombre = f'{PREFIJO_PROMETHEUS}_etapa_segundos'
+        lineas = [
+            f'# HELP {nombre} Duración de las etapas instrumentadas',
+            f'# TYPE {nombre} summary',
+        ]
+        for etapa in sorted(muestras):
+            for cuantil, valor in zip(('0.5', '0.95'), np.percentile(muestras[etapa], [50, 95])):
+                lineas.append(f'{nombre}{{etapa="{etapa}",quantile="{cuantil}"}} {valor:.6f}')
+            lineas.append(f'{nombre}_sum{{etapa="{etapa}"}} {totales[etapa]:.6f}')
+            lineas.append(f'{nombre}_count{{etapa="{etapa}"}} {llamadas[etapa]}')
+        for contador in sorted(contadores):
+            nombre = f'{PREFIJO_PROMETHEUS}_{contador}_total'
+            lineas.append(f'# TYPE {nombre} counter')
+            lineas.append(f'{nombre} {contadores[contador]}')
+        return '\n'.join(lineas) + '\n'
+
+    def json_lineas(self):
+        """Una línea JSON por etapa (resumen) y por contador, para registros estructurados"""
+        ts = time.time()
+        lineas = [json.dumps({'ts': ts, **fila}) for fila in self.resumen().to_dict('records')]
+        lineas += [
+            json.dumps({'ts': ts, 'contador': contador, 'valor': valor})
+            for contador, valor in sorted(self.contadores().items())
+        ]
+        return '\n'.join(lineas) + '\n'
+
+    def reiniciar(self):
+        """Descarta todas las mediciones y contadores"""
+        with self._candado:
+            self._muestras.clear()
+            self._llamadas.clear()
+            self._totales.clear()
+            self._contadores.clear()
+
+
+REGISTRO = RegistroMetricas()
+medir = REGISTRO.medir
+medido = REGISTRO.medido
+contar = REGISTRO.contar
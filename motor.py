@@ -0,0 +1,1390 @@
+"""
+Motor de búsqueda espacial de parcelas.
+
+Los polígonos de todas las parcelas se interpretan de una sola vez a un buffer
+columnar de coordenadas (float64) con un arreglo de desplazamientos por parcela.
+Los rectángulos envolventes se guardan en un índice espacial (STRtree), de modo
+que las consultas de punto en polígono sólo construyen la geometría Shapely y
+evalúan la contención exacta de los candidatos cuyo rectángulo contiene el
+punto; las listas que usa Folium también se generan sólo para las parcelas que
+se muestran. Las búsquedas por radio usan una
+grilla regular de latitud/longitud para descartar de antemano las parcelas
+fuera del rectángulo envolvente del círculo de búsqueda, y calculan con NumPy
+las distancias de Haversine de los candidatos restantes. Sus resultados se
+guardan en un caché LRU compartido que responde también radios menores. Los k
+productores más cercanos se buscan con radios crecientes (se duplican) hasta
+alcanzar k CUIT distintos, de modo que el costo depende de k y no del registro.
+
+La tabla de productores se mantiene compacta: las columnas de texto (CUIT,
+titular, localidad, RENSPA...) como categorías, que guardan cada valor una sola
+vez, y las fechas como datetime64. Las búsquedas agrupan y comparan productores
+por el código entero de su CUIT.
+
+Al indexar se precalculan, vectorizados, el centroide, el rectángulo
+envolvente y la superficie geodésica de cada polígono. Con ellos las búsquedas
+por radio pueden medir la distancia hasta el borde de cada parcela (con los
+rectángulos envolventes descartando de antemano las lejanas) y se marcan las
+parcelas cuya superficie declarada no coincide con la de su polígono.
+
+Cada parcela tiene un intervalo de vigencia [inscripción, baja) precalculado
+como enteros (ns). Las consultas "a una fecha" descartan las parcelas no
+vigentes apenas salen de la grilla o del STRtree, antes de calcular distancias
+o armar polígonos.
+
+La interpretación de los polígonos y la contención en bloque pueden repartirse
+entre varios trabajadores: los textos se interpretan en procesos (el parser
+retiene el GIL) y las consultas de contención en hilos, porque las operaciones
+vectorizadas de Shapely liberan el GIL y así todos comparten el mismo índice.
+"""
+import os
+import re
+import threading
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import shapely
+from shapely.geometry import Point
+from shapely.strtree import STRtree
+
+from metricas import contar, medido
+
+# Radio de la Tierra en km
+RADIO_TIERRA_KM = 6371.0
+
+# Kilómetros por grado de latitud
+KM_POR_GRADO = RADIO_TIERRA_KM * np.pi / 180
+
+# Radio de la primera búsqueda de los k productores más cercanos; se duplica
+# hasta alcanzarlos o hasta cubrir todo el planeta
+RADIO_INICIAL_K_KM = 1.0
+RADIO_MAXIMO_K_KM = np.pi * RADIO_TIERRA_KM
+
+# Más parcelas cambiadas que esto en una recarga del registro vacían el caché de
+# búsquedas en lugar de revisar qué búsquedas afectan
+MAX_CAMBIOS_TRASLADO_CACHE = 10_000
+
+# Diferencia relativa tolerada entre las distancias de Haversine y las medidas
+# sobre la proyección plana de los polígonos, al usar unas como cotas de otras
+MARGEN_PROYECCION = 1.01
+
+# Diferencia relativa tolerada entre la superficie declarada y la del polígono
+TOLERANCIA_SUPERFICIE = 0.25
+
+# Tamaño por defecto (en grados) de las celdas de la grilla de búsqueda por radio
+TAMANO_CELDA_GRADOS = 0.1
+
+# Filas por bloque al repartir la interpretación de los polígonos entre procesos
+TAMANO_BLOQUE_PARALELO = 100_000
+
+# Extremos de los intervalos de vigencia abiertos (sin inscripción o sin baja)
+VIGENCIA_MINIMA = np.iinfo(np.int64).min
+VIGENCIA_MAXIMA = np.iinfo(np.int64).max
+
+COLUMNAS_RESULTADO = [
+    'cuit', 'titular', 'renspa', 'localidad', 'superficie', 'superficie_poligono',
+    'superficie_discrepante', 'distancia',
+    'latitud', 'longitud', 'poligono_formatted', 'dentro_poligono'
+]
+
+
+def calcular_distancias_km(lat, lon, latitudes, longitudes):
+    """
+    Calcula con la fórmula de Haversine la distancia en kilómetros entre el punto
+    (lat, lon) y cada uno de los puntos de los arreglos latitudes/longitudes.
+    """
+    lat_rad = np.radians(lat)
+    latitudes_rad = np.radians(latitudes)
+
+    dlat = latitudes_rad - lat_rad
+    dlon = np.radians(longitudes) - np.radians(lon)
+
+    a = np.sin(dlat / 2)**2 + np.cos(lat_rad) * np.cos(latitudes_rad) * np.sin(dlon / 2)**2
+    # Recortar por errores de redondeo antes de la raíz
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def superficies_discrepantes(declaradas, calculadas, tolerancia=TOLERANCIA_SUPERFICIE):
+    """
+    Marca las parcelas cuya superficie declarada difiere de la calculada a partir
+    del polígono en más de tolerancia (fracción de la mayor). Las que no tienen
+    alguna de las dos no se marcan.
+    """
+    with np.errstate(invalid='ignore'):
+        return np.abs(calculadas - declaradas) > tolerancia * np.maximum(declaradas, calculadas)
+
+
+def cantidad_trabajadores(trabajadores):
+    """Normaliza la cantidad de trabajadores; None o 0 usan todos los núcleos"""
+    if not trabajadores:
+        return os.cpu_count() or 1
+    return max(1, int(trabajadores))
+
+
+def fecha_a_ns(fecha):
+    """Convierte una fecha (date, str, Timestamp) a ns desde 1970; None queda None"""
+    if fecha is None:
+        return None
+    return int(pd.Timestamp(fecha).value)
+
+
+def intervalos_vigencia(datos):
+    """
+    Devuelve (inicio, fin) en ns de la vigencia de cada parcela: desde
+    fecha_inscripcion (o fecha_reinscripcion si falta) hasta fecha_baja. Una
+    reinscripción posterior a la baja vuelve a dejar la parcela vigente. Las
+    fechas faltantes dejan el intervalo abierto en ese extremo.
+    """
+    def columna(nombre):
+        if nombre not in datos.columns or datos[nombre].dtype.kind != 'M':
+            return np.full(len(datos), VIGENCIA_MINIMA, dtype=np.int64)
+        # NaT es el mínimo de int64
+        return datos[nombre].to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+    inscripcion = columna('fecha_inscripcion')
+    reinscripcion = columna('fecha_reinscripcion')
+    baja = columna('fecha_baja')
+
+    inicio = np.where(inscripcion == VIGENCIA_MINIMA, reinscripcion, inscripcion)
+    fin = np.where((baja == VIGENCIA_MINIMA) | (reinscripcion > baja), VIGENCIA_MAXIMA, baja)
+    # Una baja anterior a la inscripción deja el intervalo vacío
+    return inicio, np.maximum(fin, inicio)
+
+
+def formato_a_poligono(poligono_str):
+    """
+    Convierte un polígono (WKT o formato "(lat,lon), (lat,lon)...") en una lista
+    de coordenadas [[lat, lon], ...]. Es la interpretación fila por fila que se
+    usa cuando el texto no admite la interpretación en bloque.
+    """
+    if not poligono_str or not isinstance(poligono_str, str):
+        return None
+
+    try:
+        # Primero verificar si es formato WKT
+        if poligono_str.strip().upper().startswith('POLYGON'):
+            # Extraer las coordenadas del anillo exterior del polígono WKT
+            coords_str = poligono_str.strip()[len('POLYGON'):].strip().lstrip('(').split(')')[0]
+
+            coords = []
+            for par in coords_str.split(','):
+                valores = par.strip().split()
+                if len(valores) >= 2:
+                    # En WKT es lon lat, pero en Folium necesitamos lat lon
+                    lon, lat = float(valores[0]), float(valores[1])
+                    coords.append([lat, lon])
+        else:
+            # Formato alternativo "(lat,lon), (lat,lon)..."
+            coords = []
+            for coord_pair in re.findall(r'\(([^)]+)\)', poligono_str):
+                try:
+                    lat, lon = map(float, coord_pair.split(','))
+                    coords.append([lat, lon])
+                except ValueError:
+                    continue
+
+        return coords if coords else None
+    except Exception:
+        return None
+
+
+class Poligonos:
+    """
+    Polígonos de todas las parcelas en formato columnar.
+
+    coordenadas es un arreglo (M, 2) de pares [lat, lon] y las coordenadas de la
+    parcela i son coordenadas[offsets[i]:offsets[i + 1]]. Las parcelas sin un
+    polígono utilizable (menos de tres vértices) tienen un tramo vacío.
+
+    Por parcela se precalculan el rectángulo envolvente, el centroide y la
+    superficie geodésica en hectáreas (NaN sin polígono).
+    """
+
+    def __init__(self, coordenadas, offsets, envolventes=None, centroides=None, areas_ha=None):
+        self.coordenadas = np.ascontiguousarray(coordenadas, dtype=np.float64).reshape(-1, 2)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+        cantidades = np.diff(self.offsets)
+        self.validos = cantidades >= 3
+
+        if envolventes is not None:
+            self.envolventes = np.asarray(envolventes, dtype=np.float64)
+        else:
+            # Rectángulo envolvente (lon_min, lat_min, lon_max, lat_max) de cada parcela
+            self.envolventes = np.full((len(cantidades), 4), np.nan)
+            validos = np.flatnonzero(self.validos)
+            if len(validos):
+                inicios = self.offsets[validos]
+                minimos = np.minimum.reduceat(self.coordenadas, inicios, axis=0)
+                maximos = np.maximum.reduceat(self.coordenadas, inicios, axis=0)
+                self.envolventes[validos] = np.column_stack(
+                    [minimos[:, 1], minimos[:, 0], maximos[:, 1], maximos[:, 0]]
+                )
+
+        if centroides is None or areas_ha is None:
+            centroides, areas_ha = self._centroides_y_areas()
+        self.centroides = np.asarray(centroides, dtype=np.float64)
+        self.areas_ha = np.asarray(areas_ha, dtype=np.float64)
+
+    def _centroides_y_areas(self):
+        """
+        Centroide [lat, lon] y superficie geodésica (ha) de todas las parcelas a la
+        vez. Cada vértice se une con el siguiente de su anillo (el último con el
+        primero, así que da igual si el anillo viene cerrado) y las sumas por
+        parcela se acumulan con bincount.
+        """
+        cantidades = np.diff(self.offsets)
+        centroides = np.full((len(cantidades), 2), np.nan)
+        areas = np.full(len(cantidades), np.nan)
+        validos = self.validos
+        if not validos.any():
+            return centroides, areas
+
+        # Parcela y vértice siguiente de cada coordenada de los polígonos válidos
+        inicios, vertices = self.offsets[:-1][validos], cantidades[validos]
+        parcela = np.repeat(np.flatnonzero(validos), vertices)
+        coordenadas = self.coordenadas[_indices_tramos(inicios, vertices)]
+        fines = np.cumsum(vertices)
+        siguientes = np.arange(1, len(coordenadas) + 1)
+        siguientes[fines - 1] = fines - vertices
+
+        def sumas(valores):
+            return np.bincount(parcela, valores, minlength=len(cantidades))[validos]
+
+        # Superficie en la esfera (Chamberlain y Duquette): suma de
+        # Δlon · (2 + sen lat1 + sen lat2) por lado, por R² / 2
+        senos = np.sin(np.radians(coordenadas[:, 0]))
+        dlon = np.radians((coordenadas[siguientes, 1] - coordenadas[:, 1] + 180.0) % 360.0 - 180.0)
+        areas[validos] = (
+            np.abs(sumas(dlon * (2 + senos + senos[siguientes]))) * (RADIO_TIERRA_KM * 1000) ** 2 / 2 / 10_000
+        )
+
+        # Centroide plano en grados, relativo al primer vértice para no perder precisión
+        origen = self.coordenadas[inicios]
+        y, x = (coordenadas - np.repeat(origen, vertices, axis=0)).T
+        cruz = x * y[siguientes] - x[siguientes] * y
+        doble_area = sumas(cruz)
+        # Los polígonos degenerados (sin área) usan el promedio de sus vértices
+        degenerados = np.abs(doble_area) < 1e-18
+        divisor = np.where(degenerados, 1.0, 3 * doble_area)
+        centroides[validos, 0] = origen[:, 0] + np.where(
+            degenerados, sumas(y) / vertices, sumas((y + y[siguientes]) * cruz) / divisor
+        )
+        centroides[validos, 1] = origen[:, 1] + np.where(
+            degenerados, sumas(x) / vertices, sumas((x + x[siguientes]) * cruz) / divisor
+        )
+        return centroides, areas
+
+    @classmethod
+    def concatenar(cls, partes):
+        """Une los polígonos de bloques consecutivos de parcelas en un solo buffer"""
+        desplazamientos = np.cumsum([0] + [len(p.coordenadas) for p in partes[:-1]])
+        offsets = np.concatenate(
+            [np.zeros(1, dtype=np.int64)] + [p.offsets[1:] + d for p, d in zip(partes, desplazamientos)]
+        )
+        return cls(
+            np.concatenate([p.coordenadas for p in partes]),
+            offsets,
+            np.concatenate([p.envolventes for p in partes]),
+            np.concatenate([p.centroides for p in partes]),
+            np.concatenate([p.areas_ha for p in partes])
+        )
+
+    def __len__(self):
+        return len(self.validos)
+
+    def tomar(self, posiciones):
+        """Polígonos de las parcelas indicadas, en ese orden, en un buffer nuevo"""
+        posiciones = np.asarray(posiciones, dtype=np.int64)
+        inicios = self.offsets[posiciones]
+        cantidades = self.offsets[posiciones + 1] - inicios
+        return Poligonos(
+            self.coordenadas[_indices_tramos(inicios, cantidades)],
+            np.concatenate([np.zeros(1, dtype=np.int64), np.cumsum(cantidades)]),
+            self.envolventes[posiciones],
+            self.centroides[posiciones],
+            self.areas_ha[posiciones]
+        )
+
+    def zonas(self, posiciones, latitudes, longitudes):
+        """
+        Rectángulos (lon_min, lat_min, lon_max, lat_max) que ocupan las parcelas:
+        el de su polígono o, si no tiene, su punto (latitudes/longitudes alineadas
+        con posiciones)
+        """
+        posiciones = np.asarray(posiciones, dtype=np.int64)
+        puntos = np.column_stack([longitudes, latitudes, longitudes, latitudes])
+        return np.where(self.validos[posiciones, None], self.envolventes[posiciones], puntos)
+
+    def como_lista(self, posicion):
+        """Devuelve el polígono de la parcela como lista Folium [[lat, lon], ...] o None"""
+        if not self.validos[posicion]:
+            return None
+        return self.coordenadas[self.offsets[posicion]:self.offsets[posicion + 1]].tolist()
+
+    def como_listas(self, posiciones):
+        """Devuelve los polígonos de varias parcelas como listas Folium (o None)"""
+        return [self.como_lista(posicion) for posicion in posiciones]
+
+    def geometrias(self, posiciones):
+        """
+        Construye las geometrías Shapely (x=lon, y=lat) de las parcelas indicadas,
+        que deben tener polígono válido, en una sola operación vectorizada.
+        """
+        posiciones = np.asarray(posiciones, dtype=np.int64)
+        if len(posiciones) == 0:
+            return np.empty(0, dtype=object)
+
+        inicios = self.offsets[posiciones]
+        cantidades = self.offsets[posiciones + 1] - inicios
+        anillos = shapely.linearrings(
+            self.coordenadas[_indices_tramos(inicios, cantidades)][:, ::-1],
+            indices=np.repeat(np.arange(len(posiciones)), cantidades)
+        )
+        return shapely.polygons(anillos)
+
+    def distancias_km(self, lat, lon, posiciones):
+        """
+        Distancia en km desde el punto hasta el borde del polígono de cada parcela
+        indicada (deben tener polígono válido); 0 si el punto está dentro.
+
+        Los vértices se proyectan a un plano centrado en el punto (equirectangular
+        con la latitud media de cada vértice y el punto, con error muy por debajo
+        del 1 % hasta cientos de km) y se toma la menor distancia a cada lado del
+        anillo. La contención se resuelve con el número de cruces de un rayo
+        sobre los mismos lados.
+        """
+        posiciones = np.asarray(posiciones, dtype=np.int64)
+        if len(posiciones) == 0:
+            return np.empty(0)
+
+        inicios = self.offsets[posiciones]
+        cantidades = self.offsets[posiciones + 1] - inicios
+        coordenadas = self.coordenadas[_indices_tramos(inicios, cantidades)]
+        y = (coordenadas[:, 0] - lat) * KM_POR_GRADO
+        x = ((coordenadas[:, 1] - lon + 180.0) % 360.0 - 180.0) * KM_POR_GRADO * np.cos(
+            np.radians((coordenadas[:, 0] + lat) / 2)
+        )
+
+        # Vértice siguiente de cada vértice dentro de su anillo
+        fines = np.cumsum(cantidades)
+        primeros = fines - cantidades
+        siguientes = np.arange(1, len(x) + 1)
+        siguientes[fines - 1] = primeros
+        dx, dy = x[siguientes] - x, y[siguientes] - y
+
+        # Punto de cada lado más cercano al origen (el punto consultado)
+        largos = dx * dx + dy * dy
+        t = np.clip(-(x * dx + y * dy) / np.where(largos > 0, largos, 1.0), 0.0, 1.0)
+        distancias = np.minimum.reduceat(np.hypot(x + t * dx, y + t * dy), primeros)
+
+        # Lados que cruzan el semieje x > 0: una cantidad impar deja el punto dentro
+        cruza = (y > 0) != (y[siguientes] > 0)
+        x_cruce = x - y * dx / np.where(dy != 0, dy, 1.0)
+        cruces = np.add.reduceat((cruza & (x_cruce > 0)).astype(np.int64), primeros)
+        return np.where(cruces % 2 == 1, 0.0, distancias)
+
+
+def _indices_tramos(inicios, cantidades):
+    """Índices concatenados de los tramos [inicio, inicio + cantidad) de un buffer"""
+    desplazamiento = np.repeat(inicios - np.cumsum(cantidades) + cantidades, cantidades)
+    return desplazamiento + np.arange(cantidades.sum())
+
+
+def _poligonos_desde_listas(listas):
+    """Arma los buffers columnares a partir de listas [[lat, lon], ...] (o None)"""
+    cantidades = np.array(
+        [len(p) if p is not None and len(p) >= 3 else 0 for p in listas], dtype=np.int64
+    )
+    coordenadas = [c for p, n in zip(listas, cantidades) if n for c in p]
+    offsets = np.concatenate([[0], np.cumsum(cantidades)])
+    return Poligonos(np.asarray(coordenadas, dtype=np.float64).reshape(-1, 2), offsets)
+
+
+@medido('parsear_poligonos')
+def parsear_poligonos(poligonos, trabajadores=1, tamano_bloque=TAMANO_BLOQUE_PARALELO):
+    """
+    Interpreta en bloque una columna de polígonos (formato "(lat,lon), ..." o WKT)
+    y devuelve un objeto Poligonos.
+
+    Con más de un trabajador la columna se divide en bloques de tamano_bloque
+    filas que se interpretan (junto con sus rectángulos envolventes) en un pool
+    de procesos; el resultado es idéntico al de un solo proceso.
+    """
+    trabajadores = cantidad_trabajadores(trabajadores)
+    if trabajadores == 1 or len(poligonos) <= tamano_bloque:
+        return _parsear_bloque(poligonos)
+
+    valores = pd.Series(poligonos, dtype=object).tolist()
+    bloques = [valores[i:i + tamano_bloque] for i in range(0, len(valores), tamano_bloque)]
+    with ProcessPoolExecutor(max_workers=min(trabajadores, len(bloques))) as ejecutor:
+        return Poligonos.concatenar(list(ejecutor.map(_parsear_bloque, bloques)))
+
+
+def _parsear_bloque(poligonos):
+    """
+    Interpreta un bloque de polígonos en el proceso actual.
+
+    Todos los textos se unen en una sola cadena separada por "nan", que NumPy
+    convierte a float64 de una vez; los separadores marcan los límites de cada
+    parcela. Si algún texto tiene un formato inesperado se recurre a la
+    interpretación fila por fila.
+    """
+    serie = pd.Series(poligonos, dtype=object)
+    if len(serie) == 0:
+        return Poligonos(np.empty((0, 2)), np.zeros(1, dtype=np.int64))
+
+    textos = serie.where(serie.map(lambda v: isinstance(v, str)), '').tolist()
+    texto = '\0'.join(textos)
+
+    # En WKT sólo se toma el anillo exterior, cuyas coordenadas vienen como lon lat
+    es_wkt = np.zeros(len(textos), dtype=bool)
+    if 'OLYGON' in texto or 'olygon' in texto:
+        wkt = pd.Series(textos, dtype=object)
+        es_wkt = wkt.str.lstrip().str[:7].str.upper().eq('POLYGON').to_numpy()
+        wkt[es_wkt] = wkt[es_wkt].str.replace(
+            r'^\s*POLYGON\s*\(\(([^)]*)\).*$', r'\1', regex=True, case=False, flags=re.S
+        )
+        texto = '\0'.join(wkt.tolist())
+
+    # Paréntesis de cierre por parcela, contados sobre los bytes del texto unido
+    caracteres = np.frombuffer(texto.encode('ascii', 'replace'), dtype=np.uint8)
+    saltos = np.flatnonzero(caracteres == 0)
+    cierres = np.bincount(
+        np.searchsorted(saltos, np.flatnonzero(caracteres == ord(')'))), minlength=len(textos)
+    )
+
+    texto = texto.translate(str.maketrans('(),', '   ')).replace('\0', ' nan ')
+    try:
+        with warnings.catch_warnings():
+            # NumPy < 2 avisa con DeprecationWarning cuando no puede leer todo el texto
+            warnings.simplefilter('error', DeprecationWarning)
+            valores = np.fromstring(texto, sep=' ')
+    except (ValueError, DeprecationWarning):
+        valores = None
+
+    separadores = None if valores is None else np.flatnonzero(np.isnan(valores))
+    if (separadores is None or len(saltos) != len(textos) - 1
+            or len(separadores) != len(textos) - 1):
+        return _poligonos_desde_listas([formato_a_poligono(p) for p in serie])
+
+    # Cantidad de números por parcela. En el formato "(lat,lon)" cada paréntesis
+    # de cierre debe tener exactamente dos números: si a un par le falta o le
+    # sobra uno, los demás quedarían corridos, así que esas filas se interpretan
+    # fila por fila (que descarta sólo el par mal formado)
+    cantidades = np.diff(np.concatenate([[-1], separadores, [len(valores)]])) - 1
+    irregulares = ~es_wkt & (cantidades != 2 * cierres)
+    pares = cantidades // 2
+    pares[(pares < 3) | irregulares] = 0
+
+    numeros = valores[~np.isnan(valores)]
+    inicio_fila = np.repeat(np.cumsum(cantidades) - cantidades, cantidades)
+    conservar = np.arange(len(numeros)) - inicio_fila < np.repeat(2 * pares, cantidades)
+    coordenadas = numeros[conservar].reshape(-1, 2)
+
+    invertir = np.repeat(es_wkt, pares)
+    coordenadas[invertir] = coordenadas[invertir][:, ::-1]
+
+    poligonos = Poligonos(coordenadas, np.concatenate([[0], np.cumsum(pares)]))
+    if not irregulares.any():
+        return poligonos
+
+    # Las filas irregulares se reemplazan por su interpretación fila por fila
+    filas = np.flatnonzero(irregulares)
+    regulares = np.flatnonzero(~irregulares)
+    partes = Poligonos.concatenar([
+        poligonos.tomar(regulares),
+        _poligonos_desde_listas([formato_a_poligono(serie.iloc[i]) for i in filas])
+    ])
+    orden = np.empty(len(serie), dtype=np.int64)
+    orden[regulares] = np.arange(len(regulares))
+    orden[filas] = len(regulares) + np.arange(len(filas))
+    return partes.tomar(orden)
+
+
+def rectangulo_envolvente_circulo(lat, lon, radio_km):
+    """
+    Calcula el rectángulo envolvente (en grados) del círculo de radio_km alrededor
+    del punto. Devuelve (lat_min, lat_max, intervalos_lon), donde intervalos_lon
+    es una lista de pares (lon_min, lon_max) que ya contempla el antimeridiano.
+    """
+    angulo = radio_km / RADIO_TIERRA_KM
+    dlat = np.degrees(angulo)
+    lat_min, lat_max = lat - dlat, lat + dlat
+
+    # Si el círculo alcanza un polo (o cubre medio planeta) abarca todas las longitudes
+    if angulo >= np.pi / 2 or lat_max >= 90.0 or lat_min <= -90.0:
+        return max(lat_min, -90.0), min(lat_max, 90.0), [(-180.0, 180.0)]
+
+    # Máxima separación en longitud de un casquete esférico
+    dlon = np.degrees(np.arcsin(min(1.0, np.sin(angulo) / np.cos(np.radians(lat)))))
+    lon_min, lon_max = lon - dlon, lon + dlon
+
+    if lon_min < -180.0:
+        intervalos = [(-180.0, lon_max), (lon_min + 360.0, 180.0)]
+    elif lon_max > 180.0:
+        intervalos = [(lon_min, 180.0), (-180.0, lon_max - 360.0)]
+    else:
+        intervalos = [(lon_min, lon_max)]
+
+    return lat_min, lat_max, intervalos
+
+
+class IndiceGrilla:
+    """
+    Grilla regular de latitud/longitud sobre las coordenadas de las parcelas.
+
+    Cada parcela cae en una celda de tamano_celda_grados de lado. Las posiciones
+    se guardan ordenadas por número de celda (fila * columnas + columna), así que
+    las celdas de una misma fila de la grilla quedan contiguas y un rectángulo se
+    resuelve con una búsqueda binaria por fila.
+    """
+
+    def __init__(self, latitudes, longitudes, tamano_celda_grados=TAMANO_CELDA_GRADOS):
+        if tamano_celda_grados <= 0:
+            raise ValueError("El tamaño de celda debe ser positivo")
+
+        self.tamano_celda = float(tamano_celda_grados)
+
+        validas = np.flatnonzero(np.isfinite(latitudes) & np.isfinite(longitudes))
+        lats = latitudes[validas]
+        lons = longitudes[validas]
+
+        if len(validas):
+            self.lat_origen = float(lats.min())
+            self.lon_origen = float(lons.min())
+            self.filas = int((lats.max() - self.lat_origen) // self.tamano_celda) + 1
+            self.columnas = int((lons.max() - self.lon_origen) // self.tamano_celda) + 1
+        else:
+            self.lat_origen = self.lon_origen = 0.0
+            self.filas = self.columnas = 0
+
+        celdas = self._fila(lats) * self.columnas + self._columna(lons)
+        orden = np.argsort(celdas, kind='stable')
+        self.celdas = celdas[orden]
+        self.posiciones = validas[orden]
+
+    @classmethod
+    def desde_arreglos(cls, tamano_celda, lat_origen, lon_origen, filas, columnas, celdas, posiciones):
+        """Reconstruye una grilla ya calculada (por ejemplo, leída del artefacto preprocesado)"""
+        grilla = cls.__new__(cls)
+        grilla.tamano_celda = float(tamano_celda)
+        grilla.lat_origen = float(lat_origen)
+        grilla.lon_origen = float(lon_origen)
+        grilla.filas = int(filas)
+        grilla.columnas = int(columnas)
+        grilla.celdas = celdas
+        grilla.posiciones = posiciones
+        return grilla
+
+    def __len__(self):
+        return len(self.posiciones)
+
+    def _fila(self, lats):
+        return ((lats - self.lat_origen) // self.tamano_celda).astype(np.int64)
+
+    def _columna(self, lons):
+        return ((lons - self.lon_origen) // self.tamano_celda).astype(np.int64)
+
+    def candidatos_rectangulo(self, lat_min, lat_max, lon_min, lon_max):
+        """Devuelve las posiciones de las parcelas en las celdas que tocan el rectángulo"""
+        if len(self.posiciones) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        fila_min = max(int(self._fila(np.float64(lat_min))), 0)
+        fila_max = min(int(self._fila(np.float64(lat_max))), self.filas - 1)
+        columna_min = max(int(self._columna(np.float64(lon_min))), 0)
+        columna_max = min(int(self._columna(np.float64(lon_max))), self.columnas - 1)
+
+        if fila_min > fila_max or columna_min > columna_max:
+            return np.empty(0, dtype=np.int64)
+
+        # Un tramo contiguo del arreglo ordenado por cada fila de la grilla
+        filas = np.arange(fila_min, fila_max + 1, dtype=np.int64)
+        inicios = np.searchsorted(self.celdas, filas * self.columnas + columna_min, side='left')
+        fines = np.searchsorted(self.celdas, filas * self.columnas + columna_max, side='right')
+
+        return np.concatenate([self.posiciones[i:f] for i, f in zip(inicios, fines)])
+
+    def candidatos(self, lat, lon, radio_km):
+        """Devuelve las posiciones de las parcelas en las celdas que tocan el círculo"""
+        lat_min, lat_max, intervalos = rectangulo_envolvente_circulo(lat, lon, radio_km)
+
+        partes = [
+            self.candidatos_rectangulo(lat_min, lat_max, lon_min, lon_max)
+            for lon_min, lon_max in intervalos
+        ]
+        return partes[0] if len(partes) == 1 else np.concatenate(partes)
+
+
+class IndiceEspacial:
+    """
+    Índice STRtree sobre los rectángulos envolventes de los polígonos de las parcelas.
+
+    Las posiciones devueltas por las consultas son posiciones de fila (iloc) del
+    DataFrame a partir del cual se construyó el índice. También guarda los
+    polígonos columnares, las coordenadas y los códigos de CUIT (con el índice
+    CUIT -> parcelas) como arreglos contiguos, y la grilla que preselecciona los
+    candidatos de las búsquedas por radio, y la superficie declarada de cada
+    parcela junto con la marca de las que no coinciden con su polígono.
+
+    Los polígonos y la grilla pueden recibirse ya calculados (artefacto
+    preprocesado); si no, se interpretan de la columna 'poligono' de datos,
+    repartidos entre trabajadores procesos.
+    """
+
+    @medido('indexar')
+    def __init__(self, datos, tamano_celda_grados=TAMANO_CELDA_GRADOS, poligonos=None, grilla=None,
+                 trabajadores=1):
+        self.latitudes = np.ascontiguousarray(datos['latitud'].to_numpy(dtype=np.float64))
+        self.longitudes = np.ascontiguousarray(datos['longitud'].to_numpy(dtype=np.float64))
+        # Códigos enteros de CUIT para agrupar y comparar sin tocar los strings
+        cuits = pd.Categorical(datos['cuit'])
+        self.categorias_cuit = cuits.categories
+        self.codigos_cuit = np.asarray(cuits.codes, dtype=np.int64)
+
+        # Índice CUIT -> parcelas: posiciones agrupadas por código y el inicio
+        # de cada grupo (los CUIT nulos, código -1, quedan fuera)
+        self.parcelas_por_cuit = np.argsort(self.codigos_cuit, kind='stable')
+        self.inicios_cuit = np.searchsorted(
+            self.codigos_cuit[self.parcelas_por_cuit], np.arange(len(self.categorias_cuit) + 1)
+        )
+
+        # Vigencia de cada parcela y, ordenados, sus inicios y fines para
+        # contar las parcelas vigentes a una fecha con dos búsquedas binarias
+        self.inicio_vigencia, self.fin_vigencia = intervalos_vigencia(datos)
+        self.inicios_ordenados = np.sort(self.inicio_vigencia)
+        self.fines_ordenados = np.sort(self.fin_vigencia)
+
+        if grilla is None or grilla.tamano_celda != tamano_celda_grados:
+            grilla = IndiceGrilla(self.latitudes, self.longitudes, tamano_celda_grados)
+        self.grilla = grilla
+
+        if poligonos is None:
+            if 'poligono' in datos.columns:
+                poligonos = parsear_poligonos(datos['poligono'], trabajadores)
+            else:
+                poligonos = _poligonos_desde_listas([None] * len(datos))
+        self.poligonos = poligonos
+
+        if 'superficie' in datos.columns:
+            self.superficies_declaradas = pd.to_numeric(
+                pd.Series(np.asarray(datos['superficie'])), errors='coerce'
+            ).to_numpy(dtype=np.float64)
+        else:
+            self.superficies_declaradas = np.full(len(datos), np.nan)
+        self.superficie_discrepante = superficies_discrepantes(
+            self.superficies_declaradas, self.poligonos.areas_ha
+        )
+
+        self.filas = np.flatnonzero(self.poligonos.validos)
+        self.arbol = STRtree(shapely.box(*self.poligonos.envolventes[self.filas].T))
+
+    def __len__(self):
+        return len(self.filas)
+
+    def arreglos(self):
+        """Arreglos NumPy que componen el índice, por nombre"""
+        return {
+            'latitudes': self.latitudes,
+            'longitudes': self.longitudes,
+            'codigos_cuit': self.codigos_cuit,
+            'parcelas_por_cuit': self.parcelas_por_cuit,
+            'inicios_cuit': self.inicios_cuit,
+            'inicio_vigencia': self.inicio_vigencia,
+            'fin_vigencia': self.fin_vigencia,
+            'inicios_ordenados': self.inicios_ordenados,
+            'fines_ordenados': self.fines_ordenados,
+            'filas_poligonos': self.filas,
+            'coordenadas': self.poligonos.coordenadas,
+            'offsets': self.poligonos.offsets,
+            'envolventes': self.poligonos.envolventes,
+            'centroides': self.poligonos.centroides,
+            'areas_ha': self.poligonos.areas_ha,
+            'poligonos_validos': self.poligonos.validos,
+            'superficies_declaradas': self.superficies_declaradas,
+            'superficie_discrepante': self.superficie_discrepante,
+            'grilla_celdas': self.grilla.celdas,
+            'grilla_posiciones': self.grilla.posiciones,
+        }
+
+    def congelar(self):
+        """
+        Marca todos los arreglos como de solo lectura. El índice se comparte entre
+        todas las sesiones, así que cualquier escritura accidental debe fallar.
+        """
+        for arreglo in self.arreglos().values():
+            arreglo.flags.writeable = False
+        return self
+
+    def memoria_bytes(self):
+        """Bytes ocupados por los arreglos del índice"""
+        return sum(arreglo.nbytes for arreglo in self.arreglos().values())
+
+    def vigentes(self, posiciones, fecha):
+        """Filtra las posiciones de las parcelas vigentes a la fecha (None = todas)"""
+        fecha_ns = fecha_a_ns(fecha)
+        if fecha_ns is None:
+            return posiciones
+        vigente = (self.inicio_vigencia[posiciones] <= fecha_ns) & (self.fin_vigencia[posiciones] > fecha_ns)
+        return posiciones[vigente]
+
+    def cantidad_vigentes(self, fecha):
+        """Cantidad de parcelas vigentes a la fecha, sin recorrer la tabla"""
+        fecha_ns = fecha_a_ns(fecha)
+        if fecha_ns is None:
+            return len(self.inicio_vigencia)
+        # Todo intervalo empieza antes de terminar: vigentes = iniciadas - terminadas
+        iniciadas = np.searchsorted(self.inicios_ordenados, fecha_ns, side='right')
+        terminadas = np.searchsorted(self.fines_ordenados, fecha_ns, side='right')
+        return int(iniciadas - terminadas)
+
+    def codigo_cuit(self, cuit):
+        """Código entero del CUIT, o -1 si no está en el registro"""
+        return int(self.categorias_cuit.get_indexer([cuit])[0])
+
+    def parcelas_de_cuit(self, cuit):
+        """Posiciones (ordenadas) de todas las parcelas de un CUIT"""
+        codigo = self.codigo_cuit(cuit)
+        if codigo < 0:
+            return np.empty(0, dtype=np.int64)
+        return self.parcelas_por_cuit[self.inicios_cuit[codigo]:self.inicios_cuit[codigo + 1]]
+
+    @medido('contencion_lote')
+    def parcelas_que_contienen_lote(self, lats, lons, trabajadores=1, tamano_bloque=None, fecha=None):
+        """
+        Versión en bloque de parcelas_que_contienen para muchos puntos a la vez.
+        Devuelve dos arreglos alineados (índice del punto, posición de la parcela)
+        ordenados por punto y parcela.
+
+        Con más de un trabajador los puntos se dividen en bloques (por defecto uno
+        por trabajador) que se resuelven en un pool de hilos sobre el mismo índice.
+        Con fecha sólo se consideran las parcelas vigentes a esa fecha.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        if len(self.filas) == 0 or len(lats) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        trabajadores = cantidad_trabajadores(trabajadores)
+        tamano_bloque = tamano_bloque or -(-len(lats) // trabajadores)
+        if trabajadores == 1 or len(lats) <= tamano_bloque:
+            return self._contener_bloque(lats, lons, fecha)
+
+        inicios = range(0, len(lats), tamano_bloque)
+        with ThreadPoolExecutor(max_workers=min(trabajadores, len(inicios))) as ejecutor:
+            partes = list(ejecutor.map(
+                lambda i: self._contener_bloque(
+                    lats[i:i + tamano_bloque], lons[i:i + tamano_bloque], fecha
+                ),
+                inicios
+            ))
+        # Los bloques ya están ordenados y son consecutivos
+        return (
+            np.concatenate([puntos + i for (puntos, _), i in zip(partes, inicios)]),
+            np.concatenate([candidatos for _, candidatos in partes])
+        )
+
+    def _contener_bloque(self, lats, lons, fecha=None):
+        """Contención en bloque de un conjunto de puntos, en el hilo actual"""
+        # Pares (punto, parcela) cuyos rectángulos se tocan, en una sola consulta
+        puntos, arbol = self.arbol.query(shapely.points(lons, lats))
+        candidatos = self.filas[arbol]
+
+        # Las parcelas no vigentes se descartan antes de armar geometrías
+        fecha_ns = fecha_a_ns(fecha)
+        if fecha_ns is not None:
+            vigente = (self.inicio_vigencia[candidatos] <= fecha_ns) & (self.fin_vigencia[candidatos] > fecha_ns)
+            puntos, candidatos = puntos[vigente], candidatos[vigente]
+
+        # Cada geometría candidata se arma una sola vez aunque la pidan varios puntos
+        unicos, inversa = np.unique(candidatos, return_inverse=True)
+        geometrias = self.poligonos.geometrias(unicos)[inversa]
+        dentro = shapely.contains_xy(geometrias, lons[puntos], lats[puntos])
+
+        puntos, candidatos = puntos[dentro], candidatos[dentro]
+        orden = np.lexsort((candidatos, puntos))
+        return puntos[orden].astype(np.int64), candidatos[orden]
+
+    def parcelas_que_contienen(self, lat, lon, fecha=None):
+        """
+        Devuelve las posiciones (ordenadas) de todas las parcelas que contienen el
+        punto; con fecha, sólo las vigentes a esa fecha
+        """
+        if len(self.filas) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        # Candidatos por rectángulo envolvente; la geometría sólo se arma para ellos
+        candidatos = self.vigentes(self.filas[self.arbol.query(Point(lon, lat))], fecha)
+        geometrias = self.poligonos.geometrias(candidatos)
+        dentro = shapely.contains_xy(geometrias, lon, lat)
+        return np.sort(candidatos[dentro])
+
+    def cercanas_al_borde(self, lat, lon, radio_km, fecha=None, por_cuit=False):
+        """
+        Devuelve (posiciones, distancias) de las parcelas a no más de radio_km del
+        punto, midiendo hasta el borde de su polígono (0 si lo contiene) o, para
+        las que no tienen polígono, hasta su punto. Con fecha, sólo las vigentes.
+
+        Las parcelas con polígono salen del STRtree con el rectángulo envolvente
+        del círculo; antes de medir hasta sus lados se descartan las que tienen el
+        rectángulo envolvente más lejos que el radio. Con por_cuit sólo interesa
+        la parcela más cercana de cada CUIT, así que también se descartan las que
+        tienen el rectángulo más lejos que algún vértice de otra parcela del
+        mismo CUIT.
+        """
+        lat_min, lat_max, intervalos = rectangulo_envolvente_circulo(lat, lon, radio_km)
+        cajas = shapely.box(
+            [i[0] for i in intervalos], lat_min, [i[1] for i in intervalos], lat_max
+        )
+        _, arbol = self.arbol.query(cajas)
+        con_poligono = self.vigentes(np.unique(self.filas[arbol]), fecha)
+
+        # Cota inferior de la distancia: el punto del rectángulo envolvente más
+        # cercano, con margen por la diferencia entre Haversine y la proyección plana
+        envolventes = self.poligonos.envolventes[con_poligono]
+        cotas = calcular_distancias_km(
+            lat, lon,
+            np.clip(lat, envolventes[:, 1], envolventes[:, 3]),
+            np.clip(lon, envolventes[:, 0], envolventes[:, 2])
+        ) / MARGEN_PROYECCION
+        cerca = cotas <= radio_km
+        con_poligono, cotas = con_poligono[cerca], cotas[cerca]
+
+        sin_poligono = self.grilla.candidatos(lat, lon, radio_km)
+        sin_poligono = self.vigentes(sin_poligono[~self.poligonos.validos[sin_poligono]], fecha)
+        distancias_punto = calcular_distancias_km(
+            lat, lon, self.latitudes[sin_poligono], self.longitudes[sin_poligono]
+        )
+
+        if por_cuit:
+            # Cota superior: la distancia al primer vértice del polígono
+            vertices = self.poligonos.coordenadas[self.poligonos.offsets[con_poligono]]
+            superiores = calcular_distancias_km(lat, lon, vertices[:, 0], vertices[:, 1]) * MARGEN_PROYECCION
+            # Menor cota superior por CUIT (el último lugar es el de los CUIT nulos, código -1)
+            minimas = np.full(len(self.categorias_cuit) + 1, np.inf)
+            np.minimum.at(minimas, self.codigos_cuit[con_poligono], superiores)
+            np.minimum.at(minimas, self.codigos_cuit[sin_poligono], distancias_punto)
+            con_poligono = con_poligono[cotas <= minimas[self.codigos_cuit[con_poligono]]]
+
+        posiciones = np.concatenate([con_poligono, sin_poligono])
+        distancias = np.concatenate([self.poligonos.distancias_km(lat, lon, con_poligono), distancias_punto])
+        en_radio = distancias <= radio_km
+        return posiciones[en_radio], distancias[en_radio]
+
+    def parcelas_en_area(self, area, fecha=None):
+        """
+        Devuelve (posiciones, contenidas) de las parcelas cuyo polígono interseca
+        el área (geometría Shapely en lon/lat), ordenadas por posición; contenidas
+        indica las que quedan enteras dentro del área. Con fecha, sólo las
+        vigentes a esa fecha.
+
+        Las parcelas cuyo rectángulo envolvente ya está dentro del área se
+        resuelven sin armar su polígono; sólo las del borde se prueban contra el
+        área preparada.
+        """
+        if len(self.filas) == 0 or area is None or area.is_empty:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=bool)
+
+        shapely.prepare(area)
+
+        interiores = self.vigentes(self.filas[self.arbol.query(area, predicate='contains')], fecha)
+        tocadas = self.vigentes(self.filas[self.arbol.query(area, predicate='intersects')], fecha)
+        borde = np.setdiff1d(tocadas, interiores, assume_unique=True)
+
+        geometrias = self.poligonos.geometrias(borde)
+        intersecan = shapely.intersects(area, geometrias)
+        contenidas = shapely.contains(area, geometrias[intersecan])
+        borde = borde[intersecan]
+
+        posiciones = np.concatenate([interiores, borde])
+        orden = np.argsort(posiciones, kind='stable')
+        return (
+            posiciones[orden],
+            np.concatenate([np.ones(len(interiores), dtype=bool), contenidas])[orden]
+        )
+
+
+def leer_csv(ruta_archivo):
+    """
+    Lee el CSV de productores, verifica las columnas necesarias, descarta las
+    filas sin coordenadas y compacta la tabla. Lanza ValueError si faltan columnas.
+    """
+    return compactar_productores(validar_productores(pd.read_csv(ruta_archivo), ruta_archivo))
+
+
+def validar_productores(df, origen):
+    """
+    Verifica las columnas necesarias de una tabla (o bloque) de productores,
+    convierte las coordenadas a números y descarta las filas sin coordenadas.
+    Lanza ValueError si faltan columnas.
+    """
+    # Verificar las columnas necesarias
+    columnas_requeridas = ['cuit', 'titular', 'latitud', 'longitud']
+    columnas_faltantes = [col for col in columnas_requeridas if col not in df.columns]
+    if columnas_faltantes:
+        raise ValueError(f"Faltan columnas en {origen}: {', '.join(columnas_faltantes)}")
+
+    # Asegurarse de que las coordenadas sean numéricas
+    df['latitud'] = pd.to_numeric(df['latitud'], errors='coerce')
+    df['longitud'] = pd.to_numeric(df['longitud'], errors='coerce')
+
+    # Eliminar filas con coordenadas nulas
+    return df.dropna(subset=['latitud', 'longitud']).reset_index(drop=True)
+
+
+def columnas_fecha(columnas):
+    """Columnas que se interpretan como fechas: las que empiezan con 'fecha'"""
+    return [c for c in columnas if str(c).lower().startswith('fecha')]
+
+
+def compactar_productores(df):
+    """
+    Convierte la tabla de productores a su representación compacta: fechas como
+    datetime64[ns] (en UTC, sin zona horaria) y las demás columnas de texto,
+    salvo los polígonos, como categorías.
+    """
+    fechas = columnas_fecha(df.columns)
+    convertidas = {}
+    for columna in df.columns:
+        if columna in fechas:
+            if df[columna].dtype.kind != 'M':
+                fecha = pd.to_datetime(df[columna], errors='coerce', utc=True).dt.tz_localize(None)
+                # Las fechas fuera del rango de datetime64[ns] (años mal cargados) quedan nulas
+                fecha = fecha.where(fecha.between(pd.Timestamp.min, pd.Timestamp.max))
+                convertidas[columna] = fecha.astype('datetime64[ns]')
+        elif columna != 'poligono' and df[columna].dtype.kind not in 'biufcM':
+            convertidas[columna] = df[columna].astype('category')
+    return df.assign(**convertidas)
+
+
+def reporte_memoria(datos):
+    """
+    Compara, columna por columna, la memoria de la tabla compacta con la que
+    ocuparía con el texto como objetos Python (las fechas como texto ISO).
+    """
+    filas = []
+    for columna in datos.columns:
+        serie = datos[columna]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            tipo = 'categoría'
+            como_objetos = serie.astype(object)
+        elif serie.dtype.kind == 'M':
+            tipo = 'fecha'
+            como_objetos = serie.dt.strftime('%Y-%m-%dT%H:%M:%SZ').astype(object)
+        else:
+            tipo = str(serie.dtype)
+            como_objetos = serie
+        filas.append({
+            'columna': columna,
+            'tipo': tipo,
+            'objetos_bytes': int(como_objetos.memory_usage(index=False, deep=True)),
+            'compacta_bytes': int(serie.memory_usage(index=False, deep=True)),
+        })
+    return pd.DataFrame(filas, columns=['columna', 'tipo', 'objetos_bytes', 'compacta_bytes'])
+
+
+@medido('armar_resultados')
+def armar_resultados(datos, indice, posiciones, distancias, dentro_poligono):
+    """
+    Arma el DataFrame de resultados que consume la interfaz a partir de las
+    posiciones de fila y sus distancias (una fila por parcela). Las listas de
+    coordenadas para Folium se generan sólo para estas parcelas.
+    """
+    filas = datos.iloc[posiciones]
+
+    # Todas las columnas en un solo constructor: insertarlas de a una copia los bloques cada vez
+    columnas = {'cuit': filas['cuit'].to_numpy()}
+    for columna in ['titular', 'renspa', 'localidad', 'superficie']:
+        if columna in filas.columns:
+            columnas[columna] = filas[columna].to_numpy()
+        else:
+            columnas[columna] = np.full(len(filas), 'No disponible', dtype=object)
+    columnas['superficie_poligono'] = np.round(indice.poligonos.areas_ha[posiciones], 1)
+    columnas['superficie_discrepante'] = indice.superficie_discrepante[posiciones]
+    columnas['distancia'] = np.round(np.asarray(distancias, dtype=np.float64), 2)
+    columnas['latitud'] = filas['latitud'].to_numpy()
+    columnas['longitud'] = filas['longitud'].to_numpy()
+    columnas['poligono_formatted'] = pd.Series(indice.poligonos.como_listas(posiciones), dtype=object)
+    columnas['dentro_poligono'] = np.full(len(filas), dentro_poligono, dtype=bool)
+
+    return pd.DataFrame(columnas, columns=COLUMNAS_RESULTADO)
+
+
+@medido('encontrar_productor_contenedor')
+def encontrar_productor_contenedor(lat, lon, datos, indice, fecha=None):
+    """
+    Encuentra todas las parcelas cuyo polígono contiene el punto dado (con
+    fecha, sólo entre las vigentes a esa fecha).
+
+    Como las parcelas pueden superponerse, devuelve un DataFrame (posiblemente
+    vacío) con una fila por parcela contenedora.
+    """
+    posiciones = indice.parcelas_que_contienen(lat, lon, fecha)
+    # Distancia 0 porque el punto está dentro del polígono
+    return armar_resultados(datos, indice, posiciones, np.zeros(len(posiciones)), True)
+
+
+@medido('encontrar_parcelas_en_area')
+def encontrar_parcelas_en_area(area, datos, indice, fecha=None):
+    """
+    Encuentra todas las parcelas que intersecan o están dentro de un área (una
+    geometría Shapely o un dict GeoJSON, en lon/lat). Devuelve un DataFrame con
+    las parcelas ordenadas por distancia al centro del área, con la columna
+    'en_area' que indica si la parcela queda entera dentro del área.
+    """
+    if isinstance(area, dict):
+        area = shapely.geometry.shape(area)
+    posiciones, contenidas = indice.parcelas_en_area(area, fecha)
+
+    centro = area.centroid
+    distancias = calcular_distancias_km(
+        centro.y, centro.x, indice.latitudes[posiciones], indice.longitudes[posiciones]
+    )
+    orden = np.argsort(distancias, kind='stable')
+    resultados = armar_resultados(datos, indice, posiciones[orden], distancias[orden], False)
+    resultados['en_area'] = contenidas[orden]
+    return resultados
+
+
+def superficie_por_productor(resultados):
+    """
+    Resume un DataFrame de resultados por productor: cantidad de parcelas y
+    superficie total declarada (ha), de mayor a menor superficie.
+    """
+    if resultados.empty:
+        return pd.DataFrame(columns=['cuit', 'titular', 'parcelas', 'superficie'])
+    resumen = resultados.assign(
+        cuit=resultados['cuit'].astype(object),
+        superficie=pd.to_numeric(resultados['superficie'], errors='coerce')
+    ).groupby('cuit', sort=False).agg(
+        titular=('titular', 'first'),
+        parcelas=('cuit', 'size'),
+        superficie=('superficie', 'sum')
+    )
+    return resumen.sort_values('superficie', ascending=False).reset_index()
+
+
+class Busqueda:
+    """
+    Resultado compacto de una búsqueda por radio: posiciones de fila de las
+    parcelas que contienen el punto y, ordenadas por distancia exacta, las de la
+    parcela más cercana de cada otro CUIT dentro del radio. Con hasta_borde las
+    distancias se miden hasta el borde de los polígonos. productores_contenedores
+    es la cantidad de CUIT distintos entre las parcelas contenedoras.
+    """
+
+    def __init__(self, lat, lon, radio_km, contenedores, posiciones, distancias, fecha=None,
+                 hasta_borde=False, productores_contenedores=0):
+        self.lat = lat
+        self.lon = lon
+        self.radio_km = radio_km
+        self.fecha = fecha
+        self.hasta_borde = hasta_borde
+        self.contenedores = contenedores
+        self.productores_contenedores = productores_contenedores
+        self.posiciones = posiciones
+        self.distancias = distancias
+
+    def trasladar(self, posiciones_nuevas):
+        """
+        La misma búsqueda sobre otra versión del registro, dada la posición nueva
+        de cada parcela de la versión anterior
+        """
+        return Busqueda(
+            self.lat, self.lon, self.radio_km, posiciones_nuevas[self.contenedores],
+            posiciones_nuevas[self.posiciones], self.distancias, self.fecha, self.hasta_borde,
+            self.productores_contenedores
+        )
+
+    def cantidad_productores(self):
+        """CUIT distintos del resultado: los que contienen el punto y los cercanos"""
+        return self.productores_contenedores + len(self.posiciones)
+
+    def primeros(self, k):
+        """
+        Devuelve la búsqueda con sólo los k productores más cercanos: los que
+        contienen el punto (todos, aunque sean más de k) y los cercanos más
+        próximos hasta completar k. El radio queda en la distancia del último.
+        """
+        cantidad = max(0, k - self.productores_contenedores)
+        radio_km = float(self.distancias[cantidad - 1]) if 0 < cantidad <= len(self.distancias) else 0.0
+        return Busqueda(
+            self.lat, self.lon, radio_km, self.contenedores, self.posiciones[:cantidad],
+            self.distancias[:cantidad], self.fecha, self.hasta_borde, self.productores_contenedores
+        )
+
+    def recortar(self, radio_km):
+        """
+        Devuelve la búsqueda para un radio menor o igual sin recalcular nada: la
+        parcela más cercana de cada CUIT sigue siéndolo dentro del radio menor.
+        """
+        if radio_km > self.radio_km:
+            raise ValueError("Sólo se puede recortar a un radio menor o igual")
+        fin = np.searchsorted(self.distancias, radio_km, side='right')
+        return Busqueda(
+            self.lat, self.lon, radio_km, self.contenedores,
+            self.posiciones[:fin], self.distancias[:fin], self.fecha, self.hasta_borde,
+            self.productores_contenedores
+        )
+
+
+@medido('buscar_cercanos')
+def buscar_cercanos(lat, lon, indice, radio_km=10, contenedores=None, fecha=None, hasta_borde=False):
+    """
+    Ejecuta la búsqueda por radio y devuelve el resultado compacto (Busqueda).
+    Las parcelas contenedoras pueden venir ya calculadas (búsquedas en lote).
+    Con fecha sólo se consideran las parcelas vigentes a esa fecha. Con
+    hasta_borde la distancia a cada parcela se mide hasta el borde de su
+    polígono en lugar de hasta su punto.
+    """
+    if contenedores is None:
+        contenedores = indice.parcelas_que_contienen(lat, lon, fecha)
+
+    if hasta_borde:
+        candidatos, distancias = indice.cercanas_al_borde(lat, lon, radio_km, fecha, por_cuit=True)
+    else:
+        # Sólo las parcelas vigentes de las celdas que tocan el círculo son candidatas
+        candidatos = indice.vigentes(indice.grilla.candidatos(lat, lon, radio_km), fecha)
+        distancias = calcular_distancias_km(
+            lat, lon, indice.latitudes[candidatos], indice.longitudes[candidatos]
+        )
+    en_radio = distancias <= radio_km
+
+    # Los CUIT que ya contienen el punto no se repiten como cercanos
+    if len(contenedores):
+        en_radio &= ~np.isin(indice.codigos_cuit[candidatos], indice.codigos_cuit[contenedores])
+
+    orden = np.argsort(distancias[en_radio], kind='stable')
+    posiciones = candidatos[en_radio][orden]
+    distancias = distancias[en_radio][orden]
+
+    # Agrupar por CUIT quedándose con la parcela más cercana de cada uno
+    _, primeras = np.unique(indice.codigos_cuit[posiciones], return_index=True)
+    primeras.sort()
+
+    return Busqueda(
+        lat, lon, radio_km, contenedores, posiciones[primeras], distancias[primeras], fecha, hasta_borde,
+        len(np.unique(indice.codigos_cuit[contenedores]))
+    )
+
+
+@medido('buscar_k_cercanos')
+def buscar_k_cercanos(lat, lon, indice, k, contenedores=None, fecha=None, hasta_borde=False):
+    """
+    Búsqueda por radio con el menor radio que alcanza k productores distintos
+    (contando los que contienen el punto). El radio empieza en
+    RADIO_INICIAL_K_KM y se duplica hasta alcanzarlos, así que el costo depende
+    de k y de la densidad alrededor del punto, no del tamaño del registro.
+
+    Devuelve la Busqueda completa de ese radio, que puede tener más de k
+    productores si hay empates en la distancia del último: primeros(k) la
+    recorta. Si el registro tiene menos de k productores, los devuelve todos.
+    """
+    if contenedores is None:
+        contenedores = indice.parcelas_que_contienen(lat, lon, fecha)
+
+    radio_km = RADIO_INICIAL_K_KM
+    while True:
+        busqueda = buscar_cercanos(lat, lon, indice, radio_km, contenedores, fecha, hasta_borde)
+        if busqueda.cantidad_productores() >= k or radio_km >= RADIO_MAXIMO_K_KM:
+            break
+        radio_km = min(2 * radio_km, RADIO_MAXIMO_K_KM)
+
+    # Los cercanos están ordenados: basta recortar al radio del k-ésimo
+    faltan = k - busqueda.productores_contenedores
+    if 0 < faltan <= len(busqueda.distancias):
+        busqueda = busqueda.recortar(float(busqueda.distancias[faltan - 1]))
+    return busqueda
+
+
+def resultados_de_busqueda(datos, indice, busqueda):
+    """Arma el DataFrame de resultados ordenado por distancia a partir de una Busqueda"""
+    contenedores = armar_resultados(
+        datos, indice, busqueda.contenedores, np.zeros(len(busqueda.contenedores)), True
+    )
+    cercanos = armar_resultados(datos, indice, busqueda.posiciones, busqueda.distancias, False)
+
+    if contenedores.empty:
+        return cercanos
+    if cercanos.empty:
+        return contenedores
+    return pd.concat([contenedores, cercanos], ignore_index=True)
+
+
+@medido('encontrar_productores_cercanos')
+def encontrar_productores_cercanos(lat, lon, datos, indice, radio_km=10, fecha=None, hasta_borde=False):
+    """
+    Encuentra productores cercanos a un punto dado dentro de un radio específico.
+
+    Devuelve un DataFrame ordenado por distancia con las parcelas que contienen
+    el punto y, para cada otro CUIT, su parcela más cercana dentro del radio.
+    Con fecha sólo se consideran las parcelas vigentes a esa fecha y con
+    hasta_borde las distancias se miden hasta el borde de los polígonos.
+    """
+    return resultados_de_busqueda(
+        datos, indice, buscar_cercanos(lat, lon, indice, radio_km, fecha=fecha, hasta_borde=hasta_borde)
+    )
+
+
+@medido('encontrar_k_productores_cercanos')
+def encontrar_k_productores_cercanos(lat, lon, datos, indice, k=20, fecha=None, hasta_borde=False):
+    """
+    Encuentra los k productores más cercanos a un punto, sin radio fijo.
+
+    Devuelve un DataFrame ordenado por distancia con las parcelas que contienen
+    el punto y la parcela más cercana de cada otro CUIT hasta completar k.
+    """
+    busqueda = buscar_k_cercanos(lat, lon, indice, k, fecha=fecha, hasta_borde=hasta_borde)
+    return resultados_de_busqueda(datos, indice, busqueda.primeros(k))
+
+
+class CacheBusquedas:
+    """
+    Caché LRU de búsquedas por radio, compartido entre sesiones.
+
+    La clave es el punto redondeado a decimales_punto decimales (1e-5 grados
+    ~ 1 m), la fecha de vigencia, la forma de medir las distancias y el radio.
+    Si no está la búsqueda exacta pero sí una del mismo punto con un radio
+    mayor, se responde recortando esa. Guarda sólo posiciones y distancias, no
+    DataFrames, así que cada entrada ocupa poco (los recortes son vistas).
+
+    Con radio_ranking, la primera búsqueda de un punto calcula una sola vez el
+    ranking por distancia hasta ese radio (por ejemplo, el máximo del control
+    deslizante) y cualquier cambio de radio posterior es una búsqueda binaria
+    sobre él, sin calcular distancias ni volver a probar contención.
+
+    Las búsquedas de los k más cercanos (buscar_k) se responden con cualquier
+    búsqueda guardada del punto que ya tenga k productores y se guardan como la
+    búsqueda por radio equivalente, así que también sirven a las otras.
+    """
+
+    def __init__(self, max_entradas=256, decimales_punto=5):
+        self.max_entradas = max_entradas
+        self.decimales_punto = decimales_punto
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.recortes = 0
+        self.fallos = 0
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def _guardar(self, clave, busqueda):
+        self._entradas[clave] = busqueda
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+
+    def _punto(self, lat, lon, fecha, hasta_borde):
+        # El punto de la clave incluye la fecha y la forma de medir: sólo se
+        # recortan búsquedas de la misma fecha medidas de la misma forma
+        return (
+            round(lat, self.decimales_punto), round(lon, self.decimales_punto), fecha_a_ns(fecha),
+            bool(hasta_borde)
+        )
+
+    def buscar(self, lat, lon, indice, radio_km=10, radio_ranking=None, fecha=None, hasta_borde=False):
+        """
+        Devuelve la Busqueda del punto (redondeado), radio, fecha de vigencia y
+        forma de medir las distancias, calculándola si hace falta
+        """
+        punto = self._punto(lat, lon, fecha, hasta_borde)
+        clave = (punto, radio_km)
+
+        with self._lock:
+            busqueda = self._entradas.get(clave)
+            if busqueda is not None:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                contar('cache_busquedas_aciertos')
+                return busqueda
+
+            # La búsqueda del mismo punto con el menor radio que cubra el pedido
+            mayores = [
+                (p, radio) for (p, radio) in self._entradas
+                if p == punto and radio >= radio_km
+            ]
+            if mayores:
+                origen = min(mayores, key=lambda c: c[1])
+                # La búsqueda de origen también se usó: no debe ser la próxima en salir
+                self._entradas.move_to_end(origen)
+                busqueda = self._entradas[origen].recortar(radio_km)
+                self._guardar(clave, busqueda)
+                self.recortes += 1
+                contar('cache_busquedas_recortes')
+                return busqueda
+
+            self.fallos += 1
+            contar('cache_busquedas_fallos')
+
+        # La búsqueda se calcula fuera del lock para no bloquear otras sesiones
+        radio_calculo = max(radio_km, radio_ranking or radio_km)
+        busqueda = buscar_cercanos(
+            punto[0], punto[1], indice, radio_calculo, fecha=fecha, hasta_borde=hasta_borde
+        )
+        with self._lock:
+            self._guardar((punto, radio_calculo), busqueda)
+            if radio_calculo != radio_km:
+                busqueda = busqueda.recortar(radio_km)
+                self._guardar(clave, busqueda)
+        return busqueda
+
+    def buscar_k(self, lat, lon, indice, k, fecha=None, hasta_borde=False):
+        """
+        Devuelve la Busqueda de los k productores más cercanos al punto
+        (redondeado), calculándola si ninguna búsqueda guardada del punto los tiene
+        """
+        punto = self._punto(lat, lon, fecha, hasta_borde)
+
+        with self._lock:
+            # La búsqueda guardada del punto con el mayor radio tiene la mayor cantidad de productores
+            radios = [radio for (p, radio) in self._entradas if p == punto]
+            if radios:
+                clave = (punto, max(radios))
+                busqueda = self._entradas[clave]
+                if busqueda.cantidad_productores() >= k:
+                    self._entradas.move_to_end(clave)
+                    self.aciertos += 1
+                    contar('cache_busquedas_aciertos')
+                    return busqueda.primeros(k)
+
+            self.fallos += 1
+            contar('cache_busquedas_fallos')
+
+        busqueda = buscar_k_cercanos(punto[0], punto[1], indice, k, fecha=fecha, hasta_borde=hasta_borde)
+        with self._lock:
+            self._guardar((punto, busqueda.radio_km), busqueda)
+        return busqueda.primeros(k)
+
+    def trasladar(self, posiciones_nuevas, zonas_cambiadas):
+        """
+        Devuelve un caché para una nueva versión del registro con las búsquedas que
+        siguen valiendo, con sus posiciones traducidas. posiciones_nuevas es la
+        posición en la nueva versión de cada parcela de la anterior (-1 si cambió
+        o se eliminó) y zonas_cambiadas los rectángulos (lon_min, lat_min,
+        lon_max, lat_max) de las parcelas agregadas, modificadas o eliminadas.
+
+        Una búsqueda sigue valiendo si ninguna zona cambiada queda dentro de su
+        radio: ni sus parcelas ni las que podrían entrar en ella cambiaron.
+        """
+        nuevo = CacheBusquedas(self.max_entradas, self.decimales_punto)
+        if len(zonas_cambiadas) > MAX_CAMBIOS_TRASLADO_CACHE:
+            return nuevo
+
+        with self._lock:
+            entradas = list(self._entradas.items())
+        zonas = np.asarray(zonas_cambiadas, dtype=np.float64).reshape(-1, 4)
+        for clave, busqueda in entradas:
+            # Distancia al punto más cercano de cada zona (cero si la contiene)
+            cotas = calcular_distancias_km(
+                busqueda.lat, busqueda.lon,
+                np.clip(busqueda.lat, zonas[:, 1], zonas[:, 3]),
+                np.clip(busqueda.lon, zonas[:, 0], zonas[:, 2])
+            ) / MARGEN_PROYECCION
+            if not (cotas <= busqueda.radio_km).any():
+                nuevo._entradas[clave] = busqueda.trasladar(posiciones_nuevas)
+        return nuevo
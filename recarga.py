@@ -0,0 +1,374 @@
+"""
+Recarga en caliente del registro cuando cambia el CSV.
+
+RegistroVivo guarda la versión vigente del registro (tabla, índice y caché de
+búsquedas) y la reemplaza por una nueva cuando el CSV cambia, sin reiniciar el
+proceso. Un hilo de fondo revisa el tamaño y la fecha de modificación del CSV
+cada INTERVALO_VIGILANCIA_S segundos y recarga cuando el archivo cambió y se
+mantiene igual entre dos revisiones (no se lee un archivo a medio copiar).
+
+La recarga relee el CSV completo y arma la tabla y el índice de la nueva
+versión desde cero; lo que se evita es volver a interpretar los polígonos y
+descartar el caché:
+
+- Las filas se comparan por RENSPA con las huellas (hashes) guardadas en el
+  artefacto: parcelas agregadas, modificadas, eliminadas y sin cambios.
+- Los polígonos se reutilizan por la huella de su texto, así que sólo se
+  interpretan los polígonos nuevos o modificados; las coordenadas, rectángulos,
+  centroides y superficies de los demás se copian de la versión anterior.
+- El índice completo (grilla, STRtree, índice por CUIT y vigencias ordenadas)
+  se vuelve a armar sobre esos buffers: el STRtree no admite cambios y los
+  demás arreglos dependen de todas las filas, pero son operaciones
+  vectorizadas. El artefacto de la nueva versión se guarda para que el próximo
+  arranque lo abra directamente.
+- Las búsquedas del caché que ningún cambio alcanza pasan a la nueva versión
+  con sus posiciones traducidas; sólo se descartan las afectadas.
+
+Cada versión es inmutable y se publica reemplazando una sola referencia: una
+búsqueda toma la versión vigente al empezar (actual()) y trabaja sobre ella
+hasta el final, aunque mientras tanto se publique otra.
+"""
+import logging
+import os
+import threading
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from almacen import (
+    MEMORIA_MAXIMA_MB, cargar_o_preprocesar, concatenar_bloques, filas_por_bloque, guardar_preprocesado,
+    huella_csv, huellas_filas, leer_huellas
+)
+from metricas import contar, medido
+from motor import (
+    TAMANO_CELDA_GRADOS, CacheBusquedas, IndiceEspacial, Poligonos, compactar_productores,
+    parsear_poligonos, validar_productores
+)
+
+# Segundos entre revisiones del CSV
+INTERVALO_VIGILANCIA_S = 30
+
+MAX_BUSQUEDAS_EN_CACHE = 256
+
+logger = logging.getLogger('visor.recarga')
+
+
+def _estado_archivo(ruta_csv):
+    """(tamaño, mtime_ns) del archivo, o None si no existe"""
+    try:
+        estado = os.stat(ruta_csv)
+    except OSError:
+        return None
+    return estado.st_size, estado.st_mtime_ns
+
+
+def _renspas(datos):
+    """RENSPA de cada fila como categorías (sin copiar el texto si ya lo son)"""
+    if 'renspa' in datos.columns:
+        return pd.Categorical(datos['renspa'])
+    return pd.Categorical.from_codes(np.full(len(datos), -1), categories=[])
+
+
+def _apariciones(codigos):
+    """Número de aparición de cada código entre las filas anteriores con el mismo código"""
+    orden = np.argsort(codigos, kind='stable')
+    ordenados = codigos[orden]
+    filas = np.arange(len(codigos))
+    inicios = np.maximum.accumulate(np.where(np.r_[True, ordenados[1:] != ordenados[:-1]], filas, 0))
+    apariciones = np.empty(len(codigos), dtype=np.int64)
+    apariciones[orden] = filas - inicios
+    return apariciones
+
+
+def emparejar_filas(anterior, nuevo):
+    """
+    Posición en la tabla anterior de la fila con el mismo RENSPA de cada fila de
+    la nueva, o -1. Si un RENSPA se repite sus apariciones se emparejan en orden,
+    igual que las filas sin RENSPA. Se compara por códigos de categoría: el texto
+    de los RENSPA no se copia.
+    """
+    renspas_anteriores, renspas_nuevos = _renspas(anterior), _renspas(nuevo)
+    # Las filas sin RENSPA tienen un código propio; los RENSPA nuevos quedan en -1
+    nulo = len(renspas_anteriores.categories)
+    codigos_anteriores = np.where(renspas_anteriores.codes < 0, nulo, renspas_anteriores.codes)
+    traduccion = np.append(
+        pd.Index(renspas_anteriores.categories).get_indexer(renspas_nuevos.categories), nulo
+    )
+    codigos_nuevos = traduccion[renspas_nuevos.codes]
+
+    apariciones_anteriores = _apariciones(codigos_anteriores)
+    apariciones_nuevas = _apariciones(codigos_nuevos)
+    base = max(apariciones_anteriores.max(initial=0), apariciones_nuevas.max(initial=0)) + 1
+    previas = pd.Index(codigos_anteriores * base + apariciones_anteriores).get_indexer(
+        codigos_nuevos * base + apariciones_nuevas
+    )
+    previas[codigos_nuevos < 0] = -1
+    return previas
+
+
+class Diferencia:
+    """
+    Cambios entre dos versiones del registro: cantidades de parcelas agregadas,
+    modificadas, eliminadas y sin cambios, y la posición nueva de cada parcela
+    anterior sin cambios (-1 para las demás)
+    """
+
+    def __init__(self, agregadas, modificadas, eliminadas, sin_cambios, posiciones_nuevas):
+        self.agregadas = agregadas
+        self.modificadas = modificadas
+        self.eliminadas = eliminadas
+        self.sin_cambios = sin_cambios
+        self.posiciones_nuevas = posiciones_nuevas
+
+    def __repr__(self):
+        return (f"Diferencia(agregadas={self.agregadas}, modificadas={self.modificadas}, "
+                f"eliminadas={self.eliminadas}, sin_cambios={self.sin_cambios})")
+
+
+class VersionRegistro:
+    """
+    Una versión del registro: tabla, índice (congelado), huellas de sus filas y
+    caché de búsquedas. Los objetos derivados (índice de texto, vista general...)
+    se arman la primera vez que se piden y quedan con la versión.
+    """
+
+    def __init__(self, numero, datos, indice, huellas=None, cache=None, diferencia=None):
+        self.numero = numero
+        self.datos = datos
+        self.indice = indice.congelar()
+        self.huellas = huellas
+        self.cache = cache if cache is not None else CacheBusquedas(MAX_BUSQUEDAS_EN_CACHE)
+        self.diferencia = diferencia
+        self.cargada = time.time()
+        self._derivados = {}
+        self._candado = threading.Lock()
+
+    def derivado(self, nombre, construir):
+        """Objeto derivado de esta versión, construido una sola vez con construir(version)"""
+        with self._candado:
+            if nombre not in self._derivados:
+                self._derivados[nombre] = construir(self)
+            return self._derivados[nombre]
+
+
+def _poligonos_del_bloque(bloque, poligonos_anteriores, unicas, primeras, huellas_poligono):
+    """
+    Polígonos de un bloque del CSV: los que tienen la huella de un polígono de la
+    versión anterior se copian de ella y sólo los demás se interpretan
+    """
+    if 'poligono' not in bloque.columns:
+        return Poligonos(np.empty((0, 2)), np.zeros(len(bloque) + 1, dtype=np.int64)), 0
+
+    lugar = np.minimum(np.searchsorted(unicas, huellas_poligono), max(len(unicas) - 1, 0))
+    reutilizados = (unicas[lugar] == huellas_poligono) if len(unicas) else np.zeros(len(bloque), dtype=bool)
+    nuevos = np.flatnonzero(~reutilizados)
+
+    partes = Poligonos.concatenar([
+        poligonos_anteriores.tomar(primeras[lugar[reutilizados]]),
+        parsear_poligonos(bloque['poligono'].iloc[nuevos])
+    ])
+    # Las filas vuelven a su orden: primero estaban las reutilizadas y después las nuevas
+    orden = np.empty(len(bloque), dtype=np.int64)
+    orden[np.flatnonzero(reutilizados)] = np.arange(reutilizados.sum())
+    orden[nuevos] = reutilizados.sum() + np.arange(len(nuevos))
+    return partes.tomar(orden), len(nuevos)
+
+
+@medido('recargar_registro')
+def construir_version(ruta_csv, anterior, tamano_celda_grados=TAMANO_CELDA_GRADOS,
+                      memoria_maxima_mb=MEMORIA_MAXIMA_MB):
+    """
+    Arma la versión siguiente a anterior releyendo el CSV completo por bloques:
+    la tabla y el índice se reconstruyen enteros y de la versión anterior sólo
+    se reutilizan los polígonos ya interpretados (por la huella de su texto).
+    Devuelve (datos, indice, huellas, diferencia, polígonos interpretados).
+    """
+    if anterior.huellas is not None:
+        huellas_fila_anteriores, huellas_poligono_anteriores = (np.asarray(h) for h in anterior.huellas)
+    else:
+        # Sin huellas (datos que no vienen de un artefacto) todo cuenta como cambiado
+        huellas_fila_anteriores = np.zeros(len(anterior.datos), dtype=np.uint64)
+        huellas_poligono_anteriores = np.empty(0, dtype=np.uint64)
+    # Primera parcela anterior con cada huella de polígono, para buscarlas ordenadas
+    unicas, primeras = np.unique(huellas_poligono_anteriores, return_index=True)
+
+    bloques, poligonos, huellas_fila, huellas_poligono = [], [], [], []
+    interpretados = 0
+    for bloque in pd.read_csv(ruta_csv, chunksize=filas_por_bloque(ruta_csv, memoria_maxima_mb)):
+        bloque = validar_productores(bloque, ruta_csv)
+        filas, textos = huellas_filas(bloque)
+        parte, nuevos = _poligonos_del_bloque(
+            bloque, anterior.indice.poligonos, unicas, primeras, textos
+        )
+        # Cada bloque se compacta al leerlo: la tabla completa nunca está como objetos
+        bloques.append(compactar_productores(bloque.drop(columns=['poligono'], errors='ignore')))
+        poligonos.append(parte)
+        huellas_fila.append(filas)
+        huellas_poligono.append(textos)
+        interpretados += nuevos
+
+    # Los bloques se sueltan apenas se unen, antes de armar el índice
+    datos = concatenar_bloques(bloques)
+    del bloques
+    poligonos = Poligonos.concatenar(poligonos)
+    indice = IndiceEspacial(datos, tamano_celda_grados, poligonos=poligonos)
+    huellas = (np.concatenate(huellas_fila), np.concatenate(huellas_poligono))
+
+    # Filas de la versión anterior con el mismo RENSPA
+    previas = emparejar_filas(anterior.datos, datos)
+    emparejadas = previas >= 0
+    iguales = emparejadas.copy()
+    iguales[emparejadas] = huellas_fila_anteriores[previas[emparejadas]] == huellas[0][emparejadas]
+
+    posiciones_nuevas = np.full(len(anterior.datos), -1, dtype=np.int64)
+    posiciones_nuevas[previas[iguales]] = np.flatnonzero(iguales)
+    diferencia = Diferencia(
+        agregadas=int((~emparejadas).sum()),
+        modificadas=int((emparejadas & ~iguales).sum()),
+        eliminadas=int(len(anterior.datos) - emparejadas.sum()),
+        sin_cambios=int(iguales.sum()),
+        posiciones_nuevas=posiciones_nuevas
+    )
+    return datos, indice, huellas, diferencia, interpretados
+
+
+def zonas_cambiadas(anterior, indice, diferencia):
+    """Rectángulos de las parcelas que cambiaron, en la versión anterior y en la nueva"""
+    viejas = np.flatnonzero(diferencia.posiciones_nuevas < 0)
+    sin_cambios = np.zeros(len(indice.latitudes), dtype=bool)
+    sin_cambios[diferencia.posiciones_nuevas[diferencia.posiciones_nuevas >= 0]] = True
+    nuevas = np.flatnonzero(~sin_cambios)
+    return np.concatenate([
+        anterior.indice.poligonos.zonas(
+            viejas, anterior.indice.latitudes[viejas], anterior.indice.longitudes[viejas]
+        ),
+        indice.poligonos.zonas(nuevas, indice.latitudes[nuevas], indice.longitudes[nuevas]),
+    ])
+
+
+class RegistroVivo:
+    """
+    Versión vigente del registro de un CSV, que se reemplaza cuando el CSV cambia.
+
+    Las lecturas no toman ningún lock: actual() devuelve la versión publicada y
+    publicar una versión es reemplazar una referencia. Las recargas se
+    serializan entre sí.
+    """
+
+    def __init__(self, ruta_csv, datos, indice, huellas=None, estado=None, sha256=None,
+                 tamano_celda_grados=TAMANO_CELDA_GRADOS, max_busquedas=MAX_BUSQUEDAS_EN_CACHE,
+                 memoria_maxima_mb=MEMORIA_MAXIMA_MB):
+        self.ruta_csv = ruta_csv
+        self.tamano_celda_grados = tamano_celda_grados
+        self.memoria_maxima_mb = memoria_maxima_mb
+        self._version = VersionRegistro(1, datos, indice, huellas, CacheBusquedas(max_busquedas))
+        # Estado y hash del CSV de la versión vigente, y estado visto en la última revisión
+        self._estado = estado
+        self._sha256 = sha256
+        self._visto = estado
+        self._recargando = threading.Lock()
+        self._vigilante = None
+        self._detener = threading.Event()
+        self.ultimo_error = None
+
+    @classmethod
+    def abrir(cls, ruta_csv, tamano_celda_grados=TAMANO_CELDA_GRADOS, max_busquedas=MAX_BUSQUEDAS_EN_CACHE,
+              memoria_maxima_mb=MEMORIA_MAXIMA_MB):
+        """Carga el registro desde el artefacto (o generándolo) con las huellas de sus filas"""
+        # El estado se toma antes de leer: si el CSV cambia durante la carga, se recarga
+        estado = _estado_archivo(ruta_csv)
+        huella = huella_csv(ruta_csv)
+        datos, indice = cargar_o_preprocesar(
+            ruta_csv, tamano_celda_grados, memoria_maxima_mb=memoria_maxima_mb
+        )
+        try:
+            huellas = leer_huellas(ruta_csv, huella)
+        except OSError:
+            huellas = None
+        return cls(ruta_csv, datos, indice, huellas, estado, huella[2], tamano_celda_grados,
+                   max_busquedas, memoria_maxima_mb)
+
+    def actual(self):
+        """La versión vigente; quien la toma la usa entera aunque se publique otra"""
+        return self._version
+
+    def recargar(self):
+        """
+        Arma la versión siguiente a partir del CSV actual y la publica. Devuelve
+        la nueva versión, o None si el contenido del CSV no cambió.
+        """
+        with self._recargando:
+            anterior = self._version
+            estado = _estado_archivo(self.ruta_csv)
+            huella = huella_csv(self.ruta_csv)
+            if huella[2] == self._sha256:
+                # Mismo contenido: sólo cambió la fecha del archivo
+                self._estado = estado
+                return None
+
+            inicio = time.perf_counter()
+            datos, indice, huellas, diferencia, interpretados = construir_version(
+                self.ruta_csv, anterior, self.tamano_celda_grados, self.memoria_maxima_mb
+            )
+            if _estado_archivo(self.ruta_csv) != estado:
+                # El CSV cambió mientras se leía: se vuelve a intentar en la próxima revisión
+                return None
+
+            cache = anterior.cache.trasladar(
+                diferencia.posiciones_nuevas, zonas_cambiadas(anterior, indice, diferencia)
+            )
+            nueva = VersionRegistro(anterior.numero + 1, datos, indice, huellas, cache, diferencia)
+            self._version = nueva
+            self._estado = estado
+            self._sha256 = huella[2]
+            contar('recargas_registro')
+            logger.info(
+                "Registro %s: versión %d en %.1f s, %s, %d polígonos interpretados, "
+                "%d de %d búsquedas conservadas",
+                self.ruta_csv, nueva.numero, time.perf_counter() - inicio, diferencia, interpretados,
+                len(cache), len(anterior.cache)
+            )
+
+        # El artefacto de la nueva versión es para el próximo arranque; la versión ya está publicada
+        try:
+            guardar_preprocesado(self.ruta_csv, datos, indice, huella, huellas)
+        except OSError as e:
+            warnings.warn(f"No se pudo guardar el artefacto preprocesado: {e}")
+        return nueva
+
+    def revisar(self):
+        """
+        Recarga si el CSV cambió y no volvió a cambiar desde la revisión anterior.
+        Devuelve la nueva versión o None.
+        """
+        estado = _estado_archivo(self.ruta_csv)
+        visto, self._visto = self._visto, estado
+        if estado is None or estado == self._estado or estado != visto:
+            return None
+        try:
+            nueva = self.recargar()
+            self.ultimo_error = None
+            return nueva
+        except Exception as e:
+            # Un CSV inválido no reemplaza la versión vigente; se reintenta cuando vuelva a cambiar
+            self._estado = estado
+            self.ultimo_error = f"{type(e).__name__}: {e}"
+            logger.warning("No se pudo recargar %s: %s", self.ruta_csv, self.ultimo_error)
+            return None
+
+    def vigilar(self, intervalo_s=INTERVALO_VIGILANCIA_S):
+        """Inicia (una sola vez) el hilo que revisa el CSV cada intervalo_s segundos"""
+        if self._vigilante is not None:
+            return self
+        def bucle():
+            while not self._detener.wait(intervalo_s):
+                self.revisar()
+        self._vigilante = threading.Thread(target=bucle, name='vigilancia-registro', daemon=True)
+        self._vigilante.start()
+        return self
+
+    def detener(self):
+        """Detiene el hilo de vigilancia"""
+        self._detener.set()
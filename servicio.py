@@ -0,0 +1,255 @@
+"""
+Servicio HTTP de consultas sobre el mismo motor que usa la aplicación.
+
+Carga una sola vez la tabla y los índices (desde el artefacto preprocesado) y
+los comparte entre todas las peticiones. Cuando el CSV cambia, el registro se
+recarga en segundo plano (recarga.RegistroVivo) y cada petición usa la versión
+vigente al empezar. Los manejadores son asíncronos y las
+consultas se ejecutan en el pool de hilos de Starlette, así que el bucle de
+eventos sigue atendiendo conexiones mientras NumPy y Shapely (que liberan el
+GIL en las operaciones vectorizadas) resuelven las consultas en paralelo.
+
+Consultas (todas aceptan fecha=AAAA-MM-DD para filtrar por vigencia):
+
+    GET  /salud
+    GET  /metricas                                  tiempos por etapa en formato Prometheus
+    GET  /punto?lat=..&lon=..                       parcelas que contienen el punto
+    GET  /cercanos?lat=..&lon=..&radio_km=10        contenedoras y cercanas por CUIT
+    GET  /cercanos?lat=..&lon=..&k=20               los k productores más cercanos, sin radio
+    GET  /bbox?lon_min=..&lat_min=..&lon_max=..&lat_max=..
+    POST /lote  {"puntos": [{"id": .., "lat": .., "lon": ..}], "radio_km": 0, "max_cercanos": 5}
+
+/cercanos mide por defecto hasta la coordenada de cada parcela; con
+distancia=borde mide hasta el borde de su polígono.
+
+/punto, /cercanos y /bbox devuelven JSON o, con formato=geojson, una
+FeatureCollection con los polígonos de las parcelas.
+
+Uso:
+
+    python -m servicio --registro datos_productores.csv --puerto 8000
+"""
+import argparse
+import math
+
+import pandas as pd
+import shapely
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+from lote import columnas_coordenadas, geolocalizar_bloque
+from metricas import REGISTRO, medir
+from motor import encontrar_parcelas_en_area, encontrar_productor_contenedor, resultados_de_busqueda
+from recarga import RegistroVivo
+
+RADIO_MAXIMO_KM = 500.0
+
+# Máximo de productores en /cercanos con k
+MAX_PRODUCTORES_CERCANOS = 1000
+
+# Puntos máximos por petición de /lote
+MAX_PUNTOS_LOTE = 100_000
+
+MAX_BUSQUEDAS_EN_CACHE = 4096
+
+
+class ErrorConsulta(ValueError):
+    """Parámetros inválidos de una consulta; se responden con 400"""
+
+
+def _numero(parametros, nombre, defecto=None, minimo=-math.inf, maximo=math.inf):
+    valor = parametros.get(nombre, defecto)
+    if valor is None:
+        raise ErrorConsulta(f"Falta el parámetro '{nombre}'")
+    try:
+        valor = float(valor)
+    except (TypeError, ValueError):
+        raise ErrorConsulta(f"El parámetro '{nombre}' debe ser numérico") from None
+    if not (minimo <= valor <= maximo):
+        raise ErrorConsulta(f"El parámetro '{nombre}' debe estar entre {minimo} y {maximo}")
+    return valor
+
+
+def _fecha(parametros):
+    fecha = parametros.get('fecha')
+    if not fecha:
+        return None
+    try:
+        return pd.Timestamp(fecha).date()
+    except ValueError:
+        raise ErrorConsulta("La fecha debe tener el formato AAAA-MM-DD") from None
+
+
+def _hasta_borde(parametros):
+    distancia = parametros.get('distancia', 'punto')
+    if distancia not in ('punto', 'borde'):
+        raise ErrorConsulta("El parámetro 'distancia' debe ser 'punto' o 'borde'")
+    return distancia == 'borde'
+
+
+def _registros(resultados):
+    """Filas de resultados como dicts JSON (sin las listas de coordenadas)"""
+    columnas = [c for c in resultados.columns if c != 'poligono_formatted']
+    # Columna por columna con tolist (tipos de Python), los NaN pasan a None
+    valores = [[None if v != v else v for v in resultados[c].tolist()] for c in columnas]
+    return [dict(zip(columnas, fila)) for fila in zip(*valores)]
+
+
+def _geojson(resultados):
+    """FeatureCollection con el polígono (o el punto) de cada parcela"""
+    features = []
+    for propiedades, poligono in zip(_registros(resultados), resultados['poligono_formatted']):
+        if poligono:
+            anillo = [[lon, lat] for lat, lon in poligono]
+            if anillo[0] != anillo[-1]:
+                anillo.append(anillo[0])
+            geometria = {'type': 'Polygon', 'coordinates': [anillo]}
+        else:
+            geometria = {'type': 'Point', 'coordinates': [propiedades['longitud'], propiedades['latitud']]}
+        features.append({'type': 'Feature', 'geometry': geometria, 'properties': propiedades})
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def _respuesta(resultados, parametros):
+    if parametros.get('formato') == 'geojson':
+        return _geojson(resultados)
+    return {'cantidad': len(resultados), 'resultados': _registros(resultados)}
+
+
+class Motor:
+    """
+    Consultas sobre el registro compartido por todas las peticiones. Cada
+    consulta toma la versión vigente (tabla, índices y caché) al empezar.
+    """
+
+    def __init__(self, registro):
+        self.registro = registro
+
+    def punto(self, parametros):
+        version = self.registro.actual()
+        lat = _numero(parametros, 'lat', minimo=-90, maximo=90)
+        lon = _numero(parametros, 'lon', minimo=-180, maximo=180)
+        resultados = encontrar_productor_contenedor(lat, lon, version.datos, version.indice, _fecha(parametros))
+        return _respuesta(resultados, parametros)
+
+    def cercanos(self, parametros):
+        version = self.registro.actual()
+        lat = _numero(parametros, 'lat', minimo=-90, maximo=90)
+        lon = _numero(parametros, 'lon', minimo=-180, maximo=180)
+        if 'k' in parametros:
+            k = _numero(parametros, 'k', minimo=1, maximo=MAX_PRODUCTORES_CERCANOS)
+            if k != int(k):
+                raise ErrorConsulta("El parámetro 'k' debe ser entero")
+            busqueda = version.cache.buscar_k(
+                lat, lon, version.indice, int(k), fecha=_fecha(parametros), hasta_borde=_hasta_borde(parametros)
+            )
+        else:
+            radio_km = _numero(parametros, 'radio_km', 10, minimo=0, maximo=RADIO_MAXIMO_KM)
+            busqueda = version.cache.buscar(
+                lat, lon, version.indice, radio_km, fecha=_fecha(parametros), hasta_borde=_hasta_borde(parametros)
+            )
+        return _respuesta(resultados_de_busqueda(version.datos, version.indice, busqueda), parametros)
+
+    def bbox(self, parametros):
+        version = self.registro.actual()
+        lon_min = _numero(parametros, 'lon_min', minimo=-180, maximo=180)
+        lat_min = _numero(parametros, 'lat_min', minimo=-90, maximo=90)
+        lon_max = _numero(parametros, 'lon_max', minimo=lon_min, maximo=180)
+        lat_max = _numero(parametros, 'lat_max', minimo=lat_min, maximo=90)
+        resultados = encontrar_parcelas_en_area(
+            shapely.box(lon_min, lat_min, lon_max, lat_max), version.datos, version.indice, _fecha(parametros)
+        )
+        return _respuesta(resultados, parametros)
+
+    def lote(self, cuerpo):
+        if not isinstance(cuerpo, dict) or not isinstance(cuerpo.get('puntos'), list):
+            raise ErrorConsulta("El cuerpo debe ser un objeto JSON con la lista 'puntos'")
+        if len(cuerpo['puntos']) > MAX_PUNTOS_LOTE:
+            raise ErrorConsulta(f"Se admiten hasta {MAX_PUNTOS_LOTE} puntos por petición")
+
+        if not all(isinstance(punto, dict) for punto in cuerpo['puntos']):
+            raise ErrorConsulta("Cada punto debe ser un objeto JSON con 'lat' y 'lon'")
+
+        version = self.registro.actual()
+        puntos = pd.DataFrame(cuerpo['puntos'], columns=None if cuerpo['puntos'] else ['lat', 'lon'])
+        try:
+            columnas_coordenadas(puntos.columns)
+        except ValueError:
+            raise ErrorConsulta("Cada punto debe ser un objeto JSON con 'lat' y 'lon'") from None
+        radio_km = _numero(cuerpo, 'radio_km', 0, minimo=0, maximo=RADIO_MAXIMO_KM)
+        max_cercanos = int(_numero(cuerpo, 'max_cercanos', 5, minimo=0, maximo=1000))
+        resultados = geolocalizar_bloque(
+            puntos, version.datos, version.indice, radio_km, max_cercanos, fecha=_fecha(cuerpo)
+        )
+        return {'cantidad': len(resultados), 'resultados': _registros(resultados)}
+
+
+def _manejador(consulta):
+    """Adapta una consulta síncrona del Motor a un endpoint asíncrono"""
+    etapa = f'servicio_{consulta.__name__}'
+
+    def medida(parametros):
+        with medir(etapa):
+            return consulta(parametros)
+
+    async def manejar(request):
+        try:
+            if request.method == 'POST':
+                try:
+                    parametros = await request.json()
+                except ValueError:
+                    raise ErrorConsulta("El cuerpo no es JSON válido") from None
+            else:
+                parametros = dict(request.query_params)
+            respuesta = await run_in_threadpool(medida, parametros)
+        except ErrorConsulta as e:
+            return JSONResponse({'error': str(e)}, status_code=400)
+        return JSONResponse(respuesta)
+    return manejar
+
+
+def crear_app(registro):
+    """Aplicación ASGI sobre un registro ya cargado (RegistroVivo)"""
+    motor = Motor(registro)
+
+    async def salud(request):
+        version = registro.actual()
+        return JSONResponse({
+            'version': version.numero,
+            'parcelas': len(version.datos),
+            'poligonos': len(version.indice),
+            'busquedas_en_cache': len(version.cache),
+            'ultimo_error_recarga': registro.ultimo_error,
+        })
+
+    async def metricas(request):
+        return PlainTextResponse(REGISTRO.prometheus(), media_type='text/plain; version=0.0.4')
+
+    return Starlette(routes=[
+        Route('/salud', salud),
+        Route('/metricas', metricas),
+        Route('/punto', _manejador(motor.punto)),
+        Route('/cercanos', _manejador(motor.cercanos)),
+        Route('/bbox', _manejador(motor.bbox)),
+        Route('/lote', _manejador(motor.lote), methods=['POST']),
+    ])
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Servicio HTTP de consultas de parcelas")
+    parser.add_argument('--registro', default='datos_productores.csv', help="CSV de productores")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8000)
+    args = parser.parse_args()
+
+    registro = RegistroVivo.abrir(args.registro, max_busquedas=MAX_BUSQUEDAS_EN_CACHE).vigilar()
+    # Un solo proceso: todas las peticiones comparten el mismo índice en memoria
+    uvicorn.run(crear_app(registro), host=args.host, port=args.puerto, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+import os
+
+import pandas as pd
+import pytest
+
+from almacen import cargar_o_preprocesar, directorio_cache, ingerir_csv
+from benchmarks.generador import COLUMNAS
+
+
+def test_csv_sin_filas(tmp_path):
+    ruta = str(tmp_path / 'vacio.csv')
+    with open(ruta, 'w') as archivo:
+        archivo.write(','.join(COLUMNAS) + '\n')
+
+    with pytest.raises(ValueError, match='no tiene filas'):
+        ingerir_csv(ruta)
+    with pytest.raises(ValueError, match='no tiene filas'):
+        cargar_o_preprocesar(ruta)
+    # No queda ningún artefacto a medio escribir
+    assert not os.listdir(directorio_cache(ruta))
+
+
+def test_csv_sin_bloques(tmp_path, monkeypatch):
+    # Otras versiones de pandas no devuelven ningún bloque para un CSV sin filas
+    ruta = str(tmp_path / 'vacio.csv')
+    with open(ruta, 'w') as archivo:
+        archivo.write(','.join(COLUMNAS) + '\n')
+    leer = pd.read_csv
+    monkeypatch.setattr(
+        'almacen.pd.read_csv',
+        lambda *args, **kwargs: iter([]) if 'chunksize' in kwargs else leer(*args, **kwargs)
+    )
+
+    with pytest.raises(ValueError, match='no tiene filas'):
+        ingerir_csv(ruta)
@@ -0,0 +1,20 @@
+import numpy as np
+
+from almacen import cargar_o_preprocesar
+from benchmarks.generador import generar_registro
+from buscador import IndiceTexto
+
+
+def test_productores_ordenados_por_razon_social_desde_el_artefacto(tmp_path):
+    ruta = str(tmp_path / 'registro.csv')
+    generar_registro(500, semilla=3).to_csv(ruta)
+    cargar_o_preprocesar(ruta)
+    # La segunda carga abre el artefacto, cuyas categorías están en orden de aparición
+    datos, _ = cargar_o_preprocesar(ruta)
+    assert list(datos['titular'].cat.categories) != sorted(datos['titular'].cat.categories)
+
+    indice = IndiceTexto(datos)
+    productores = indice.productores(np.arange(len(datos)), limite=20)
+
+    esperados = sorted(datos['titular'].dropna().unique())[:20]
+    assert productores['titular'].tolist() == esperados
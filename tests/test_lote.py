@@ -0,0 +1,17 @@
+import pandas as pd
+
+from benchmarks.generador import generar_registro
+from lote import COLUMNAS_SALIDA, geolocalizar_bloque
+from motor import IndiceEspacial, compactar_productores, validar_productores
+
+
+def test_puntos_sin_coincidencias_tienen_su_fila():
+    datos = compactar_productores(validar_productores(generar_registro(100, semilla=2), 'prueba'))
+    indice = IndiceEspacial(datos)
+    puntos = pd.DataFrame({'lat': [10.0, None], 'lon': [10.0, -60.0]})
+
+    salida = geolocalizar_bloque(puntos, datos, indice, radio_km=5)
+
+    assert list(salida.columns) == COLUMNAS_SALIDA
+    assert salida['tipo'].tolist() == ['sin_resultados', 'coordenadas_invalidas']
+    assert salida['distancia_km'].isna().all()
@@ -0,0 +1,206 @@
+import numpy as np
+import pandas as pd
+import pytest
+from shapely.geometry import Point, Polygon, box, mapping
+
+from benchmarks.generador import generar_registro
+from benchmarks.linea_base import calcular_distancia_km
+from motor import (
+    KM_POR_GRADO, RADIO_TIERRA_KM, TOLERANCIA_SUPERFICIE, IndiceEspacial, _parsear_bloque, buscar_cercanos,
+    buscar_k_cercanos, compactar_productores, encontrar_k_productores_cercanos, encontrar_parcelas_en_area,
+    formato_a_poligono, validar_productores
+)
+
+FECHAS = ['2003-01-01', '2014-06-15', '2021-03-01', '2030-01-01']
+
+
+@pytest.fixture(scope='module')
+def registro():
+    """Registro sintético con índice y, fila por fila, el polígono Shapely (o None) de cada parcela"""
+    crudo = generar_registro(2000, semilla=7)
+    # Parcelas sin inscripción, que toman la vigencia desde la reinscripción
+    crudo.loc[::17, 'fecha_inscripcion'] = np.nan
+    datos = compactar_productores(validar_productores(crudo, 'prueba'))
+    geometrias = []
+    for texto in datos['poligono']:
+        coordenadas = formato_a_poligono(texto)
+        valido = coordenadas is not None and len(coordenadas) >= 3
+        geometrias.append(Polygon([(lon, lat) for lat, lon in coordenadas]) if valido else None)
+    return datos, IndiceEspacial(datos), geometrias
+
+
+def _vigente(fila, fecha):
+    """Vigencia de una parcela a la fecha, con las fechas de la fila"""
+    inicio = fila.fecha_inscripcion if pd.notna(fila.fecha_inscripcion) else fila.fecha_reinscripcion
+    if pd.notna(inicio) and fecha < inicio:
+        return False
+    baja, reinscripcion = fila.fecha_baja, fila.fecha_reinscripcion
+    return pd.isna(baja) or (pd.notna(reinscripcion) and reinscripcion > baja) or fecha < baja
+
+
+def _cercanos_por_cuit(datos, lat, lon, radio_km, filas, excluidos):
+    """CUIT -> distancia de su parcela más cercana dentro del radio, recorriendo las filas"""
+    cercanos = {}
+    for fila in datos.iloc[filas].itertuples():
+        distancia = calcular_distancia_km(lat, lon, fila.latitud, fila.longitud)
+        if distancia <= radio_km and fila.cuit not in excluidos:
+            cercanos[fila.cuit] = min(distancia, cercanos.get(fila.cuit, np.inf))
+    return cercanos
+
+
+def _coordenadas(poligonos, i):
+    return poligonos.coordenadas[poligonos.offsets[i]:poligonos.offsets[i + 1]].tolist()
+
+
+@pytest.mark.parametrize('texto', [
+    '(-34.1,), (-34.2,-60.2), (-34.3,-60.3), (-34.4,-60.4), (-34.2,-60.2)',
+    '(-34.1,-60.1,5), (-34.2,-60.2), (-34.3,-60.3), (-34.4,-60.4), (-34.2,-60.2)',
+    '(-34.2,-60.2), (,-60.3), (-34.3,-60.3), (-34.4,-60.4), (-34.2,-60.2)',
+    '(-34.2,-60.2), (-34.3,-60.3), (-34.4,-60.4), (-34.2,-60.2), (-34.5',
+])
+def test_pares_mal_formados_como_fila_por_fila(texto):
+    validos = [
+        '(-35.2,-61.2), (-35.3,-61.3), (-35.4,-61.4), (-35.2,-61.2)',
+        'POLYGON((-60 -34, -60.1 -34, -60.1 -34.1, -60 -34))',
+    ]
+    textos = [validos[0], texto, None, validos[1]]
+    poligonos = _parsear_bloque(textos)
+
+    for i, valor in enumerate(textos):
+        esperado = formato_a_poligono(valor)
+        esperado = esperado if esperado is not None and len(esperado) >= 3 else []
+        assert _coordenadas(poligonos, i) == esperado
+    assert np.isfinite(poligonos.coordenadas).all()
+
+
+@pytest.mark.parametrize('fecha', FECHAS)
+def test_vigencia_como_fila_por_fila(registro, fecha):
+    datos, indice, geometrias = registro
+    vigentes = np.array([_vigente(fila, pd.Timestamp(fecha)) for fila in datos.itertuples()])
+
+    assert indice.cantidad_vigentes(fecha) == vigentes.sum()
+    assert indice.vigentes(np.arange(len(datos)), fecha).tolist() == np.flatnonzero(vigentes).tolist()
+
+    # Búsquedas con fecha alrededor de algunas parcelas: contención y cercanos
+    for i in range(0, len(datos), 250):
+        lat, lon = datos['latitud'].iat[i], datos['longitud'].iat[i]
+        busqueda = buscar_cercanos(lat, lon, indice, 30, fecha=fecha)
+        contenedores = [
+            j for j in np.flatnonzero(vigentes)
+            if geometrias[j] is not None and geometrias[j].contains(Point(lon, lat))
+        ]
+        assert busqueda.contenedores.tolist() == contenedores
+
+        cercanos = _cercanos_por_cuit(
+            datos, lat, lon, 30, np.flatnonzero(vigentes), set(datos['cuit'].iloc[contenedores])
+        )
+        obtenidos = dict(zip(datos['cuit'].iloc[busqueda.posiciones], busqueda.distancias))
+        assert obtenidos.keys() == cercanos.keys()
+        assert np.allclose([obtenidos[c] for c in cercanos], list(cercanos.values()), rtol=1e-9)
+
+
+@pytest.mark.parametrize('fecha', [None, '2014-06-15'])
+def test_parcelas_en_area_como_busqueda_exhaustiva(registro, fecha):
+    datos, indice, geometrias = registro
+    for i in range(0, len(datos), 200):
+        lat, lon = datos['latitud'].iat[i], datos['longitud'].iat[i]
+        # Un área que contiene parcelas enteras y una franja que corta parcelas por la mitad
+        areas = [
+            box(lon - 0.3, lat - 0.2, lon + 0.25, lat + 0.3),
+            box(lon - 0.5, lat - 0.001, lon + 0.5, lat + 0.001),
+        ]
+        for area in areas:
+            # Todas las parcelas con polígono, vigentes, contra el área
+            esperadas = [
+                j for j, geometria in enumerate(geometrias)
+                if geometria is not None and geometria.intersects(area)
+                and (fecha is None or _vigente(datos.iloc[j], pd.Timestamp(fecha)))
+            ]
+            posiciones, contenidas = indice.parcelas_en_area(area, fecha)
+            assert posiciones.tolist() == esperadas
+            assert contenidas.tolist() == [area.contains(geometrias[j]) for j in esperadas]
+
+            # Como GeoJSON: las mismas parcelas, ordenadas por distancia al centro del área
+            resultados = encontrar_parcelas_en_area(mapping(area), datos, indice, fecha)
+            renspas = datos['renspa'].iloc[esperadas].astype(str)
+            assert sorted(resultados['renspa'].astype(str)) == sorted(renspas)
+            assert resultados['distancia'].is_monotonic_increasing
+
+
+def test_centroides_y_superficies_como_fila_por_fila(registro):
+    datos, indice, geometrias = registro
+    poligonos = indice.poligonos
+    for i, geometria in enumerate(geometrias):
+        if geometria is None:
+            assert not poligonos.validos[i]
+            assert np.isnan(poligonos.centroides[i]).all() and np.isnan(poligonos.areas_ha[i])
+            continue
+
+        centroide = geometria.centroid
+        assert np.allclose(poligonos.centroides[i], [centroide.y, centroide.x], rtol=0, atol=1e-9)
+
+        # Superficie de los lados rectos en la proyección cilíndrica de áreas iguales de Lambert
+        cilindrica = Polygon([
+            (np.radians(lon - centroide.x), np.sin(np.radians(lat)) - np.sin(np.radians(centroide.y)))
+            for lon, lat in geometria.exterior.coords
+        ])
+        assert np.isclose(poligonos.areas_ha[i], cilindrica.area * (RADIO_TIERRA_KM * 1000) ** 2 / 10_000)
+
+    declaradas = datos['superficie'].to_numpy(dtype=np.float64)
+    esperadas = [
+        np.abs(area - declarada) > TOLERANCIA_SUPERFICIE * max(area, declarada)
+        if not (np.isnan(area) or np.isnan(declarada)) else False
+        for area, declarada in zip(poligonos.areas_ha, declaradas)
+    ]
+    assert indice.superficie_discrepante.tolist() == esperadas
+
+
+def _distancia_al_borde(geometria, lat, lon):
+    """Distancia en km del punto al polígono en el plano equirectangular centrado en el punto"""
+    plano = Polygon([
+        ((x - lon) * KM_POR_GRADO * np.cos(np.radians((y + lat) / 2)), (y - lat) * KM_POR_GRADO)
+        for x, y in geometria.exterior.coords
+    ])
+    return plano.distance(Point(0, 0))
+
+
+@pytest.mark.parametrize('hasta_borde', [False, True])
+@pytest.mark.parametrize('fecha', [None, '2014-06-15'])
+def test_k_cercanos_como_orden_completo(registro, hasta_borde, fecha):
+    datos, indice, geometrias = registro
+    filas = [
+        i for i, fila in enumerate(datos.itertuples())
+        if fecha is None or _vigente(fila, pd.Timestamp(fecha))
+    ]
+    for i in range(0, len(datos), 400):
+        lat, lon = datos['latitud'].iat[i] + 0.003, datos['longitud'].iat[i] - 0.002
+        contenedores = [
+            j for j in filas if geometrias[j] is not None and geometrias[j].contains(Point(lon, lat))
+        ]
+        excluidos = set(datos['cuit'].iloc[contenedores])
+
+        # Distancia de cada parcela de los demás CUIT y la menor por CUIT, ordenadas
+        cercanos = {}
+        for j, fila in zip(filas, datos.iloc[filas].itertuples()):
+            if fila.cuit in excluidos:
+                continue
+            if hasta_borde and geometrias[j] is not None:
+                distancia = _distancia_al_borde(geometrias[j], lat, lon)
+            else:
+                distancia = calcular_distancia_km(lat, lon, fila.latitud, fila.longitud)
+            cercanos[fila.cuit] = min(distancia, cercanos.get(fila.cuit, np.inf))
+        orden = sorted(cercanos.items(), key=lambda par: par[1])
+
+        for k in (1, 5, 20, 200):
+            busqueda = buscar_k_cercanos(lat, lon, indice, k, fecha=fecha, hasta_borde=hasta_borde)
+            busqueda = busqueda.primeros(k)
+            assert busqueda.contenedores.tolist() == contenedores
+
+            esperados = orden[:max(0, k - len(excluidos))]
+            assert np.allclose(busqueda.distancias, [d for _, d in esperados], rtol=1e-9, atol=1e-9)
+            # Con empates en la distancia puede salir cualquiera de los CUIT empatados
+            ultima = esperados[-1][1] if esperados else -np.inf
+            assert set(datos['cuit'].iloc[busqueda.posiciones]) <= {c for c, d in orden if d <= ultima + 1e-9}
+
+            resultados = encontrar_k_productores_cercanos(lat, lon, datos, indice, k, fecha, hasta_borde)
+            assert len(resultados) == len(contenedores) + len(esperados)
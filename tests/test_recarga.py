@@ -0,0 +1,86 @@
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from almacen import cargar_o_preprocesar
+from benchmarks.generador import generar_registro
+from motor import (
+    buscar_k_cercanos, encontrar_k_productores_cercanos, encontrar_productores_cercanos,
+    resultados_de_busqueda
+)
+from recarga import RegistroVivo
+
+# Memoria por bloque chica para que el CSV se lea en varios bloques
+MEMORIA_BLOQUE_MB = 0.5
+
+COLUMNAS_COMPARADAS = ['renspa', 'titular', 'distancia']
+
+
+def _comparar(resultados, esperados):
+    pd.testing.assert_frame_equal(
+        resultados[COLUMNAS_COMPARADAS].reset_index(drop=True),
+        esperados[COLUMNAS_COMPARADAS].reset_index(drop=True),
+        check_categorical=False
+    )
+
+
+def test_recarga_igual_a_una_carga_nueva(tmp_path):
+    ruta = str(tmp_path / 'registro.csv')
+    registro = generar_registro(3000, semilla=4)
+    registro.to_csv(ruta)
+    vivo = RegistroVivo.abrir(ruta, memoria_maxima_mb=MEMORIA_BLOQUE_MB)
+    anterior = vivo.actual()
+    # Búsquedas guardadas antes de la recarga, cerca y lejos de las parcelas que cambian
+    puntos = [
+        (round(anterior.indice.latitudes[i], 5), round(anterior.indice.longitudes[i], 5))
+        for i in (10, 700, 1500, 2900)
+    ]
+    for punto in puntos:
+        anterior.cache.buscar(*punto, anterior.indice, 5.0)
+        anterior.cache.buscar(*punto, anterior.indice, 20.0, hasta_borde=True)
+        anterior.cache.buscar_k(*punto, anterior.indice, 8)
+
+    # Parcelas eliminadas, modificadas y agregadas
+    rng = np.random.default_rng(0)
+    registro = registro.drop(registro.index[rng.choice(len(registro), 50, replace=False)])
+    registro.iloc[:20, registro.columns.get_loc('titular')] = 'TITULAR CAMBIADO'
+    agregadas = generar_registro(40, semilla=5)
+    agregadas['renspa'] = [f'99.999.9.{k:05d}/01' for k in range(len(agregadas))]
+    pd.concat([registro, agregadas]).reset_index(drop=True).to_csv(ruta)
+
+    nueva = vivo.recargar()
+    assert nueva.numero == 2
+    assert (nueva.diferencia.agregadas, nueva.diferencia.eliminadas) == (40, 50)
+    assert nueva.diferencia.modificadas == 20
+
+    copia = str(tmp_path / 'copia.csv')
+    shutil.copy(ruta, copia)
+    datos, indice = cargar_o_preprocesar(copia, memoria_maxima_mb=MEMORIA_BLOQUE_MB)
+    # Las categorías pueden estar en otro orden; los valores y los tipos son los mismos
+    pd.testing.assert_frame_equal(nueva.datos, datos, check_categorical=False)
+    assert [t.name for t in nueva.datos.dtypes] == [t.name for t in datos.dtypes]
+    np.testing.assert_array_equal(nueva.indice.poligonos.coordenadas, indice.poligonos.coordenadas)
+    np.testing.assert_array_equal(nueva.indice.poligonos.offsets, indice.poligonos.offsets)
+
+    # Por radio y por k, con el caché trasladado y sin él, como sobre la carga nueva
+    for punto in puntos:
+        _comparar(
+            resultados_de_busqueda(nueva.datos, nueva.indice, nueva.cache.buscar(*punto, nueva.indice, 5.0)),
+            encontrar_productores_cercanos(*punto, datos, indice, 5.0)
+        )
+        busqueda = nueva.cache.buscar(*punto, nueva.indice, 20.0, hasta_borde=True)
+        _comparar(
+            resultados_de_busqueda(nueva.datos, nueva.indice, busqueda),
+            encontrar_productores_cercanos(*punto, datos, indice, 20.0, hasta_borde=True)
+        )
+        _comparar(
+            resultados_de_busqueda(nueva.datos, nueva.indice, nueva.cache.buscar_k(*punto, nueva.indice, 8)),
+            encontrar_k_productores_cercanos(*punto, datos, indice, 8)
+        )
+        for hasta_borde in (False, True):
+            busqueda = buscar_k_cercanos(*punto, nueva.indice, 15, hasta_borde=hasta_borde).primeros(15)
+            _comparar(
+                resultados_de_busqueda(nueva.datos, nueva.indice, busqueda),
+                encontrar_k_productores_cercanos(*punto, datos, indice, 15, hasta_borde=hasta_borde)
+            )
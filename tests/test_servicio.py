@@ -0,0 +1,51 @@
+import asyncio
+import json
+
+import pytest
+
+from benchmarks.generador import generar_registro
+from recarga import RegistroVivo
+from servicio import crear_app
+
+
+@pytest.fixture(scope='module')
+def app(tmp_path_factory):
+    ruta = str(tmp_path_factory.mktemp('servicio') / 'registro.csv')
+    generar_registro(200, semilla=1).to_csv(ruta)
+    return crear_app(RegistroVivo.abrir(ruta))
+
+
+def _post(app, ruta, cuerpo):
+    """Envía un POST a la aplicación ASGI (sin cliente HTTP) y devuelve (estado, JSON)"""
+    mensajes = []
+
+    async def recibir():
+        return {'type': 'http.request', 'body': json.dumps(cuerpo).encode(), 'more_body': False}
+
+    async def enviar(mensaje):
+        mensajes.append(mensaje)
+
+    alcance = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'POST',
+        'scheme': 'http', 'path': ruta, 'raw_path': ruta.encode(), 'root_path': '', 'query_string': b'',
+        'headers': [(b'content-type', b'application/json')], 'server': ('prueba', 80),
+    }
+    asyncio.run(app(alcance, recibir, enviar))
+    cuerpo = b''.join(m.get('body', b'') for m in mensajes if m['type'] == 'http.response.body')
+    return mensajes[0]['status'], json.loads(cuerpo)
+
+
+@pytest.mark.parametrize('cuerpo', [
+    {'puntos': [{'x': 1}]},
+    {'puntos': [1, 2]},
+])
+def test_lote_con_puntos_invalidos_responde_400(app, cuerpo):
+    estado, respuesta = _post(app, '/lote', cuerpo)
+    assert estado == 400
+    assert 'lat' in respuesta['error']
+
+
+def test_lote_valido(app):
+    estado, respuesta = _post(app, '/lote', {'puntos': [{'id': 1, 'lat': -34.0, 'lon': -60.0}]})
+    assert estado == 200
+    assert respuesta['cantidad'] == 1
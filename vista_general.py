@@ -0,0 +1,222 @@
+"""
+Vista general del registro completo en teselas precalculadas por nivel de zoom.
+
+Cada nivel de zoom divide el mapa en teselas web (256 px, las mismas x/y que
+usan los proveedores de mapas) y cada tesela en celdas de 32 px. Las parcelas
+se agregan por celda: cantidad, superficie total y una huella simplificada (la
+envolvente convexa de los rectángulos de sus parcelas, simplificada a un píxel
+del nivel). Así cualquier vista tiene a lo sumo CELDAS_POR_TESELA² entidades
+por tesela visible, muestre unas pocas parcelas o el registro entero.
+
+Las celdas de todos los niveles se calculan una vez a partir del índice
+(arreglos NumPy ordenados por tesela); el GeoJSON de cada tesela se arma la
+primera vez que se pide y queda guardado en un caché local por (zoom, x, y).
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from metricas import medido
+
+ZOOM_MINIMO = 4
+ZOOM_MAXIMO = 13
+
+# Celdas por lado de cada tesela de 256 px (celdas de 32 px)
+CELDAS_POR_TESELA = 8
+
+# Máximo de teselas por vista: acota el tamaño del GeoJSON enviado al navegador
+MAX_TESELAS_VISTA = 16
+
+DECIMALES_COORDENADAS = 5
+
+
+def tesela_de(lat, lon, zoom):
+    """Coordenadas de tesela web (x, y) fraccionarias de los puntos al nivel de zoom"""
+    lat = np.clip(np.asarray(lat, dtype=np.float64), -85.0511, 85.0511)
+    n = 2.0 ** zoom
+    x = (np.asarray(lon, dtype=np.float64) + 180.0) / 360.0 * n
+    y = (1.0 - np.arcsinh(np.tan(np.radians(lat))) / np.pi) / 2.0 * n
+    return x, y
+
+
+def _tolerancia(zoom):
+    """Un píxel del nivel de zoom en grados"""
+    return 360.0 / (256 * 2 ** zoom)
+
+
+class NivelZoom:
+    """
+    Celdas con parcelas de un nivel de zoom, ordenadas por (tesela, celda).
+
+    claves_tesela[i] identifica la tesela de la celda i; las parcelas de la
+    celda i son parcelas[inicios[i]:inicios[i + 1]].
+    """
+
+    def __init__(self, zoom, latitudes, longitudes, posiciones):
+        self.zoom = zoom
+        x, y = tesela_de(latitudes, longitudes, zoom)
+        celda_x = np.floor(x * CELDAS_POR_TESELA).astype(np.int64)
+        celda_y = np.floor(y * CELDAS_POR_TESELA).astype(np.int64)
+        # Clave (tesela, celda dentro de la tesela): las celdas de una tesela quedan contiguas
+        tesela = (celda_x // CELDAS_POR_TESELA) * 2 ** zoom + celda_y // CELDAS_POR_TESELA
+        clave = tesela * CELDAS_POR_TESELA ** 2 + (celda_x % CELDAS_POR_TESELA) * CELDAS_POR_TESELA \
+            + celda_y % CELDAS_POR_TESELA
+
+        orden = np.argsort(clave, kind='stable')
+        claves, primeros = np.unique(clave[orden], return_index=True)
+        self.parcelas = posiciones[orden]
+        self.inicios = np.append(primeros, len(orden))
+        self.claves_tesela = claves // CELDAS_POR_TESELA ** 2
+
+    def __len__(self):
+        return len(self.claves_tesela)
+
+    def maximo_parcelas(self):
+        """Mayor cantidad de parcelas en una celda del nivel"""
+        return int(np.diff(self.inicios).max()) if len(self) else 0
+
+    def celdas_de_tesela(self, x, y):
+        """Rango [desde, hasta) de las celdas de la tesela (x, y)"""
+        clave = x * 2 ** self.zoom + y
+        return (np.searchsorted(self.claves_tesela, clave, side='left'),
+                np.searchsorted(self.claves_tesela, clave, side='right'))
+
+
+class VistaGeneral:
+    """
+    Pirámide de celdas agregadas de ZOOM_MINIMO a ZOOM_MAXIMO sobre todas las
+    parcelas con coordenadas, y caché del GeoJSON de cada tesela.
+    """
+
+    def __init__(self, datos, indice, zoom_minimo=ZOOM_MINIMO, zoom_maximo=ZOOM_MAXIMO):
+        self.indice = indice
+        self.zoom_minimo, self.zoom_maximo = zoom_minimo, zoom_maximo
+        self.superficies = np.nan_to_num(
+            pd.to_numeric(datos['superficie'], errors='coerce').to_numpy(dtype=np.float64)
+        ) if 'superficie' in datos.columns else np.zeros(len(datos))
+
+        # Cada parcela se ubica en el centroide de su polígono (hay parcelas con polígono
+        # y punto en (0, 0)) o, si no tiene, en su punto; (0, 0) es "sin coordenadas"
+        centroides = indice.poligonos.centroides
+        latitudes = np.where(indice.poligonos.validos, centroides[:, 0], indice.latitudes)
+        longitudes = np.where(indice.poligonos.validos, centroides[:, 1], indice.longitudes)
+        posiciones = np.flatnonzero(
+            np.isfinite(latitudes) & np.isfinite(longitudes) & ((latitudes != 0) | (longitudes != 0))
+        )
+        latitudes, longitudes = latitudes[posiciones], longitudes[posiciones]
+        self.latitudes = np.full(len(indice.latitudes), np.nan)
+        self.longitudes = np.full(len(indice.longitudes), np.nan)
+        self.latitudes[posiciones], self.longitudes[posiciones] = latitudes, longitudes
+        self.niveles = {
+            zoom: NivelZoom(zoom, latitudes, longitudes, posiciones)
+            for zoom in range(zoom_minimo, zoom_maximo + 1)
+        }
+        self.parcelas = len(posiciones)
+        if self.parcelas:
+            self.extension = (longitudes.min(), latitudes.min(), longitudes.max(), latitudes.max())
+        else:
+            self.extension = (-62.0, -36.0, -62.0, -36.0)
+
+        self._teselas = {}
+        self._candado = threading.Lock()
+
+    def nivel(self, zoom):
+        """Nivel precalculado más cercano al zoom pedido"""
+        return self.niveles[int(np.clip(zoom, self.zoom_minimo, self.zoom_maximo))]
+
+    def vista_inicial(self, ancho_px=300, alto_px=300):
+        """Centro (lat, lon) y el mayor zoom en el que entra todo el registro"""
+        lon_min, lat_min, lon_max, lat_max = self.extension
+        centro = ((lat_min + lat_max) / 2, (lon_min + lon_max) / 2)
+        for zoom in range(self.zoom_maximo, self.zoom_minimo - 1, -1):
+            x, y = tesela_de([lat_max, lat_min], [lon_min, lon_max], zoom)
+            if (x[1] - x[0]) * 256 <= ancho_px and (y[1] - y[0]) * 256 <= alto_px:
+                return centro, zoom
+        return centro, self.zoom_minimo
+
+    def tesela(self, zoom, x, y):
+        """Features GeoJSON (texto) de las celdas de una tesela, desde el caché local"""
+        clave = (zoom, x, y)
+        texto = self._teselas.get(clave)
+        if texto is None:
+            texto = self._armar_tesela(self.niveles[zoom], x, y)
+            with self._candado:
+                self._teselas[clave] = texto
+        return texto
+
+    @medido('vista_general_tesela')
+    def _armar_tesela(self, nivel, x, y):
+        desde, hasta = nivel.celdas_de_tesela(x, y)
+        if desde == hasta:
+            return ''
+        inicios = nivel.inicios[desde:hasta + 1]
+        parcelas = nivel.parcelas[inicios[0]:inicios[-1]]
+        cantidades = np.diff(inicios)
+        celda = np.repeat(np.arange(hasta - desde), cantidades)
+
+        # Esquinas del rectángulo envolvente de cada parcela (o su punto si no tiene polígono)
+        envolventes = self.indice.poligonos.envolventes[parcelas]
+        sin_poligono = np.isnan(envolventes[:, 0])
+        envolventes[sin_poligono] = np.column_stack([
+            self.longitudes[parcelas], self.latitudes[parcelas]
+        ])[sin_poligono][:, [0, 1, 0, 1]]
+        esquinas = envolventes[:, [0, 1, 2, 1, 2, 3, 0, 3]].reshape(-1, 2)
+
+        tolerancia = _tolerancia(nivel.zoom)
+        huellas = shapely.convex_hull(shapely.multipoints(esquinas, indices=np.repeat(celda, 4)))
+        huellas = shapely.simplify(huellas, tolerancia)
+        # Celdas de un solo punto o alineadas: un pequeño polígono para que se vean como área
+        degeneradas = shapely.area(huellas) == 0
+        huellas[degeneradas] = shapely.buffer(huellas[degeneradas], 2 * tolerancia, quad_segs=2)
+        huellas = shapely.set_precision(huellas, 10.0 ** -DECIMALES_COORDENADAS)
+        geometrias = shapely.to_geojson(huellas)
+
+        superficies = np.bincount(celda, self.superficies[parcelas], minlength=hasta - desde)
+        return ','.join(
+            '{"type":"Feature","geometry":%s,"properties":{"parcelas":%d,"superficie":%.0f}}'
+            % (geometria, cantidad, superficie)
+            for geometria, cantidad, superficie in zip(geometrias, cantidades, superficies)
+        )
+
+    def teselas_en_vista(self, zoom, limites=None):
+        """(zoom, x, y) de las teselas que cubren los límites (lon_min, lat_min, lon_max, lat_max)"""
+        nivel = self.nivel(zoom)
+        lon_min, lat_min, lon_max, lat_max = limites if limites is not None else self.extension
+        x, y = tesela_de([lat_max, lat_min], [lon_min, lon_max], nivel.zoom)
+        ultima = 2 ** nivel.zoom - 1
+        xs = range(int(np.clip(x[0], 0, ultima)), int(np.clip(x[1], 0, ultima)) + 1)
+        ys = range(int(np.clip(y[0], 0, ultima)), int(np.clip(y[1], 0, ultima)) + 1)
+        teselas = [(nivel.zoom, tx, ty) for tx in xs for ty in ys]
+        if len(teselas) > MAX_TESELAS_VISTA:
+            # Vista más grande que lo previsto: las teselas más cercanas al centro
+            cx, cy = (x[0] + x[1]) / 2, (y[0] + y[1]) / 2
+            teselas.sort(key=lambda t: (t[1] + 0.5 - cx) ** 2 + (t[2] + 0.5 - cy) ** 2)
+            teselas = teselas[:MAX_TESELAS_VISTA]
+        return teselas
+
+    def geojson(self, zoom, limites=None):
+        """
+        FeatureCollection (texto) de las celdas visibles en los límites dados al
+        nivel de zoom, y la cantidad de teselas que la componen
+        """
+        teselas = self.teselas_en_vista(zoom, limites)
+        features = ','.join(texto for texto in (self.tesela(*t) for t in teselas) if texto)
+        return '{"type":"FeatureCollection","features":[%s]}' % features, len(teselas)
+
+    def memoria_bytes(self):
+        """Bytes de las celdas precalculadas y del caché de teselas"""
+        celdas = sum(
+            n.parcelas.nbytes + n.inicios.nbytes + n.claves_tesela.nbytes for n in self.niveles.values()
+        )
+        return celdas + sum(len(texto) for texto in list(self._teselas.values()))
+
+
+def limites_de_folium(limites):
+    """Convierte los bounds que devuelve st_folium en (lon_min, lat_min, lon_max, lat_max)"""
+    try:
+        return (limites['_southWest']['lng'], limites['_southWest']['lat'],
+                limites['_northEast']['lng'], limites['_northEast']['lat'])
+    except (KeyError, TypeError):
+        return None